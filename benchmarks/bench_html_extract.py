@@ -0,0 +1,74 @@
+'''Benchmarks for macro_scrape.html_extract against the full-tree BeautifulSoup parsing
+it replaced, on saved pages in benchmarks/fixtures: a Barchart futures profile page
+(contract specifications table) and the ANNA ISIN lookup login page (_csrf field).
+The fixtures are synthetic stand-ins with the same structure and weight as the live pages.
+
+    python benchmarks/bench_html_extract.py
+'''
+import os
+import time
+import warnings
+from bs4 import BeautifulSoup
+
+from macro_scrape import html_extract
+from macro_scrape.barchart import html_table_to_pandas
+
+fixtures = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def read_fixture(name):
+    with open(os.path.join(fixtures, name), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def legacy_contract_table(text):
+    soup = BeautifulSoup(text)
+    df = html_table_to_pandas(soup.find('div', {'class':'text-block futures'}).find('table'))
+    return df.set_index(df.columns[0])[df.columns[1]]
+
+def new_contract_table(parser):
+    def run(text):
+        df = html_extract.extract_table(text, 'div', ('text-block', 'futures'), parser=parser)
+        return df.set_index(df.columns[0])[df.columns[1]]
+    return run
+
+def legacy_csrf(text):
+    return BeautifulSoup(text).findAll("input", {"type" : "hidden", 'name':'_csrf'})[0]['value']
+
+def new_csrf(text):
+    return html_extract.hidden_input_value(text, '_csrf')
+
+
+def bench(fn, arg, repeat=20):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+if __name__ == '__main__':
+    # BeautifulSoup warns about the implicit parser choice, which is the point here
+    warnings.simplefilter('ignore')
+
+    profile = read_fixture('barchart_profile.html')
+    login = read_fixture('anna_login.html')
+
+    cases = [('contract table, bs4 default', legacy_contract_table, profile)]
+    cases += [('contract table, {0}'.format(parser), new_contract_table(parser), profile) for parser in html_extract.parsers]
+    cases += [
+        ('_csrf, bs4 default', legacy_csrf, login),
+        ('_csrf, regex scan', new_csrf, login),
+    ]
+
+    expected_table = legacy_contract_table(profile)
+    expected_csrf = legacy_csrf(login)
+
+    print('profile page {0:,} bytes, login page {1:,} bytes'.format(len(profile), len(login)))
+    print('{0:<36}{1:>12}'.format('extraction', 'best of 20'))
+    for name, fn, arg in cases:
+        result = fn(arg)
+        expected = expected_table if name.startswith('contract') else expected_csrf
+        assert (result.equals(expected) if name.startswith('contract') else result == expected), name
+        print('{0:<36}{1:>10.2f}ms'.format(name, bench(fn, arg) * 1000))
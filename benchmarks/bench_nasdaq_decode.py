@@ -0,0 +1,99 @@
+'''Rows per second for NasdaqFTPResource._process on a synthetic nasdaqtraded.txt,
+against the previous column-by-column Series.replace / .apply implementation.
+
+    python benchmarks/bench_nasdaq_decode.py [n_rows]
+'''
+import sys
+import os
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+
+from macro_scrape.ftp import robust_read_csv
+from macro_scrape.nasdaq.ftp import NasdaqFTPResource
+
+
+columns = [
+    'Nasdaq Traded', 'Symbol', 'Security Name', 'Listing Exchange', 'Market Category', 'ETF',
+    'Round Lot Size', 'Test Issue', 'Financial Status', 'CQS Symbol', 'NASDAQ Symbol', 'NextShares',
+]
+
+
+def write_fixture(path, n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'Nasdaq Traded': rng.choice(['Y', 'N'], n_rows),
+        'Symbol': ['S{0}'.format(i) for i in range(n_rows)],
+        'Security Name': ['Security {0} Common Stock'.format(i) for i in range(n_rows)],
+        'Listing Exchange': rng.choice(list('ANPZVQ'), n_rows),
+        'Market Category': rng.choice(['Q', 'G', 'S', ' '], n_rows),
+        'ETF': rng.choice(['Y', 'N'], n_rows),
+        'Round Lot Size': 100,
+        'Test Issue': rng.choice(['Y', 'N'], n_rows),
+        'Financial Status': rng.choice(list('NDEGHJKQ'), n_rows),
+        'CQS Symbol': ['S{0}'.format(i) for i in range(n_rows)],
+        'NASDAQ Symbol': ['S{0}'.format(i) for i in range(n_rows)],
+        'NextShares': 'N',
+    }, columns=columns)
+    with open(path, 'w') as f:
+        df.to_csv(f, sep='|', index=False)
+        f.write('File Creation Time: 1018202608:00' + '|' * (len(columns) - 1) + '\n')
+
+
+legacy_replacements = {
+    'Listing Exchange': {'A': 'NYSE MKT', 'N': 'NYSE', 'P': 'ARCA', 'Z': 'BATS', 'V': 'IEXG'},
+    'Market Category': {'Q': 'global select market-sm', 'G': 'global market-sm', 'S': 'capital market'},
+}
+
+
+def legacy_process(path):
+    '''The decoding pipeline as it was before the vectorized rewrite'''
+    df = robust_read_csv(path)
+    df, last_row = df.iloc[:-1].copy(), df.iloc[-1]
+    df['File Create Date'] = NasdaqFTPResource.parse_file_create_time(last_row)
+    return legacy_decode(df)
+
+
+def legacy_decode(df):
+    for col in df:
+        if col in legacy_replacements:
+            df[col] = df[col].replace(legacy_replacements[col])
+        elif col in ('ETF', 'Test Issue', 'NextShares'):
+            df[col] = df[col].replace({'Y': True, 'N': False})
+    dx = df['Financial Status']
+    flags = pd.DataFrame({
+        'deficient': dx.apply(lambda x: (x in 'DGHK') if isinstance(x, str) else None),
+        'delinquent': dx.apply(lambda x: (x in 'EHJK') if isinstance(x, str) else None),
+        'bankrupt': dx.apply(lambda x: (x in 'QGJK') if isinstance(x, str) else None),
+    })
+    return pd.concat([df.drop(columns=['Financial Status']), flags], axis=1)
+
+
+def bench(name, fn, arg, n_rows, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(arg.copy() if isinstance(arg, pd.DataFrame) else arg)
+        best = min(best, time.perf_counter() - t0)
+    print('{0:>10}: {1:8.3f}s  {2:>12,.0f} rows/s'.format(name, best, n_rows / best))
+    return best
+
+
+if __name__ == '__main__':
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    resource = NasdaqFTPResource(uri='ftp://ftp.nasdaqtrader.com/symboldirectory/nasdaqtraded.txt')
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'nasdaqtraded.txt')
+        write_fixture(path, n_rows)
+        print('{0:,} rows, read + decode'.format(n_rows))
+        before = bench('before', legacy_process, path, n_rows)
+        after = bench('after', resource._process, path, n_rows)
+        print('{0:>10}: {1:.1f}x'.format('speedup', before / after))
+
+        print('{0:,} rows, decode only'.format(n_rows))
+        before = bench('before', legacy_decode, robust_read_csv(path).iloc[:-1], n_rows)
+        after = bench('after', NasdaqFTPResource.decode_frame,
+            robust_read_csv(path, dtype=NasdaqFTPResource.category_dtypes()).iloc[:-1], n_rows)
+        print('{0:>10}: {1:.1f}x'.format('speedup', before / after))
@@ -0,0 +1,116 @@
+'''Micro-benchmarks of each call site that used to flatten JSON with apply(pd.Series), as it
+ships now against how it was, on synthetic payloads shaped like the real responses.
+
+    python benchmarks/bench_normalize.py [n_rows]
+'''
+import sys
+import time
+import pandas as pd
+
+from macro_scrape.normalize import normalize_records
+from macro_scrape.cme_scrape import CME3MSOFRFutureScrapeRequest, expand_col
+from macro_scrape.ois_fixing_history import ref_rate_schema
+from macro_scrape.barchart import BarchartSearchObj
+
+
+def cme_payload(n):
+    return {
+        'tradeDate': '18 Oct 2026',
+        'empty': False,
+        'quoteDelayed': True,
+        'quotes': [
+            {
+                'last': '95.125', 'change': '+0.01', 'priorSettle': '95.115', 'open': '95.12',
+                'close': '-', 'high': '95.13', 'low': '95.11', 'volume': '12,345',
+                'productCode': 'SR3', 'expirationDate': '2027{0:02d}17'.format(i % 12 + 1),
+                'lastTradeDate': {'timestamp': 1700000000000 + i, 'dateOnlyLongFormat': '12/16/2027'},
+                'priceChart': {'code': 'SR3Z7', 'venue': 0, 'monthYear': 'DEC 2027', 'year': 2027},
+            }
+            for i in range(n)
+        ],
+    }
+
+
+def ois_payload(n):
+    return {
+        'refRates': [
+            {
+                'effectiveDate': str((pd.Timestamp('2018-04-02') + pd.Timedelta(days=i)).date()),
+                'type': 'SOFR', 'percentRate': 5.31, 'percentPercentile1': 5.28,
+                'percentPercentile25': 5.30, 'percentPercentile75': 5.33, 'percentPercentile99': 5.40,
+                'volumeInBillions': 1900, 'revisionIndicator': '',
+            }
+            for i in range(n)
+        ]
+    }
+
+
+def barchart_payload(n):
+    return {
+        'data': [
+            {
+                'symbol': 'SQZ{0}'.format(i),
+                'raw': {'symbol': 'SQZ{0}'.format(i), 'contractNameHistorical': 'Three-Month SOFR', 'symbolCode': 'FUT',
+                        'symbolType': 2, 'hasOptions': True, 'contractExpirationDate': 2020 + i % 10},
+            }
+            for i in range(n)
+        ]
+    }
+
+
+# The call sites as they were, and as they ship
+
+cme_request = CME3MSOFRFutureScrapeRequest()
+
+def legacy_cme(raw_data):
+    dj = pd.DataFrame(raw_data)
+    return dj.drop(columns=['quotes']).merge(dj['quotes'].apply(pd.Series), left_index=True, right_index=True)
+
+def new_cme(raw_data):
+    return cme_request.process_data(raw_data)
+
+def legacy_expand_col(df):
+    for col in ('lastTradeDate', 'priceChart'):
+        df = df.drop(columns=[col]).merge(df[col].apply(pd.Series), left_index=True, right_index=True)
+    return df
+
+def new_expand_col(df):
+    return expand_col(expand_col(df, 'lastTradeDate'), 'priceChart')
+
+def legacy_ois(page_data):
+    return pd.DataFrame(page_data)['refRates'].apply(pd.Series).set_index('effectiveDate')
+
+def new_ois(page_data):
+    return normalize_records(page_data['refRates'], ref_rate_schema).set_index('effectiveDate')
+
+def legacy_barchart(js):
+    return pd.DataFrame([row['raw'] for row in js['data']]).set_index('symbol')
+
+def new_barchart(js):
+    return BarchartSearchObj.raw_records_to_frame(js['data'])
+
+
+def bench(fn, arg, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    cme = cme_payload(n)
+    cases = [
+        ('CMEFutureScrapeRequest.process_data', legacy_cme, new_cme, cme),
+        ('cme_scrape.expand_col', legacy_expand_col, new_expand_col, new_cme(cme)),
+        ('FedOISResetHistoryRequest.load', legacy_ois, new_ois, ois_payload(n)),
+        ('BarchartSearchObj historic chain', legacy_barchart, new_barchart, barchart_payload(n)),
+    ]
+    print('{0:,} records'.format(n))
+    print('{0:<40}{1:>12}{2:>12}{3:>10}'.format('call site', 'before', 'after', 'speedup'))
+    for name, legacy_fn, new_fn, arg in cases:
+        before = bench(legacy_fn, arg)
+        after = bench(new_fn, arg)
+        print('{0:<40}{1:>11.4f}s{2:>11.4f}s{3:>9.1f}x'.format(name, before, after, before / after))
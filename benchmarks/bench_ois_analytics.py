@@ -0,0 +1,55 @@
+'''Compounded rates for a batch of accrual periods from OISAccrualIndex, against
+slicing a daily pandas series once per period, on synthetic business-day fixings.
+
+    python benchmarks/bench_ois_analytics.py
+'''
+import time
+import numpy as np
+import pandas as pd
+
+from macro_scrape.ois_analytics import OISAccrualIndex
+
+
+def sliced_compounded_rates(fixings, starts, ends):
+    '''One reindex and product per period
+    '''
+    daily = fixings['percentRate'] / 100.0
+    rates = []
+    for start, end in zip(starts, ends):
+        days = pd.date_range(start, end - pd.Timedelta(days=1))
+        steps = daily.reindex(days, method='ffill')
+        growth = (1 + steps.groupby(steps.index.map(daily.index.asof)).agg(
+            lambda r: r.iloc[0] * len(r) / 360.0)).prod()
+        rates.append((growth - 1) * 360.0 / len(days) * 100.0)
+    return np.array(rates)
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    fixing_days = pd.bdate_range('2018-04-02', '2026-10-16')
+    fixings = pd.DataFrame(
+        {'percentRate': rng.uniform(0.0, 5.5, len(fixing_days))},
+        index = pd.DatetimeIndex(fixing_days, name='effectiveDate'),
+    )
+    n_periods = 10_000
+    starts = pd.Timestamp('2018-04-02') + pd.to_timedelta(rng.integers(0, 2800, n_periods), unit='D')
+    ends = starts + pd.to_timedelta(rng.integers(1, 370, n_periods), unit='D')
+
+    t0 = time.perf_counter()
+    index = OISAccrualIndex(fixings)
+    build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    fast = index.compounded_rate(starts, ends)
+    batch = time.perf_counter() - t0
+
+    n_sliced = 200
+    t0 = time.perf_counter()
+    slow = sliced_compounded_rates(fixings, starts[:n_sliced], ends[:n_sliced])
+    sliced = (time.perf_counter() - t0) / n_sliced
+
+    print('{0} fixings, {1} periods'.format(len(fixings), n_periods))
+    print('build index         {0:>9.3f}ms'.format(build * 1e3))
+    print('batch query         {0:>9.3f}ms  ({1:.3f}us per period)'.format(batch * 1e3, batch / n_periods * 1e6))
+    print('pandas slicing      {0:>9.3f}ms per period'.format(sliced * 1e3))
+    print('max difference      {0:.2e}%'.format(np.nanmax(np.abs(fast[:n_sliced] - slow))))
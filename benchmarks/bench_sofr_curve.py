@@ -0,0 +1,79 @@
+'''Build, full re-solve and single-contract update timings for SOFRCurve, on a synthetic
+strip of 13 SR1 and 20 SR3 contracts priced off a known curve, plus the fit errors.
+
+    python benchmarks/bench_sofr_curve.py
+'''
+import time
+import numpy as np
+import pandas as pd
+
+from macro_scrape.cme_scrape import imm_dates
+from macro_scrape.sofr_curve import SOFRCurve, contract_periods
+
+
+valuation_date = np.datetime64('2026-10-19')
+
+def true_rate(days):
+    t = (days - valuation_date).astype(float) / 365.0
+    return 0.043 - 0.008 * (1 - np.exp(-t / 1.5))
+
+
+def synthetic_strip(fixings):
+    rows = []
+    for i in range(13):
+        month = np.datetime64('2026-10', 'M') + i
+        rows.append(('SR1', month.astype('datetime64[D]')))
+    for i in range(20):
+        month = np.datetime64('2026-09', 'M') + 3 * i
+        year = month.astype('datetime64[Y]').astype(int) + 1970
+        rows.append(('SR3', imm_dates([year], [month.astype(int) % 12 + 1])[0]))
+
+    df = pd.DataFrame({
+        'productCode'       : [code for code, _ in rows],
+        'firstFixingDate'   : [pd.Timestamp(start).date() for _, start in rows],
+        'expirationDate'    : [pd.Timestamp(start).strftime('%Y%m%d') for _, start in rows],
+    })
+
+    fixing_dates = fixings.index.to_numpy().astype('datetime64[D]')
+    fixing_rates = fixings['percentRate'].to_numpy() / 100.0
+    marks = []
+    for code, start, end in zip(df['productCode'], *contract_periods(df)):
+        days = np.arange(start, end)
+        realized = fixing_rates[np.searchsorted(fixing_dates, days, 'right') - 1]
+        rates = np.where(days < valuation_date, realized, true_rate(days))
+        rate = (np.prod(1 + rates / 360) - 1) * 360 / len(days) if code == 'SR3' else rates.mean()
+        marks.append(100 - 100 * rate)
+    df['mark'] = marks
+    return df
+
+
+def bench(fn, repeat=2000):
+    t0 = time.perf_counter()
+    for i in range(repeat):
+        fn(i)
+    return (time.perf_counter() - t0) / repeat
+
+
+if __name__ == '__main__':
+    fixing_days = pd.bdate_range('2026-06-01', '2026-10-16')
+    fixings = pd.DataFrame({'percentRate': 4.30}, index=pd.DatetimeIndex(fixing_days, name='effectiveDate'))
+    strip = synthetic_strip(fixings)
+
+    t0 = time.perf_counter()
+    curve = SOFRCurve(strip, valuation_date.astype(object), fixings)
+    build = time.perf_counter() - t0
+
+    solve = bench(lambda i: curve.solve())
+    key = curve.keys[5]
+    base = curve.marks[5]
+    update = bench(lambda i: curve.update_marks({key: base + 1e-4 * (-1) ** i}))
+
+    forwards = curve.forward_rates()
+    mid = (forwards['start'] + (forwards['end'] - forwards['start']) // 2).to_numpy().astype('datetime64[D]')
+
+    print('{0} contracts, {1} forward segments'.format(*curve.A.shape))
+    print('build           {0:>9.3f}ms'.format(build * 1e3))
+    print('full re-solve   {0:>9.3f}ms'.format(solve * 1e3))
+    print('one mark update {0:>9.3f}ms'.format(update * 1e3))
+    print('max repricing error {0:.4f}bp'.format(np.abs(curve.model_marks().to_numpy() - curve.marks).max() * 100))
+    print('max forward error   {0:.4f}bp'.format(np.abs(forwards['rate'] - true_rate(mid)).max() * 1e4))
@@ -1,5 +1,7 @@
 import logging
-# import asyncio
+import asyncio
+import os
+import http.cookiejar
 import httpx
 import datetime
 import numpy as np
@@ -8,15 +10,19 @@ import dataclasses
 import typing
 import math
 import time
+import random
 import calendar
+import tempfile
 from typing import Optional, Literal
-from io import StringIO
 import urllib
 import html5lib
-from bs4 import BeautifulSoup
 import pytz
 
 from .headers import *
+from .normalize import normalize_records
+from .html_extract import extract_table
+from .rate_limit import AsyncTokenBucket
+from .http_client import make_client
 
 log = logging.getLogger(__name__)
 
@@ -51,8 +57,84 @@ def html_table_to_pandas(table_soup) -> pd.DataFrame:
 
 
 
+ohlc_price_cols = ['open', 'high', 'low', 'close']
+
+def parse_ohlc_csv(raw: typing.BinaryIO, interval: Optional[int]) -> pd.DataFrame:
+    '''Parse a queryeod (interval None) or queryminutes response body, read as bytes.
+    Daily rows are symbol,date,open,high,low,close,volume,open_interest; minute rows are
+    timestamp,trading day,open,high,low,close,volume. Prices come back as float64, counts
+    as int64 unless some are missing, and the timestamps are parsed with a fixed format.
+    '''
+    if interval is None:
+        names       = ['symbol', 'timestamp'] + ohlc_price_cols + ['volume', 'open_interest']
+        usecols     = names
+        ts_format   = '%Y-%m-%d'
+    else:
+        names       = ['timestamp', 'trading_day'] + ohlc_price_cols + ['volume']
+        usecols     = ['timestamp'] + ohlc_price_cols + ['volume']
+        ts_format   = '%Y-%m-%d %H:%M'
+    count_cols = [col for col in ('volume', 'open_interest') if col in names]
+
+    dtypes = {col: 'float64' for col in ohlc_price_cols + count_cols}
+    dtypes['timestamp'] = 'object'
+    if interval is None:
+        dtypes['symbol'] = 'category'
+
+    try:
+        df = pd.read_csv(raw, names=names, usecols=usecols, dtype=dtypes, engine='c')
+    except pd.errors.EmptyDataError:
+        # No bars in range
+        df = pd.DataFrame({col: pd.Series(dtype=dtypes[col]) for col in usecols})
+
+    if interval is None and len(df):
+        # One symbol per request; continuation contracts can echo the underlying too
+        symbols = df.pop('symbol')
+        if len(symbols.cat.categories) > 1:
+            df = df.loc[(symbols == symbols.iloc[0]).values]
+    df = df.drop(columns=['symbol'], errors='ignore')
+
+    for col in count_cols:
+        if not df[col].isna().any():
+            df[col] = df[col].astype('int64')
+
+    timestamps = df.pop('timestamp')
+    try:
+        index = pd.to_datetime(timestamps, format=ts_format)
+    except ValueError:
+        log.debug('OHLC timestamps not in {0}, inferring the format'.format(ts_format))
+        index = pd.to_datetime(timestamps)
+    index = pd.DatetimeIndex(index).rename(None)
+    if interval is not None:
+        index = index.tz_localize(us_eastern)
+    df.index = index
+    return df
+
+
+
 base_url = 'https://barchart.com/'
 
+# Types of the quote fields get_quotes can ask for; others come through untyped
+quote_field_dtypes = {
+    'symbol'        : 'string',
+    'lastPrice'     : 'float64',
+    'priceChange'   : 'float64',
+    'openPrice'     : 'float64',
+    'highPrice'     : 'float64',
+    'lowPrice'      : 'float64',
+    'previousPrice' : 'float64',
+    'volume'        : 'float64',
+    'openInterest'  : 'float64',
+    'tradeTime'     : 'float64',
+}
+
+
+def quote_schema(fields: str) -> typing.Dict:
+    '''normalize_records schema for the raw values of a comma separated field list
+    '''
+    schema = {'raw.' + field: quote_field_dtypes.get(field) for field in fields.split(',') if '(' not in field}
+    schema['raw.*'] = None
+    return schema
+
 TickerKind = Literal[
     'futures',
 ]
@@ -76,17 +158,52 @@ class BarchartSearchObj:
     api_quote_url       : str                           = '/proxies/core-api/v1/quotes/get'
     api_min_quote_url   : str                           = '/proxies/timeseries/queryminutes.ashx'
     api_day_quote_url   : str                           = '/proxies/timeseries/queryeod.ashx'
+    # Reuse the XSRF token this long before landing again; a 403/419 forces a new landing sooner
+    token_ttl           : float                         = 900.0
+    # Optional file to persist cookies (and so the token) between processes
+    cookie_path         : Optional[str]                 = None
+    _secret_time        : Optional[float]               = None
+    _landing_lock       : Optional[asyncio.Lock]        = dataclasses.field(default=None, repr=False)
+    # Whether __aenter__ opened the client, and so __aexit__ should close it
+    _owns_client        : bool                          = dataclasses.field(default=False, repr=False)
 
     async def __aenter__(self,):
-        self.client = await httpx.AsyncClient(headers=headers, timeout=self.timeout).__aenter__()
+        if self.client is None:
+            self.client = await make_client(timeout=self.timeout).__aenter__()
+            self._owns_client = True
+        self.load_cookies()
         return self
 
     async def __aexit__(self, *args, **kwargs):
-        await self.client.__aexit__(*args, **kwargs)
+        self.save_cookies()
+        if self._owns_client:
+            await self.client.__aexit__(*args, **kwargs)
+            self.client = None
+            self._owns_client = False
+
+    def load_cookies(self) -> None:
+        if self.cookie_path is None or not os.path.exists(self.cookie_path):
+            return
+        jar = http.cookiejar.LWPCookieJar(self.cookie_path)
+        jar.load(ignore_discard=True)
+        for cookie in jar:
+            self.client.cookies.jar.set_cookie(cookie)
+            if cookie.name == 'XSRF-TOKEN':
+                self._secret = urllib.parse.unquote(cookie.value)
+                self._secret_time = time.monotonic()
+        log.debug('loaded {0} cookies from {1}'.format(len(jar), self.cookie_path))
+
+    def save_cookies(self) -> None:
+        if self.cookie_path is None:
+            return
+        jar = http.cookiejar.LWPCookieJar(self.cookie_path)
+        for cookie in self.client.cookies.jar:
+            jar.set_cookie(cookie)
+        jar.save(ignore_discard=True)
 
     @staticmethod
     def to_numeric(xs: pd.Series):
-        return pd.to_numeric(xs.str.replace('[^-.0-9]', ''))
+        return pd.to_numeric(xs.str.replace('[^-.0-9]', '', regex=True))
 
     @staticmethod
     def to_date(xs: pd.Series):
@@ -111,10 +228,92 @@ class BarchartSearchObj:
 
         if new_secret is not None:
             self._secret = urllib.parse.unquote(new_secret)
+            self._secret_time = time.monotonic()
             log.debug('got secret {0}'.format(self._secret))
 
         return self._secret
 
+    def secret_is_fresh(self) -> bool:
+        return (
+            self._secret is not None and self._secret_time is not None
+            and time.monotonic() - self._secret_time < self.token_ttl
+        )
+
+    async def ensure_secret(self, relative_url: str, stale_secret: Optional[str] = None) -> str:
+        '''Land on relative_url only if we don't hold a usable token.
+        Concurrent callers share one landing; stale_secret is a token the server
+        just rejected, which forces a landing unless someone already replaced it.
+        '''
+        if self._landing_lock is None:
+            self._landing_lock = asyncio.Lock()
+
+        def usable() -> bool:
+            if stale_secret is not None:
+                return self._secret is not None and self._secret != stale_secret
+            return self.secret_is_fresh()
+
+        if usable():
+            return self._secret
+        async with self._landing_lock:
+            if not usable():
+                await self.perform_landing(relative_url)
+        return self._secret
+
+    async def api_get(self, url: str, params: typing.Dict, landing_url: str) -> httpx.Response:
+        '''GET an API endpoint with the XSRF token, re-landing once if it was rejected
+        '''
+        secret = await self.ensure_secret(landing_url)
+        page = await self.client.get(
+            url,
+            headers = {'x-xsrf-token':secret},
+            params = params,
+            follow_redirects=True,
+        )
+        if page.status_code in (403, 419):
+            log.info('token rejected with {0}, landing again'.format(page.status_code))
+            secret = await self.ensure_secret(landing_url, stale_secret=secret)
+            page = await self.client.get(
+                url,
+                headers = {'x-xsrf-token':secret},
+                params = params,
+                follow_redirects=True,
+            )
+        page.raise_for_status()
+        self.eat_secret_page_cookie(page)
+        return page
+
+    async def api_stream(self,
+            url         : str,
+            params      : typing.Dict,
+            landing_url : str,
+            max_memory  : int = 16 * 1024**2,
+        ) -> typing.BinaryIO:
+        '''Like api_get, but the body is streamed into a buffer that spills to a temp file
+        past max_memory bytes, so large responses are never held as one string.
+        The returned buffer is rewound and should be closed by the caller.
+        '''
+        secret = await self.ensure_secret(landing_url)
+        for attempt in range(2):
+            async with self.client.stream(
+                'GET',
+                url,
+                headers = {'x-xsrf-token':secret},
+                params = params,
+                follow_redirects=True,
+            ) as page:
+                if page.status_code in (403, 419) and attempt == 0:
+                    log.info('token rejected with {0}, landing again'.format(page.status_code))
+                    secret = await self.ensure_secret(landing_url, stale_secret=secret)
+                    continue
+                page.raise_for_status()
+                self.eat_secret_page_cookie(page)
+
+                buf = tempfile.SpooledTemporaryFile(max_size=max_memory)
+                async for chunk in page.aiter_bytes():
+                    buf.write(chunk)
+                buf.seek(0)
+                return buf
+
 
     async def perform_landing(self, relative_url:str):
         search_url = urllib.parse.urljoin(base_url, relative_url)
@@ -132,7 +331,7 @@ class BarchartSearchObj:
         ticker = ticker.upper()
         futures_base = ticker[:-3]
 
-        await self.perform_landing('/futures/quotes/{0}/overview'.format(ticker))
+        landing_url = '/futures/quotes/{0}/overview'.format(ticker)
 
         search_url = urllib.parse.urljoin(base_url, self.api_quote_url)
 
@@ -141,13 +340,7 @@ class BarchartSearchObj:
             'fields': 'symbol,symbolType,contractName,contractExpirationDate,lastPrice,priceChange,highPrice,lowPrice,volume,tradeTime,symbolCode',
         }
 
-        page = await self.client.get(
-            search_url,
-            headers = {'x-xsrf-token':self._secret},
-            params = params,
-            follow_redirects=True,
-        )
-        page.raise_for_status()
+        page = await self.api_get(search_url, params, landing_url=landing_url)
 
         js = page.json()
 
@@ -162,7 +355,7 @@ class BarchartSearchObj:
 
 
     async def future_summary(self, ):
-        await self.perform_landing('futures/major-commodities')
+        landing_url = 'futures/major-commodities'
         search_url = urllib.parse.urljoin(base_url, self.api_quote_url)
 
         params = {
@@ -174,13 +367,7 @@ class BarchartSearchObj:
             # 'raw': '1'
         }
 
-        page = await self.client.get(
-            search_url,
-            headers = {'x-xsrf-token':self._secret},
-            params = params,
-            follow_redirects=True,
-        )
-        page.raise_for_status()
+        page = await self.api_get(search_url, params, landing_url=landing_url)
 
         js = page.json()
 
@@ -214,7 +401,7 @@ class BarchartSearchObj:
         """
         ticker = ticker.upper()
 
-        await self.perform_landing('/futures/quotes/{0}/overview'.format(ticker))
+        landing_url = '/futures/quotes/{0}/overview'.format(ticker)
 
         if interval is None:
             search_url = urllib.parse.urljoin(base_url, self.api_day_quote_url)
@@ -234,59 +421,81 @@ class BarchartSearchObj:
             'contractroll'      : contract_roll,
         }
 
-        page = await self.client.get(
-            search_url,
-            headers = {'x-xsrf-token':self._secret},
-            params = params,
-            follow_redirects=True,
-        )
-        page.raise_for_status()
-
-        raw = StringIO(page.text)
-        if interval is None:
-            columns = [
-                'open',
-                'high',
-                'low',
-                'close',
-                'volume',
-                'open_interest',
-            ]
-        else:
-            columns = [
-                # 'timestamp',
-                'something',
-                'open',
-                'high',
-                'low',
-                'close',
-                'volume',
-            ]
-        df = pd.read_csv(raw, names=columns)
-        if interval is None:
-            df = df.loc[df.index.get_level_values(0)[0]]
-            df.index = pd.to_datetime(df.index)
-        else:
-            df.index = pd.to_datetime(df.index).tz_localize(us_eastern)
-        df = df.drop(columns={'something'}, errors='ignore')
-        return df
+        with await self.api_stream(search_url, params, landing_url=landing_url) as raw:
+            return parse_ohlc_csv(raw, interval)
     
 
 
+    async def get_ohlc_quotes_many(self,
+            tickers         : typing.Iterable[str],
+            interval        : Optional[int],
+            max_concurrency : int   = 8,
+            rate_limit      : float = 5.0,
+            retries         : int   = 3,
+            backoff         : float = 1.0,
+            as_frame        : bool  = False,
+            **kwargs,
+        ) -> typing.Tuple[typing.Union[typing.Dict[str, pd.DataFrame], pd.DataFrame], typing.Dict[str, BaseException]]:
+        """Fetches OHLC quotes for many tickers concurrently, sharing one token.
+        At most max_concurrency requests are in flight, started at no more than rate_limit per second.
+        Failed requests are retried with exponential backoff; tickers that still fail are returned
+        in the second element, keyed by ticker, rather than raised.
+        The first element is a dict of frames, or with as_frame one frame indexed by (ticker, timestamp).
+        Other keyword arguments are passed on to get_ohlc_quotes.
+        """
+        tickers = list(dict.fromkeys(ticker.upper() for ticker in tickers))
+        semaphore = asyncio.Semaphore(max_concurrency)
+        bucket = AsyncTokenBucket(rate_limit)
+
+        async def fetch(ticker: str) -> pd.DataFrame:
+            for attempt in range(retries + 1):
+                try:
+                    async with semaphore:
+                        await bucket.acquire()
+                        return await self.get_ohlc_quotes(ticker, interval, **kwargs)
+                except httpx.HTTPError as e:
+                    # Only throttling, server errors and transport failures are worth another try
+                    retryable = not isinstance(e, httpx.HTTPStatusError) or e.response.status_code == 429 or e.response.status_code >= 500
+                    if attempt == retries or not retryable:
+                        raise
+                    delay = backoff * 2 ** attempt * (1 + random.random())
+                    log.info('OHLC request for {0} failed with {1!r}, retrying in {2:.1f}s'.format(ticker, e, delay))
+                    await asyncio.sleep(delay)
+
+        results = await asyncio.gather(*[fetch(ticker) for ticker in tickers], return_exceptions=True)
+
+        dfs = {}
+        failures = {}
+        for ticker, result in zip(tickers, results):
+            if isinstance(result, BaseException):
+                log.warning('Failed to get OHLC quotes for {0}: {1!r}'.format(ticker, result))
+                failures[ticker] = result
+            else:
+                dfs[ticker] = result
+
+        if as_frame:
+            if dfs:
+                df = pd.concat(dfs, names=['ticker', 'timestamp'])
+            else:
+                df = pd.DataFrame(index=pd.MultiIndex.from_arrays([[], []], names=['ticker', 'timestamp']))
+            return df, failures
+        return dfs, failures
+
+
+
     async def get_contract_details(self, future_ticker : str) -> pd.Series:
 
         landing_page = await self.perform_landing('futures/quotes/{0}/profile'.format(future_ticker.upper()))
-        soup = BeautifulSoup(landing_page.text )
-        contract_table_html = soup.find('div', {'class':'text-block futures'}).find('table')
-
-        df = html_table_to_pandas(contract_table_html)
+        df = extract_table(landing_page.text, 'div', ('text-block', 'futures'))
+        if df is None:
+            raise ValueError('no contract table on the {0} profile page'.format(future_ticker.upper()))
         df = df.set_index(df.columns[0])[df.columns[1]]
         return df
     
 
 
-    async def get_all_historic_product_chain(self, product_ticker : str, page:int=1, limit:int=1_000) -> pd.DataFrame:
-        await self.perform_landing('futures/major-commodities')
+    async def get_historic_product_chain_page(self, product_ticker : str, page:int=1, limit:int=1_000) -> typing.Dict:
+        landing_url = 'futures/major-commodities'
         search_url = urllib.parse.urljoin(base_url, self.api_quote_url)
 
         params = {
@@ -302,28 +511,114 @@ class BarchartSearchObj:
             'raw': '1',
         }
 
-        page = await self.client.get(
-            search_url,
-            headers = {'x-xsrf-token':self._secret},
-            params = params,
-            follow_redirects=True,
-        )
-        page.raise_for_status()
+        page = await self.api_get(search_url, params, landing_url=landing_url)
+        return page.json()
 
-        js = page.json()
+    @staticmethod
+    def raw_records_to_frame(records: typing.List[typing.Dict], schema: typing.Optional[typing.Dict] = None) -> pd.DataFrame:
+        '''Frame of the records' raw values, indexed by symbol. With a schema the values are
+        typed by normalize_records. Without one, as for the flat historic chain rows, they go
+        straight to the frame constructor, which is the faster of the two.
+        '''
+        if schema is None:
+            df = pd.DataFrame([record['raw'] for record in records])
+        else:
+            df = normalize_records(records, schema)
+        if 'symbol' in df.columns:
+            df = df.drop_duplicates('symbol').set_index('symbol')
+        if 'tradeTime' in df.columns:
+            df['tradeTime'] = pd.to_datetime(df['tradeTime'], unit='s').dt.tz_localize(pytz.utc).dt.tz_convert(us_eastern)
+        return df
 
-        total_count = js['total']
-        page_count = js['count']
 
-        if total_count < page_count:
-            return await self.get_all_historic_product_chain(product_ticker, page=1, limit=total_count)
-        else:
-            df = pd.DataFrame([row['raw'] for row in js['data']]).set_index('symbol')
-            if 'tradeTime' in df.columns:
-                df['tradeTime'] = pd.to_datetime(df['tradeTime'], unit='s').dt.tz_localize(pytz.utc).dt.tz_convert(us_eastern)
-            return df
+    async def get_all_historic_product_chain(self,
+            product_ticker  : str,
+            page            : int = 1,
+            limit           : int = 1_000,
+            max_concurrency : int = 4,
+        ) -> pd.DataFrame:
+        """Every historic contract of a root, from page onwards.
+        The first page reports the total and, unless it is also the last page, the page
+        size the server actually serves, which may be below limit. The remaining pages are then fetched max_concurrency at
+        a time and assembled in order. If they still fall short of the total, paging
+        continues until a short or empty page comes back.
+        """
+        js = await self.get_historic_product_chain_page(product_ticker, page=page, limit=limit)
+
+        # A short first page only tells the server's page size when more pages follow it;
+        # starting on the short final page says nothing, so keep limit then
+        last_page = not js['data'] or (page - 1) * limit + len(js['data']) >= js['total']
+        page_size = limit if last_page else min(limit, len(js['data']))
+        if page_size < limit:
+            log.debug('{0}: server returned {1} of {2} requested rows per page'.format(product_ticker, page_size, limit))
+        n_pages = max(page, math.ceil(js['total'] / page_size))
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def fetch(page_num: int) -> typing.Dict:
+            async with semaphore:
+                return await self.get_historic_product_chain_page(product_ticker, page=page_num, limit=limit)
+
+        pages = [js] + list(await asyncio.gather(*[fetch(page_num) for page_num in range(page + 1, n_pages + 1)]))
+        expected = js['total'] - (page - 1) * page_size
+        while len(pages[-1]['data']) >= page_size and sum(len(page_js['data']) for page_js in pages) < expected:
+            # Still short of the total after a full page, so the page size shrank mid-way
+            next_js = await fetch(page + len(pages))
+            if not next_js['data']:
+                break
+            pages.append(next_js)
+        log.debug('fetched {0} pages of {1} contracts for {2}'.format(len(pages), js['total'], product_ticker))
+
+        records = [record for page_js in pages for record in page_js['data']]
+        return BarchartSearchObj.raw_records_to_frame(records)
+
+
+    async def get_quotes(self,
+            symbols         : typing.Iterable[str],
+            fields          : str = 'symbol,lastPrice,priceChange,openPrice,highPrice,lowPrice,previousPrice,volume,openInterest,tradeTime',
+            batch_size      : int = 100,
+            max_concurrency : int = 4,
+        ) -> pd.DataFrame:
+        """Quotes for any number of symbols, requested batch_size symbols at a time,
+        max_concurrency batches at once.
+        """
+        landing_url = 'futures/major-commodities'
+        search_url = urllib.parse.urljoin(base_url, self.api_quote_url)
 
+        symbols = list(dict.fromkeys(symbols))
+        batches = [symbols[i:i+batch_size] for i in range(0, len(symbols), batch_size)]
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def fetch(batch: typing.List[str]) -> typing.List[typing.Dict]:
+            params = {
+                'symbols'   : ','.join(batch),
+                'fields'    : fields,
+                'raw'       : '1',
+            }
+            async with semaphore:
+                page = await self.api_get(search_url, params, landing_url=landing_url)
+            return page.json()['data']
+
+        results = await asyncio.gather(*[fetch(batch) for batch in batches])
+        records = [record for batch_records in results for record in batch_records]
+        return BarchartSearchObj.raw_records_to_frame(records, quote_schema(fields))
+
+
+    async def get_all_historic_product_chain_quotes(self,
+            product_ticker  : str,
+            page            : int = 1,
+            limit           : int = 1_000,
+            max_concurrency : int = 4,
+            **kwargs,
+        ) -> pd.DataFrame:
+        """Every historic contract of a root, joined with its latest quote.
+        Other keyword arguments are passed on to get_quotes.
+        """
+        all_contracts_df = await self.get_all_historic_product_chain(
+            product_ticker, page=page, limit=limit, max_concurrency=max_concurrency,
+        )
+        if len(all_contracts_df) == 0:
+            return all_contracts_df
 
-    async def get_all_historic_product_chain_quotes(self, product_ticker : str, page:int=1, limit:int=1_000) -> pd.DataFrame:
-        all_contracts_df = await self.get_all_historic_product_chain(product_ticker, page=page, limit=limit)
-        return all_contracts_df
+        quotes_df = await self.get_quotes(all_contracts_df.index, max_concurrency=max_concurrency, **kwargs)
+        quote_cols = [col for col in quotes_df.columns if col not in all_contracts_df.columns]
+        return all_contracts_df.join(quotes_df[quote_cols])
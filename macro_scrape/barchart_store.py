@@ -0,0 +1,189 @@
+import logging
+import os
+import glob
+import math
+import asyncio
+import typing
+import datetime
+import pandas as pd
+
+from .barchart import BarchartSearchObj, us_eastern
+from .store import JSONManifest, write_parquet
+
+log = logging.getLogger(__name__)
+
+
+class BarchartBarStore:
+    '''Local parquet cache of Barchart OHLC bars, one directory per (ticker, interval, adjustment).
+
+    update() asks Barchart only for enough records to cover the time since the last stored
+    bar, plus a few bars of overlap, and writes them as a new part file. Reads merge the
+    parts, with later parts winning on overlapping timestamps, and compact them once
+    there are more than max_parts.
+    '''
+
+    def __init__(self, root: str, max_parts: int = 50, overlap: int = 5) -> None:
+        self.root       = os.path.abspath(os.path.expanduser(root))
+        self.max_parts  = max_parts
+        self.overlap    = overlap
+        self.manifest   = JSONManifest(os.path.join(self.root, '_manifest.json'))
+
+    @staticmethod
+    def key(ticker: str, interval: typing.Optional[int], dividends: bool = False, back_adjust: bool = False) -> str:
+        return os.path.join(
+            ticker.upper(),
+            'daily' if interval is None else '{0}min'.format(interval),
+            '{0}-{1}'.format('div' if dividends else 'nodiv', 'backadj' if back_adjust else 'raw'),
+        )
+
+    def last_timestamp(self, key: str) -> typing.Optional[pd.Timestamp]:
+        entry = self.manifest.load().get(key)
+        return None if entry is None else pd.Timestamp(entry['last'])
+
+    def records_needed(self, key: str, interval: typing.Optional[int], max_records: int) -> int:
+        '''Enough bars to reach back from now to the last stored bar, plus the overlap
+        '''
+        last = self.last_timestamp(key)
+        if last is None:
+            return max_records
+
+        if interval is None:
+            elapsed = len(pd.bdate_range(last.date(), datetime.date.today()))
+        else:
+            now = pd.Timestamp.now(tz=us_eastern)
+            if last.tzinfo is None:
+                last = last.tz_localize(us_eastern)
+            elapsed = math.ceil((now - last).total_seconds() / 60 / interval)
+        return max(1, min(max_records, elapsed + self.overlap))
+
+    def _parts(self, key: str) -> typing.List[str]:
+        return sorted(glob.glob(os.path.join(self.root, key, 'part-*.parquet')))
+
+    def _read_parts(self, key: str) -> pd.DataFrame:
+        parts = self._parts(key)
+        if not parts:
+            return pd.DataFrame()
+        df = pd.concat([pd.read_parquet(part) for part in parts], ignore_index=True)
+        df = df.drop_duplicates('timestamp', keep='last').sort_values('timestamp')
+        return df.set_index('timestamp')
+
+    def _write_part(self, key: str, df: pd.DataFrame) -> None:
+        manifest = self.manifest.load()
+        entry = manifest.get(key, {'parts': 0})
+        part_num = entry['parts']
+        write_parquet(
+            df.rename_axis('timestamp').reset_index(),
+            os.path.join(self.root, key, 'part-{0:08d}.parquet'.format(part_num)),
+        )
+        entry['parts'] = part_num + 1
+        # A short response can end before what's stored; never move last backwards
+        last = df.index.max()
+        if 'last' in entry:
+            last = max(last, pd.Timestamp(entry['last']))
+        entry['last'] = last.isoformat()
+        manifest[key] = entry
+        self.manifest.save(manifest)
+
+    def compact(self, key: str) -> None:
+        parts = self._parts(key)
+        if len(parts) <= 1:
+            return
+        df = self._read_parts(key)
+        # Write the merged bars as the newest part, then drop the ones it replaces
+        self._write_part(key, df)
+        for part in parts:
+            os.remove(part)
+        log.info('compacted {0} parts of {1}'.format(len(parts), key))
+
+    def read(self,
+        ticker      : str,
+        interval    : typing.Optional[int],
+        start       = None,
+        end         = None,
+        dividends   : bool = False,
+        back_adjust : bool = False,
+    ) -> pd.DataFrame:
+        '''Stored bars between start and end, inclusive, without touching the network.
+        Naive bounds are US/Eastern, like the minute bars; dates cover the whole day.
+        '''
+        df = self._read_parts(self.key(ticker, interval, dividends, back_adjust))
+        if len(df):
+            df.index.name = None
+            df = df.loc[self._bound(start, df.index):self._bound(end, df.index)]
+        return df
+
+    @staticmethod
+    def _bound(when, index: pd.DatetimeIndex):
+        '''A read() bound comparable with the index: localized for minute bars, naive for daily
+        '''
+        if when is None or isinstance(when, str):
+            return when
+        if isinstance(when, datetime.date) and not isinstance(when, datetime.datetime):
+            # Sliced as a string, so the end date includes that day's bars
+            return when.isoformat()
+        when = pd.Timestamp(when)
+        if index.tz is not None and when.tzinfo is None:
+            return when.tz_localize(index.tz)
+        if index.tz is None and when.tzinfo is not None:
+            return when.tz_convert(us_eastern).tz_localize(None)
+        return when
+
+    async def update(self,
+        client      : BarchartSearchObj,
+        ticker      : str,
+        interval    : typing.Optional[int],
+        dividends   : bool = False,
+        back_adjust : bool = False,
+        max_records : int = 10_000,
+        **kwargs,
+    ) -> int:
+        '''Pull bars newer than the last stored one and store them. Returns the number of new bars.
+        Barchart returns the most recent max_records bars, so asking for just the elapsed
+        count fetches the tail.
+        '''
+        key = self.key(ticker, interval, dividends, back_adjust)
+        last = self.last_timestamp(key)
+        n_records = self.records_needed(key, interval, max_records)
+
+        df = await client.get_ohlc_quotes(
+            ticker, interval,
+            max_records = n_records,
+            dividends   = dividends,
+            back_adjust = back_adjust,
+            **kwargs,
+        )
+        if len(df) == 0:
+            return 0
+
+        if last is not None and len(df) >= n_records and df.index.min() > last:
+            log.warning('{0}: fetched bars don\'t reach back to the last stored bar, there may be a gap'.format(key))
+
+        self._write_part(key, df)
+        n_new = len(df) if last is None else int((df.index > last).sum())
+        log.info('{0}: fetched {1} bars, {2} new'.format(key, len(df), n_new))
+
+        if len(self._parts(key)) > self.max_parts:
+            self.compact(key)
+        return n_new
+
+    async def update_many(self,
+        client          : BarchartSearchObj,
+        tickers         : typing.Iterable[str],
+        interval        : typing.Optional[int],
+        max_concurrency : int = 8,
+        **kwargs,
+    ) -> typing.Dict[str, typing.Union[int, BaseException]]:
+        '''update() for many tickers at once. Returns new bar counts, or the error, per ticker
+        '''
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def update_one(ticker):
+            async with semaphore:
+                return await self.update(client, ticker, interval, **kwargs)
+
+        tickers = list(tickers)
+        results = await asyncio.gather(*[update_one(ticker) for ticker in tickers], return_exceptions=True)
+        for ticker, result in zip(tickers, results):
+            if isinstance(result, BaseException):
+                log.warning('Failed to update {0}: {1!r}'.format(ticker, result))
+        return dict(zip(tickers, results))
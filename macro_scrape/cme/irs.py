@@ -18,9 +18,9 @@ class CMEIRSResource(FTPResource):
     
 
     @classmethod
-    def get_atm_vol_on_date(cls, dt : datetime.date) -> pd.DataFrame:
+    def get_atm_vol_on_date(cls, dt : datetime.date, cache=None) -> pd.DataFrame:
         uri = 'ftp://ftp.cmegroup.com/irs/CME_ATM_VolCube_{0:%Y%m%d}.csv'.format(dt)
-        with CMEIRSResource( uri = uri, ) as client:
+        with CMEIRSResource( uri = uri, cache = cache, ) as client:
             log.info('file last modified: {0}'.format(client.last_modified().astimezone(pytz.timezone('US/Eastern'))))
 
             if not client.local_copy_exists():
@@ -0,0 +1,165 @@
+import logging
+log = logging.getLogger(__name__)
+
+import os
+import ftplib
+import typing
+import datetime
+import pandas as pd
+import pyarrow.dataset as ds
+
+from .settlements import CMESettleResource, settle_category_cols, settle_price_cols, settle_date_cols
+from ..store import JSONManifest, write_parquet, open_dataset, typed_columns
+
+
+# Stored type of each known column, whether or not a day's file fills it in. Unknown columns
+# that a day leaves empty are stored as text.
+settle_store_dtypes = {
+    **dict.fromkeys(settle_category_cols, 'string'),
+    **dict.fromkeys(settle_price_cols, 'float32'),
+    **dict.fromkeys(settle_date_cols, 'datetime64[ns]'),
+    **dict.fromkeys(('PrevDayVol', 'PrevDayOI'), 'float64'),
+}
+
+
+class CMESettlementStore:
+    '''Local, append-only parquet history of CME settlement files.
+
+    Files are partitioned as exch=/year=/month=/, one parquet file per business date,
+    sorted by symbol so row-group statistics can skip products a query doesn't ask for.
+    Reads are memory-mapped and filtered inside the dataset scan, so a query only
+    materializes the rows it returns.
+    '''
+
+    def __init__(self,
+        root            : str,
+        exchs           : typing.Iterable[str]  = ('CME', 'CBT', 'NYMEX', 'COMEX'),
+        cache           = None,
+        row_group_size  : int                   = 50_000,
+    ) -> None:
+        self.root           = os.path.abspath(os.path.expanduser(root))
+        self.exchs          = [exch.upper() for exch in exchs]
+        self.cache          = cache
+        self.row_group_size = row_group_size
+        self.manifest       = JSONManifest(os.path.join(self.root, '_manifest.json'))
+
+    def partition_path(self, exch: str, dt: datetime.date) -> str:
+        return os.path.join(
+            self.root,
+            'exch={0}'.format(exch.upper()),
+            'year={0}'.format(dt.year),
+            'month={0}'.format(dt.month),
+            '{0:%Y%m%d}.parquet'.format(dt),
+        )
+
+    def dates_stored(self, exch: str) -> typing.Set[datetime.date]:
+        stored = self.manifest.load().get('stored', {}).get(exch.upper(), [])
+        return set(map(datetime.date.fromisoformat, stored))
+
+    def dates_unavailable(self, exch: str) -> typing.Set[datetime.date]:
+        unavailable = self.manifest.load().get('unavailable', {}).get(exch.upper(), [])
+        return set(map(datetime.date.fromisoformat, unavailable))
+
+    def missing_dates(self,
+        exch    : str,
+        start   : datetime.date,
+        end     : datetime.date,
+    ) -> typing.List[datetime.date]:
+        '''Business dates in [start, end] that are neither stored nor known to be missing remotely
+        '''
+        skip = self.dates_stored(exch) | self.dates_unavailable(exch)
+        return [dt for dt in pd.bdate_range(start, end).date if dt not in skip]
+
+    def _mark(self, kind: str, exch: str, dt: datetime.date) -> None:
+        manifest = self.manifest.load()
+        dates = manifest.setdefault(kind, {}).setdefault(exch.upper(), [])
+        dates.append(dt.isoformat())
+        manifest[kind][exch.upper()] = sorted(set(dates))
+        self.manifest.save(manifest)
+
+    def update(self,
+        start       : typing.Optional[datetime.date] = None,
+        end         : typing.Optional[datetime.date] = None,
+        max_workers : typing.Optional[int] = None,
+    ) -> typing.Dict[typing.Tuple[str, datetime.date], BaseException]:
+        '''Downloads and appends every business date not yet stored.
+        CME only keeps about a week of files, so start defaults to 10 days before end.
+        Returns failures keyed by (exch, date).
+        '''
+        end = datetime.date.today() if end is None else end
+        start = end - datetime.timedelta(days=10) if start is None else start
+
+        wanted = {}
+        for exch in self.exchs:
+            for dt in self.missing_dates(exch, start, end):
+                wanted[CMESettleResource.settle_suffix(dt, exch)] = (exch, dt)
+
+        if not wanted:
+            log.info('settlement store is up to date')
+            return {}
+
+        failures = {}
+        with CMESettleResource( uri = CMESettleResource.settle_uri, cache = self.cache, ) as client:
+            for result in client.download_many(wanted.keys(), max_workers=max_workers):
+                exch, dt = wanted[result.suffix]
+                if not result.ok:
+                    # Holidays and dates that have rolled off the FTP site will never show up
+                    if isinstance(result.error, ftplib.error_perm) and dt < end - datetime.timedelta(days=10):
+                        self._mark('unavailable', exch, dt)
+                    failures[(exch, dt)] = result.error
+                    continue
+
+                try:
+                    with open(result.fname, 'rb') as raw:
+                        df = CMESettleResource.concat_chunks(list(
+                            CMESettleResource.iter_settlement_chunks(raw, compressed=True)
+                        ))
+                except Exception as e:
+                    log.error('Failed to parse {0}: {1!r}'.format(result.fname, e))
+                    failures[(exch, dt)] = e
+                    continue
+
+                sort_cols = [col for col in ('Sym', 'MMY') if col in df.columns]
+                df = df.sort_values(sort_cols, kind='stable')
+                # Columns a day doesn't use, like StrkPx on a futures-only day, keep the type
+                # they have on other days, so every partition has the same schema
+                df = typed_columns(df, settle_store_dtypes)
+
+                write_parquet(df, self.partition_path(exch, dt), row_group_size=self.row_group_size)
+                self._mark('stored', exch, dt)
+                log.info('stored {0:,} {1} settlements for {2}'.format(len(df), exch, dt))
+
+        return failures
+
+    def read(self,
+        products    : typing.Optional[typing.Iterable[str]]     = None,
+        start       : typing.Optional[datetime.date]            = None,
+        end         : typing.Optional[datetime.date]            = None,
+        exchs       : typing.Optional[typing.Iterable[str]]     = None,
+        columns     : typing.Optional[typing.List[str]]         = None,
+    ) -> pd.DataFrame:
+        '''Settlement rows for the given products between start and end, inclusive.
+        The exchange and month bounds prune partitions; product and date filters
+        prune row groups using their min/max statistics.
+        '''
+        if not os.path.exists(self.root):
+            return pd.DataFrame(columns=columns)
+
+        dataset = open_dataset(self.root)
+        expr = ds.field('exch').isin([exch.upper() for exch in (self.exchs if exchs is None else exchs)])
+
+        if start is not None:
+            expr &= (ds.field('year') > start.year) | ((ds.field('year') == start.year) & (ds.field('month') >= start.month))
+            expr &= ds.field('BizDt') >= pd.Timestamp(start)
+        if end is not None:
+            expr &= (ds.field('year') < end.year) | ((ds.field('year') == end.year) & (ds.field('month') <= end.month))
+            expr &= ds.field('BizDt') <= pd.Timestamp(end)
+        if products is not None:
+            expr &= ds.field('Sym').isin(list(products))
+
+        table = dataset.to_table(columns=columns, filter=expr)
+        df = table.to_pandas()
+        for col in settle_category_cols:
+            if col in df.columns:
+                df[col] = df[col].astype('category')
+        return df
@@ -5,12 +5,22 @@ import numpy as np
 import typing
 import dataclasses
 import datetime
+import zipfile
 import pandas as pd
 
 from ..ftp import FTPResource
 
 
+settle_category_cols = ('Sym', 'Exch', 'SecTyp', 'MMY', 'UndlyExch', 'UndlySecTyp')
+settle_price_cols = (
+    'StrkPx', 'BidPrice', 'OpeningPrice', 'SettlePrice', 'SettleDelta', 'HighLimit', 'LowLimit',
+    'DHighPrice', 'DLowPrice', 'HighBid', 'LowBid', 'FixingPrice',
+)
+settle_date_cols = ('BizDt', 'MatDt', 'LastTrdDt')
+
+
 class CMESettleResource(FTPResource):
+    settle_uri = 'ftp://ftp.cmegroup.com/settle/'
 
     def _process(self, fname: str) -> pd.DataFrame:
         df = pd.read_csv(fname)
@@ -20,13 +30,13 @@ class CMESettleResource(FTPResource):
     
 
     @classmethod
-    def get_settlements(cls, dt : datetime.date, exch : str = 'CME', compressed:bool=True) -> pd.DataFrame:
+    def get_settlements(cls, dt : datetime.date, exch : str = 'CME', compressed:bool=True, cache=None) -> pd.DataFrame:
         uri = 'ftp://ftp.cmegroup.com/settle/{exch}.settle.{dt:%Y%m%d}.s.csv{comp_str}'.format(
             dt = dt,
             exch = exch.lower(),
             comp_str = '.zip' if compressed else ''
         )
-        with CMESettleResource( uri = uri, ) as client:
+        with CMESettleResource( uri = uri, cache = cache, ) as client:
 
             if not client.local_copy_exists():
                 log.info('downloading file {0}'.format(uri))
@@ -36,3 +46,140 @@ class CMESettleResource(FTPResource):
 
             df = client.load_from_local()
         return df
+
+
+    @classmethod
+    def get_settlements_many(cls,
+            dates       : typing.Iterable[datetime.date],
+            exchs       : typing.Iterable[str] = ('CME',),
+            compressed  : bool = True,
+            cache       = None,
+            max_workers : typing.Optional[int] = None,
+        ) -> typing.Tuple[typing.Dict[typing.Tuple[str, datetime.date], pd.DataFrame], typing.Dict[typing.Tuple[str, datetime.date], BaseException]]:
+        '''Downloads settlement files for every (exchange, date) pair concurrently.
+        Returns a dict of dataframes and a dict of errors, both keyed by (exch, date).
+        '''
+        dates = list(dates)
+        keys = {
+            cls.settle_suffix(dt, exch, compressed): (exch.upper(), dt)
+            for exch in exchs for dt in dates
+        }
+
+        dfs = {}
+        failures = {}
+        with CMESettleResource( uri = cls.settle_uri, cache = cache, ) as client:
+            for result in client.download_many(keys.keys(), max_workers=max_workers):
+                key = keys[result.suffix]
+                if not result.ok:
+                    failures[key] = result.error
+                    continue
+                try:
+                    dfs[key] = client._process(result.fname)
+                except Exception as e:
+                    log.error('Failed to parse {0}: {1!r}'.format(result.fname, e))
+                    failures[key] = e
+        return dfs, failures
+
+
+    @staticmethod
+    def settle_suffix(dt : datetime.date, exch : str = 'CME', compressed : bool = True) -> str:
+        return '{exch}.settle.{dt:%Y%m%d}.s.csv{comp_str}'.format(
+            dt = dt,
+            exch = exch.lower(),
+            comp_str = '.zip' if compressed else ''
+        )
+
+    @staticmethod
+    def type_chunk(df : pd.DataFrame) -> pd.DataFrame:
+        '''Categories for the repeated labels, float32 prices and datetimes for the date columns
+        '''
+        for col in settle_category_cols:
+            if col in df.columns:
+                df[col] = df[col].astype('category')
+        for col in settle_date_cols:
+            if col in df.columns:
+                df[col] = pd.to_datetime(df[col], errors='coerce')
+        return df
+
+    @classmethod
+    def iter_settlement_chunks(cls,
+            raw         : typing.BinaryIO,
+            compressed  : bool = True,
+            chunksize   : int = 100_000,
+            columns     : typing.Optional[typing.Iterable[str]] = None,
+            products    : typing.Optional[typing.Iterable[str]] = None,
+            predicate   : typing.Optional[typing.Callable[[pd.DataFrame], pd.Series]] = None,
+        ) -> typing.Iterator[pd.DataFrame]:
+        '''Yields typed chunks parsed from an open settlement file.
+        Only the requested columns are parsed, rows whose Sym isn't in products are dropped
+        before typing, and predicate (a function of the typed chunk returning a boolean mask)
+        is applied last.
+        '''
+        columns = None if columns is None else list(columns)
+        products = None if products is None else set(products)
+
+        read_cols = None if columns is None else set(columns)
+        if read_cols is not None and products is not None:
+            read_cols.add('Sym')
+
+        if compressed:
+            archive = zipfile.ZipFile(raw)
+            fh = archive.open(archive.namelist()[0])
+        else:
+            archive = None
+            fh = raw
+
+        try:
+            reader = pd.read_csv(
+                fh,
+                chunksize = chunksize,
+                usecols = None if read_cols is None else (lambda col: col in read_cols),
+                dtype = dict.fromkeys(settle_price_cols, 'float32'),
+            )
+            for chunk in reader:
+                if products is not None:
+                    chunk = chunk.loc[chunk['Sym'].isin(products)]
+                chunk = cls.type_chunk(chunk)
+                if predicate is not None:
+                    chunk = chunk.loc[predicate(chunk)]
+                if columns is not None:
+                    chunk = chunk[[col for col in columns if col in chunk.columns]]
+                if len(chunk):
+                    yield chunk
+        finally:
+            if archive is not None:
+                fh.close()
+                archive.close()
+
+    @classmethod
+    def iter_settlements(cls,
+            dt          : datetime.date,
+            exch        : str = 'CME',
+            compressed  : bool = True,
+            cache       = None,
+            **kwargs,
+        ) -> typing.Iterator[pd.DataFrame]:
+        '''Yields typed chunks of a settlement file without extracting it to disk.
+        Keyword arguments are passed on to iter_settlement_chunks.
+        '''
+        suffix = cls.settle_suffix(dt, exch, compressed)
+        with CMESettleResource( uri = cls.settle_uri, cache = cache, ) as client:
+            with client.open_remote(suffix) as raw:
+                yield from cls.iter_settlement_chunks(raw, compressed=compressed, **kwargs)
+
+    @staticmethod
+    def concat_chunks(chunks : typing.List[pd.DataFrame]) -> pd.DataFrame:
+        if not chunks:
+            return pd.DataFrame()
+        df = pd.concat(chunks, ignore_index=True)
+        # Chunks can have different categories, which concat turns back into objects
+        for col in settle_category_cols:
+            if col in df.columns:
+                df[col] = df[col].astype('category')
+        return df
+
+    @classmethod
+    def read_settlements(cls, dt : datetime.date, exch : str = 'CME', **kwargs) -> pd.DataFrame:
+        '''Streams a settlement file through iter_settlements and returns the filtered rows
+        '''
+        return cls.concat_chunks(list(cls.iter_settlements(dt, exch, **kwargs)))
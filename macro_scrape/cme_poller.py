@@ -0,0 +1,255 @@
+import logging
+import asyncio
+import hashlib
+import datetime
+import dataclasses
+import typing
+import httpx
+import pandas as pd
+
+from .cme_scrape import CMEFutureScrapeRequest, cme_quote_schema
+from .normalize import normalize_records
+from .http_client import make_client
+
+log = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class QuoteUpdate:
+    '''Quote rows of one product that changed since the previous poll, indexed by contract.
+    The first update for a product, and the first a new subscriber sees, is a full snapshot.
+    '''
+    product_id  : int
+    received    : datetime.datetime
+    changed     : pd.DataFrame
+    removed     : typing.List
+    snapshot    : bool = False
+
+    def merge(self, newer: 'QuoteUpdate') -> 'QuoteUpdate':
+        '''One update with the effect of this one followed by newer, for the same product
+        '''
+        kept = self.changed.loc[self.changed.index.difference(newer.changed.index)]
+        changed = pd.concat([kept, newer.changed]).drop(newer.removed, errors='ignore')
+        removed = [] if self.snapshot else list(dict.fromkeys(
+            [key for key in self.removed if key not in newer.changed.index] + list(newer.removed)
+        ))
+        return QuoteUpdate(self.product_id, newer.received, changed, removed, snapshot=self.snapshot or newer.snapshot)
+
+
+class _Subscription:
+    '''Updates waiting for one subscriber, at most one per product. An update for a product
+    that already has one pending is merged into it, so a slow reader gets fewer, larger
+    updates rather than an ever longer backlog.
+    '''
+
+    def __init__(self) -> None:
+        self.pending    = {}
+        self.ready      = asyncio.Event()
+        self.closed     = False
+
+    def put(self, update: QuoteUpdate) -> None:
+        previous = self.pending.get(update.product_id)
+        self.pending[update.product_id] = update if previous is None else previous.merge(update)
+        self.ready.set()
+
+    def close(self) -> None:
+        self.closed = True
+        self.ready.set()
+
+    async def get(self) -> typing.Optional[QuoteUpdate]:
+        '''The oldest pending update, or None once closed and drained
+        '''
+        while not self.pending:
+            if self.closed:
+                return None
+            self.ready.clear()
+            await self.ready.wait()
+        return self.pending.pop(next(iter(self.pending)))
+
+
+@dataclasses.dataclass
+class _ProductState:
+    landed      : bool                              = False
+    etag        : typing.Optional[str]              = None
+    modified    : typing.Optional[str]              = None
+    digest      : typing.Optional[bytes]            = None
+    quotes      : typing.Optional[pd.DataFrame]     = None
+
+
+class CMEQuotePoller:
+    '''Polls CME quote JSON for several products on one warm client and publishes only
+    the contracts whose quotes changed.
+
+    Each product page is visited once, then only the quotes endpoint is hit. Responses
+    are sent with If-None-Match/If-Modified-Since when CME hands out validators, and a
+    body whose hash matches the last one is not parsed at all. Subscribers get
+    QuoteUpdates through an async iterator:
+
+        async with CMEQuotePoller([CME3MSOFRFutureScrapeRequest()], interval=2.0) as poller:
+            async for update in poller.subscribe():
+                print(update.changed)
+    '''
+
+    def __init__(self,
+        requests    : typing.Iterable[CMEFutureScrapeRequest],
+        interval    : float                                 = 5.0,
+        client      : typing.Optional[httpx.AsyncClient]    = None,
+        key_cols    : typing.Sequence[str]                  = ('productCode', 'expirationDate'),
+    ) -> None:
+        self.requests       = {request.product_id: request for request in requests}
+        self.interval       = interval
+        self.key_cols       = list(key_cols)
+        self._client        = client
+        self._owns_client   = client is None
+        self._states        = {product_id: _ProductState() for product_id in self.requests}
+        self._subscribers   = []
+        self._task          = None
+        self._closed        = False
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *args, **kwargs):
+        await self.aclose()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = make_client(timeout=max(request.timeout for request in self.requests.values()))
+        return self._client
+
+    def keyed(self, raw_data: typing.Dict) -> pd.DataFrame:
+        quotes = normalize_records(raw_data['quotes'], cme_quote_schema).set_index(self.key_cols, drop=False)
+        return quotes.loc[~quotes.index.duplicated(keep='last')]
+
+    @staticmethod
+    def changed_rows(old: pd.DataFrame, new: pd.DataFrame) -> pd.Index:
+        '''Keys of rows in new that are missing from old or differ from it in any column
+        '''
+        common = new.index.intersection(old.index)
+        columns = new.columns.intersection(old.columns)
+        if len(columns) < len(new.columns):
+            return new.index.difference(old.index).append(common)
+        before = old.loc[common, columns]
+        after = new.loc[common, columns]
+        # ne is NA against a null, so fill that as a change, then let two nulls compare equal
+        differs = after.ne(before).fillna(True).astype(bool) & ~(after.isna() & before.isna())
+        return new.index.difference(old.index).append(common[differs.any(axis=1).to_numpy()])
+
+    async def poll_product(self, product_id: int) -> typing.Optional[QuoteUpdate]:
+        '''Fetch one product's quotes, returning what changed, or None if nothing did
+        '''
+        request = self.requests[product_id]
+        state = self._states[product_id]
+
+        if not state.landed:
+            await request.land(self.client)
+            state.landed = True
+
+        conditional = {}
+        if state.etag is not None:
+            conditional['If-None-Match'] = state.etag
+        if state.modified is not None:
+            conditional['If-Modified-Since'] = state.modified
+
+        page = await request.fetch_quotes(self.client, headers=conditional)
+        if page.status_code in (401, 403):
+            # Session cookies expired, visit the page again
+            log.info('quotes for {0} returned {1}, landing again'.format(product_id, page.status_code))
+            await request.land(self.client)
+            page = await request.fetch_quotes(self.client, headers=conditional)
+        if page.status_code == 304:
+            return None
+        page.raise_for_status()
+
+        state.etag = page.headers.get('ETag')
+        state.modified = page.headers.get('Last-Modified')
+        digest = hashlib.blake2b(page.content, digest_size=16).digest()
+        if digest == state.digest:
+            return None
+        state.digest = digest
+
+        quotes = self.keyed(page.json())
+        received = datetime.datetime.now(datetime.timezone.utc)
+        if state.quotes is None:
+            state.quotes = quotes
+            return QuoteUpdate(product_id, received, quotes, [], snapshot=True)
+
+        changed = self.changed_rows(state.quotes, quotes)
+        removed = list(state.quotes.index.difference(quotes.index))
+        state.quotes = quotes
+        if len(changed) == 0 and not removed:
+            return None
+        return QuoteUpdate(product_id, received, quotes.loc[changed], removed)
+
+    async def poll_once(self) -> typing.List[QuoteUpdate]:
+        '''Poll every product concurrently and publish the changes
+        '''
+        product_ids = list(self.requests)
+        results = await asyncio.gather(*[self.poll_product(product_id) for product_id in product_ids], return_exceptions=True)
+        updates = []
+        for product_id, result in zip(product_ids, results):
+            if isinstance(result, BaseException):
+                log.warning('Failed to poll quotes for {0}: {1!r}'.format(product_id, result))
+            elif result is not None:
+                updates.append(result)
+        for update in updates:
+            for subscription in self._subscribers:
+                subscription.put(update)
+        return updates
+
+    async def run(self) -> None:
+        '''Poll every interval seconds until cancelled
+        '''
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await self.poll_once()
+            await asyncio.sleep(max(0.0, self.interval - (loop.time() - started)))
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def aclose(self) -> None:
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for subscription in self._subscribers:
+            subscription.close()
+        if self._owns_client and self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def latest(self, product_id: int) -> typing.Optional[pd.DataFrame]:
+        '''Most recent quotes for a product, indexed by contract
+        '''
+        return self._states[product_id].quotes
+
+    async def subscribe(self) -> typing.AsyncIterator[QuoteUpdate]:
+        '''Updates as they arrive, starting with a snapshot of every product already polled.
+        Ends when the poller is closed, at once if it already is. Updates the subscriber
+        hasn't read yet are merged per product, see _Subscription.
+        '''
+        if self._closed:
+            return
+        subscription = _Subscription()
+        received = datetime.datetime.now(datetime.timezone.utc)
+        for product_id, state in self._states.items():
+            if state.quotes is not None:
+                subscription.put(QuoteUpdate(product_id, received, state.quotes, [], snapshot=True))
+        self._subscribers.append(subscription)
+        try:
+            while True:
+                update = await subscription.get()
+                if update is None:
+                    return
+                yield update
+        finally:
+            self._subscribers.remove(subscription)
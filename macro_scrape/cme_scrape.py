@@ -1,4 +1,5 @@
-# import asyncio
+import logging
+import asyncio
 import httpx
 import datetime
 import numpy as np
@@ -8,8 +9,13 @@ import typing
 import math
 import time
 import calendar
+import functools
 
 from .headers import *
+from .normalize import normalize_records
+from .http_client import make_client
+
+log = logging.getLogger(__name__)
 
 cal = calendar.Calendar(firstweekday=calendar.SUNDAY)
 
@@ -33,34 +39,54 @@ class CMEFutureScrapeRequest:
         return self.data_url.format(self.product_id)
 
     def process_data(self, raw_data : typing.Dict) -> pd.DataFrame:
-        dj = pd.DataFrame(raw_data)
-        df = dj.drop(columns=['quotes']).merge(dj['quotes'].apply(pd.Series), left_index=True, right_index=True)
-        return df
-
-    async def load(self, verbose=False):
-        if self.data_df is not None:
-            pass
-
-        async with httpx.AsyncClient(headers=headers, timeout=self.timeout) as client:
-            page = await client.get(self.page_url, )
-            page.raise_for_status()
-
-            if verbose:
-                print('loaded main page')
-
-            params = {
-                '_t': self.get_time(),
-            }
-
-            page = await client.get(self.resolve_data_url(), headers = {'Referer':self.page_url}, params=params)
-            page.raise_for_status()
-
-            raw_data = page.json()
-            if verbose:
-                print('loaded quotes page')
-            self.data_df = self.process_data(raw_data)
-            if verbose:
-                print('found {0} quotes'.format(len(self.data_df)))
+        quotes = normalize_records(raw_data['quotes'], cme_quote_schema)
+        # Page-level fields repeat on every quote row, ahead of the quote columns
+        header = pd.DataFrame(
+            {k: v for k, v in raw_data.items() if k != 'quotes'},
+            index = quotes.index,
+        )
+        return header.merge(quotes, left_index=True, right_index=True)
+
+    async def land(self, client: httpx.AsyncClient) -> httpx.Response:
+        '''Visit the product page, which installs the cookies the quotes endpoint wants
+        '''
+        page = await client.get(self.page_url, )
+        page.raise_for_status()
+        return page
+
+    async def fetch_quotes(self, client: httpx.AsyncClient, headers: typing.Optional[typing.Dict] = None) -> httpx.Response:
+        '''GET the quotes JSON, without raising for status. headers are added to the Referer
+        '''
+        params = {
+            '_t': self.get_time(),
+        }
+        return await client.get(
+            self.resolve_data_url(),
+            headers = {'Referer':self.page_url, **(headers or {})},
+            params = params,
+        )
+
+    async def load(self, verbose=False, client: typing.Optional[httpx.AsyncClient] = None):
+        '''Pass client to reuse its connections; otherwise one is opened for this call.
+        '''
+        if client is None:
+            async with make_client(timeout=self.timeout) as client:
+                return await self.load(verbose=verbose, client=client)
+
+        await self.land(client)
+
+        if verbose:
+            print('loaded main page')
+
+        page = await self.fetch_quotes(client)
+        page.raise_for_status()
+
+        raw_data = page.json()
+        if verbose:
+            print('loaded quotes page')
+        self.data_df = self.process_data(raw_data)
+        if verbose:
+            print('found {0} quotes'.format(len(self.data_df)))
 
 
 
@@ -78,19 +104,234 @@ class CME1MSOFRFutureScrapeRequest(CMEFutureScrapeRequest):
 
 
 
+@dataclasses.dataclass(frozen=True)
+class CMEProduct:
+    symbol      : str
+    product_id  : int
+    page_url    : str
+    asset_class : str
+
+    def request(self, **kwargs) -> CMEFutureScrapeRequest:
+        return CMEFutureScrapeRequest(page_url=self.page_url, product_id=self.product_id, **kwargs)
+
+
+_markets_url = 'https://www.cmegroup.com/markets/'
+
+cme_products = {
+    product.symbol: product
+    for product in [
+        CMEProduct('SR3', 8462, _markets_url + 'interest-rates/stirs/three-month-sofr.quotes.html',               'stirs'),
+        CMEProduct('SR1', 8463, _markets_url + 'interest-rates/stirs/one-month-sofr.quotes.html',                 'stirs'),
+        CMEProduct('ZQ',  305,  _markets_url + 'interest-rates/stirs/30-day-federal-fund.quotes.html',            'stirs'),
+        CMEProduct('ZT',  303,  _markets_url + 'interest-rates/us-treasury/2-year-us-treasury-note.quotes.html',  'treasuries'),
+        CMEProduct('ZF',  329,  _markets_url + 'interest-rates/us-treasury/5-year-us-treasury-note.quotes.html',  'treasuries'),
+        CMEProduct('ZN',  316,  _markets_url + 'interest-rates/us-treasury/10-year-us-treasury-note.quotes.html', 'treasuries'),
+        CMEProduct('ZB',  307,  _markets_url + 'interest-rates/us-treasury/30-year-us-treasury-bond.quotes.html', 'treasuries'),
+        CMEProduct('ES',  133,  _markets_url + 'equities/sp/e-mini-sandp500.quotes.html',                         'equities'),
+        CMEProduct('NQ',  146,  _markets_url + 'equities/nasdaq/e-mini-nasdaq-100.quotes.html',                   'equities'),
+        CMEProduct('CL',  425,  _markets_url + 'energy/crude-oil/light-sweet-crude.quotes.html',                  'energy'),
+        CMEProduct('NG',  444,  _markets_url + 'energy/natural-gas/natural-gas.quotes.html',                      'energy'),
+        CMEProduct('HO',  426,  _markets_url + 'energy/refined-products/heating-oil.quotes.html',                 'energy'),
+        CMEProduct('RB',  429,  _markets_url + 'energy/refined-products/rbob-gasoline.quotes.html',               'energy'),
+        CMEProduct('GC',  437,  _markets_url + 'metals/precious/gold.quotes.html',                                'metals'),
+        CMEProduct('SI',  458,  _markets_url + 'metals/precious/silver.quotes.html',                              'metals'),
+    ]
+}
+
+quote_numeric_cols = ['last', 'change', 'priorSettle', 'open', 'close', 'high', 'low', 'highLimit', 'lowLimit', 'volume']
+
+
+def quote_numbers(xs: pd.Series) -> pd.Series:
+    '''CME quote strings like '12,345', '+0.015' or '-' as floats, '-' being missing
+    '''
+    if pd.api.types.is_numeric_dtype(xs):
+        return xs.astype(float)
+    return pd.to_numeric(xs.astype(str).str.replace('[,+]', '', regex=True), errors='coerce').astype(float)
+
+
+# Fields of each entry of the quotes JSON; anything CME adds comes through untyped
+cme_quote_schema = {
+    'productCode'       : 'string',
+    'productName'       : 'string',
+    'productId'         : 'Int64',
+    'quoteCode'         : 'string',
+    'escapedQuoteCode'  : 'string',
+    'mdKey'             : 'string',
+    'expirationMonth'   : 'string',
+    'expirationCode'    : 'string',
+    'expirationDate'    : 'string',
+    **dict.fromkeys(quote_numeric_cols, quote_numbers),
+    'percentageChange'  : 'string',
+    'updated'           : 'string',
+    'lastTradeDate'     : None,
+    'priceChart'        : None,
+    '*'                 : None,
+}
+
+last_trade_date_schema = {
+    'timestamp'             : 'Int64',
+    'dateOnlyLongFormat'    : 'string',
+    'default24'             : 'string',
+    '*'                     : None,
+}
+
+price_chart_schema = {
+    'code'      : 'string',
+    'venue'     : 'Int64',
+    'monthYear' : 'string',
+    'year'      : 'Int64',
+    '*'         : None,
+}
+
+
+def type_quotes(df: pd.DataFrame) -> pd.DataFrame:
+    for col in quote_numeric_cols:
+        if col in df.columns:
+            df[col] = quote_numbers(df[col])
+    if 'updated' in df.columns:
+        df['updated'] = pd.to_datetime(df['updated'], errors='coerce')
+    return df
+
+
+def resolve_products(products: typing.Iterable[typing.Union[str, int, CMEProduct]]) -> typing.List[CMEProduct]:
+    '''Registry entries for symbols or product ids; CMEProduct instances pass through
+    '''
+    by_id = {product.product_id: product for product in cme_products.values()}
+    resolved = []
+    for product in products:
+        if isinstance(product, CMEProduct):
+            resolved.append(product)
+        elif isinstance(product, int):
+            resolved.append(by_id[product])
+        else:
+            resolved.append(cme_products[product.upper()])
+    return resolved
+
+
+async def load_many(
+    products        : typing.Iterable[typing.Union[str, int, CMEProduct]] = tuple(cme_products),
+    client          : typing.Optional[httpx.AsyncClient] = None,
+    max_per_host    : int = 20,
+    timeout         : float = 5.0,
+) -> typing.Tuple[pd.DataFrame, typing.Dict[str, BaseException]]:
+    '''Quotes for many products at once, as one frame with a 'product' column and numeric prices.
+    One product page is visited for cookies, then every quotes JSON is fetched concurrently,
+    at most max_per_host at a time when the client is opened here. A product whose quotes are
+    refused gets its own page visited and is retried once. Products that still fail are
+    returned in the second element, keyed by symbol, rather than raised.
+    '''
+    products = resolve_products(products)
+    if not products:
+        return pd.DataFrame(), {}
+
+    async def fetch(request: CMEFutureScrapeRequest, client: httpx.AsyncClient) -> pd.DataFrame:
+        page = await request.fetch_quotes(client)
+        if page.status_code in (401, 403):
+            await request.land(client)
+            page = await request.fetch_quotes(client)
+        page.raise_for_status()
+        return request.process_data(page.json())
+
+    async def fetch_all(client: httpx.AsyncClient):
+        requests = [product.request(timeout=timeout) for product in products]
+        await requests[0].land(client)
+        return await asyncio.gather(*[fetch(request, client) for request in requests], return_exceptions=True)
+
+    if client is None:
+        async with make_client(timeout=timeout, max_per_host=max_per_host) as client:
+            results = await fetch_all(client)
+    else:
+        results = await fetch_all(client)
+
+    dfs = {}
+    failures = {}
+    for product, result in zip(products, results):
+        if isinstance(result, BaseException):
+            log.warning('Failed to load {0} quotes: {1!r}'.format(product.symbol, result))
+            failures[product.symbol] = result
+        else:
+            dfs[product.symbol] = result
+
+    if not dfs:
+        return pd.DataFrame(), failures
+    df = pd.concat(dfs, names=['product', None]).reset_index(level='product').reset_index(drop=True)
+    return type_quotes(df), failures
+
+
+
+expanded_col_schemas = {
+    'lastTradeDate' : last_trade_date_schema,
+    'priceChart'    : price_chart_schema,
+}
+
 def expand_col(df, col):
-    return df.drop(columns=[col]).merge(df[col].apply(pd.Series), left_index=True, right_index=True)
+    expanded = normalize_records(df[col].tolist(), expanded_col_schemas.get(col, {'*': None}), index=df.index)
+    return df.drop(columns=[col]).merge(expanded, left_index=True, right_index=True)
 
 def kth_weekday_of_month(year, month, k, weekday_num):
     '''
     print(kth_weekday_of_month(2022,4, 2, calendar.FRIDAY))
     '''
-    monthcal = cal.monthdatescalendar(year, month)
-    kth_weekday = [
-        day for week in monthcal for day in week
-        if day.weekday() == weekday_num and day.month == month
-    ][k]
-    return kth_weekday
+    n_days = calendar.monthrange(year, month)[1]
+    if k >= 0:
+        first_weekday = datetime.date(year, month, 1).weekday()
+        day = 1 + (weekday_num - first_weekday) % 7 + 7 * k
+    else:
+        # Negative k counts back from the end of the month, like list indexing
+        last_weekday = datetime.date(year, month, n_days).weekday()
+        day = n_days - (last_weekday - weekday_num) % 7 + 7 * (k + 1)
+    if not 1 <= day <= n_days:
+        raise IndexError('no weekday {0} number {1} in {2:04d}-{3:02d}'.format(weekday_num, k, year, month))
+    return datetime.date(year, month, day)
+
+
+@functools.lru_cache(maxsize=None)
+def kth_weekday_table(start_year, end_year, k, weekday_num):
+    '''Kth (0-based, negative counts from the end) weekday of every month from start_year
+    to end_year inclusive, as a datetime64[D] array with one entry per month, computed in
+    closed form. Months without a kth weekday get NaT.
+    '''
+    months = np.arange(
+        np.datetime64('{0:04d}-01'.format(start_year), 'M'),
+        np.datetime64('{0:04d}-01'.format(end_year + 1), 'M'),
+    )
+    first_days = months.astype('datetime64[D]')
+    next_first_days = (months + 1).astype('datetime64[D]')
+    if k >= 0:
+        # 1970-01-01 was a Thursday
+        first_weekdays = (first_days.astype(np.int64) + calendar.THURSDAY) % 7
+        offsets = (weekday_num - first_weekdays) % 7 + 7 * k
+        table = first_days + offsets.astype('timedelta64[D]')
+    else:
+        last_days = next_first_days - 1
+        last_weekdays = (last_days.astype(np.int64) + calendar.THURSDAY) % 7
+        offsets = (last_weekdays - weekday_num) % 7 - 7 * (k + 1)
+        table = last_days - offsets.astype('timedelta64[D]')
+    table[(table < first_days) | (table >= next_first_days)] = np.datetime64('NaT')
+    table.setflags(write=False)
+    return table
+
+def kth_weekday_of_months(years, months, k, weekday_num):
+    '''Vectorized kth_weekday_of_month over arrays of years and months
+    '''
+    years = np.asarray(years, dtype=np.int64)
+    months = np.asarray(months, dtype=np.int64)
+    if len(years) == 0:
+        return np.array([], dtype='datetime64[D]')
+
+    # Cache whole decades, so nearby calls share a table
+    start_year = int(years.min()) // 10 * 10
+    end_year = int(years.max()) // 10 * 10 + 9
+    table = kth_weekday_table(start_year, end_year, k, weekday_num)
+    dates = table[(years - start_year) * 12 + (months - 1)]
+    if np.isnat(dates).any():
+        raise IndexError('no weekday {0} number {1} in some of the months'.format(weekday_num, k))
+    return dates
+
+def imm_dates(years, months):
+    '''Third wednesday of each month
+    '''
+    return kth_weekday_of_months(years, months, 2, calendar.WEDNESDAY)
 
 
 
@@ -98,27 +339,26 @@ def process_df(df):
     df = expand_col(df, 'lastTradeDate')
     df = expand_col(df, 'priceChart')
 
-    df['year'] = df['expirationDate'].apply(lambda x: int(x[:4]))
-    df['month'] = df['expirationDate'].apply(lambda x: int(x[4:6]))
+    # Only the leading YYYYMM is used, so codes without a day still work
+    expiration = df['expirationDate'].astype(str)
+    df['year'] = expiration.str[:4].astype(np.int64)
+    df['month'] = expiration.str[4:6].astype(np.int64)
 
-    js = df.apply(lambda row: kth_weekday_of_month(row['year'], row['month'], 2, calendar.WEDNESDAY), axis=1)
-    js = np.where(
-        df['productCode'] == 'SR1',
-        df['expirationDate'],
-        js,
-    )
+    js = imm_dates(df['year'], df['month'])
+    # SR1 accrues from its expiration date, which is only parsed for those rows
+    sr1 = (df['productCode'] == 'SR1').to_numpy()
+    if sr1.any():
+        js[sr1] = pd.to_datetime(expiration[sr1], format='%Y%m%d').to_numpy('datetime64[D]')
 
     df['firstFixingDate'] = js
     df['firstFixingDate'] = pd.to_datetime(df['firstFixingDate']).dt.date
     df['lastTradeDate'] = pd.to_datetime(df['dateOnlyLongFormat']).dt.date
     df['finalSettlementDate'] = df['lastTradeDate'] + datetime.timedelta(days=1)
 
-    df['mark'] = np.where(df['close'] == '-', df['last'], df['close'])
-    df['mark'] = np.where(df['mark'] == '-', df['priorSettle'], df['mark'])
-
-    df['mark'] = pd.to_numeric(df['mark'], errors='coerce')
+    # Close, else last, else prior settle; works on raw strings or type_quotes output
+    df['mark'] = quote_numbers(df['close']).fillna(quote_numbers(df['last'])).fillna(quote_numbers(df['priorSettle']))
 
-    df = df.loc[ ~df['mark'].isna() ]
+    df = df.loc[ ~df['mark'].isna() ].copy()
     
     df['markRate'] = 100 - df['mark'].astype(float)
 
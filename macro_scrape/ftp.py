@@ -2,6 +2,14 @@ import logging
 from collections import namedtuple
 from typing import Optional
 import urllib
+import json
+import threading
+import time
+import atexit
+import contextlib
+import ftplib
+import dataclasses
+import concurrent.futures
 
 from dateutil import parser
 import datetime
@@ -16,6 +24,11 @@ import pytz
 
 import tempfile
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 log = logging.getLogger(__name__)
 
 def login(
@@ -27,34 +40,377 @@ def login(
     host = resource.netloc
     log.info('Logging into remote resource {0}'.format(host))
 
-    ftp = FTP(host)
+    ftp = FTP()
+    ftp.connect(resource.hostname, resource.port or 21)
     ftp.login(user, password)
     
     log.info('Success, I think')
     return ftp
 
 
+def parse_ftp_time(timestamp: str, tzinfo=None) -> datetime.datetime:
+    '''Parse an MDTM reply or MLSD modify fact, which are UTC (RFC 3659).
+    With tzinfo the time is converted to that zone.
+    '''
+    dt = parser.parse(timestamp).replace(tzinfo=datetime.timezone.utc)
+    if tzinfo is not None:
+        dt = dt.astimezone(tzinfo)
+    return dt
+
+
 def last_modified(ftp: FTP, file_path: str , method: str ='mdtm', tzinfo=None):
-    '''Method should be one of mdtm or mlsd
+    '''Method should be one of mdtm or mlsd.
+    Both report UTC (RFC 3659); with tzinfo the time is converted to that zone.
     '''
     if method == 'mdtm':
         timestamp = ftp.voidcmd("MDTM {}".format(file_path))[4:].strip()
-        dt = parser.parse(timestamp)
     elif method == 'mlsd':
         tst = '{}'.format(file_path)
         for file in ftp.mlsd(''):
             if file[0] == tst:
                 timestamp = file[1]['modify']
-                dt = parser.parse(timestamp)
     else:
         raise RuntimeError('method invalid: {0}'.format(method))
     
-    if tzinfo is not None:
-        dt = dt.replace(tzinfo=tzinfo)
+    dt = parse_ftp_time(timestamp, tzinfo)
     log.info('remote file {0} last modified {1}'.format(file_path, dt))
     return dt
-    
-    
+
+
+def remote_size(ftp: FTP, file_path: str) -> Optional[int]:
+    '''Size of the remote file in bytes, or None if the server won't say
+    '''
+    try:
+        ftp.voidcmd('TYPE I')
+        return ftp.size(file_path)
+    except Exception:
+        log.debug('remote file {0} size unavailable'.format(file_path))
+        return None
+
+
+
+class FTPCache:
+    '''Persistent on-disk cache of downloaded FTP files.
+
+    Entries are validated against the remote modified timestamp and file size,
+    so an unchanged remote file is never fetched twice. Once the cache grows past
+    max_bytes, least recently used files are evicted.
+
+    The index is read and rewritten under a lock file, so several processes can share
+    one cache directory. Where fcntl is unavailable (Windows) it is only safe for
+    threads of a single process.
+    '''
+    index_name = 'index.json'
+
+    def __init__(self, root: str, max_bytes: Optional[int] = None) -> None:
+        self.root       = os.path.abspath(os.path.expanduser(root))
+        self.max_bytes  = max_bytes
+        self._lock      = threading.RLock()
+        pathlib.Path(self.root).mkdir(parents=True, exist_ok=True)
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.root, self.index_name)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        '''Hold the thread lock, and the index lock file across processes
+        '''
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.index_path + '.lock', 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_index(self) -> typing.Dict[str, typing.Dict]:
+        try:
+            with open(self.index_path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write_index(self, index: typing.Dict[str, typing.Dict]) -> None:
+        tmp_path = '{0}.{1}.tmp'.format(self.index_path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def key(self, fname: str) -> str:
+        return os.path.relpath(fname, self.root)
+
+    def lookup(self, fname: str) -> Optional[typing.Dict]:
+        with self._locked():
+            return self._read_index().get(self.key(fname))
+
+    def is_fresh(self, fname: str, modified: datetime.datetime, size: Optional[int]) -> bool:
+        entry = self.lookup(fname)
+        if entry is None or not pathlib.Path(fname).exists():
+            return False
+        if entry['modified'] != modified.isoformat():
+            log.debug('cached file {0} is stale'.format(fname))
+            return False
+        if size is not None and entry['size'] != size:
+            log.debug('cached file {0} size differs from remote'.format(fname))
+            return False
+        return True
+
+    def record(self, fname: str, modified: Optional[datetime.datetime], size: Optional[int]) -> None:
+        with self._locked():
+            index = self._read_index()
+            index[self.key(fname)] = {
+                'modified'      : None if modified is None else modified.isoformat(),
+                'size'          : os.path.getsize(fname) if size is None else size,
+                'last_access'   : time.time(),
+            }
+            self._evict(index, keep=self.key(fname))
+            self._write_index(index)
+
+    def touch(self, fname: str) -> None:
+        with self._locked():
+            index = self._read_index()
+            entry = index.get(self.key(fname))
+            if entry is not None:
+                entry['last_access'] = time.time()
+                self._write_index(index)
+
+    def total_bytes(self) -> int:
+        with self._locked():
+            return sum(entry['size'] for entry in self._read_index().values())
+
+    def _evict(self, index: typing.Dict[str, typing.Dict], keep: Optional[str] = None) -> None:
+        if self.max_bytes is None:
+            return
+        total = sum(entry['size'] for entry in index.values())
+        by_age = sorted(index.items(), key=lambda kv: kv[1]['last_access'])
+        for key, entry in by_age:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            log.info('evicting cached file {0} ({1:,} bytes)'.format(key, entry['size']))
+            try:
+                os.remove(os.path.join(self.root, key))
+            except FileNotFoundError:
+                pass
+            total -= entry['size']
+            del index[key]
+
+    def clear(self) -> None:
+        with self._locked():
+            for key in self._read_index():
+                try:
+                    os.remove(os.path.join(self.root, key))
+                except FileNotFoundError:
+                    pass
+            self._write_index({})
+
+
+# Errors after which a pooled connection is thrown away and the command retried on a fresh one.
+# Only socket-level failures: local disk errors (ENOSPC, EACCES) are plain OSErrors and must not
+# cost a healthy connection and a second download.
+reconnect_errors = (ftplib.error_temp, EOFError, ConnectionError, TimeoutError)
+
+
+class FTPConnectionPool:
+    '''Pool of logged-in FTP control connections, keyed by (host, user).
+
+    At most max_connections are checked out per key at once; acquire waits up to
+    acquire_timeout seconds for one to free up, then falls back to a connection outside
+    the pool, which is closed on release. That keeps a resource that never logged out
+    from deadlocking everyone after it. Idle connections are kept alive with NOOP every
+    keepalive_interval seconds and closed once they have sat unused for idle_timeout seconds.
+    '''
+
+    def __init__(self,
+        max_connections     : int   = 4,
+        idle_timeout        : float = 120.0,
+        keepalive_interval  : float = 30.0,
+        acquire_timeout     : float = 30.0,
+    ) -> None:
+        self.max_connections    = max_connections
+        self.idle_timeout       = idle_timeout
+        self.keepalive_interval = keepalive_interval
+        self.acquire_timeout    = acquire_timeout
+
+        self._lock              = threading.Lock()
+        self._idle              = {}
+        self._slots             = {}
+        self._unpooled          = set()
+        self._keepalive_thread  = None
+
+    @staticmethod
+    def get_key(resource: namedtuple, user: str) -> typing.Tuple[str, str]:
+        return (resource.netloc, user)
+
+    def _get_slots(self, key) -> threading.BoundedSemaphore:
+        with self._lock:
+            if key not in self._slots:
+                self._slots[key] = threading.BoundedSemaphore(self.max_connections)
+            return self._slots[key]
+
+    @staticmethod
+    def _close(ftp: FTP) -> None:
+        try:
+            ftp.quit()
+        except Exception:
+            ftp.close()
+
+    @staticmethod
+    def _is_alive(ftp: FTP) -> bool:
+        try:
+            ftp.voidcmd('NOOP')
+            return True
+        except ftplib.all_errors:
+            log.debug('pooled FTP connection went stale')
+            return False
+
+    def acquire(self, resource: namedtuple, user: str = '', password: str = '', timeout: Optional[float] = None) -> FTP:
+        key = self.get_key(resource, user)
+        timeout = self.acquire_timeout if timeout is None else timeout
+        if not self._get_slots(key).acquire(timeout=timeout):
+            log.warning('No pooled FTP connection to {0} freed up within {1}s, opening an unpooled one'.format(key[0], timeout))
+            ftp = login(resource, user, password)
+            with self._lock:
+                self._unpooled.add(ftp)
+            return ftp
+
+        try:
+            while True:
+                with self._lock:
+                    idle = self._idle.get(key)
+                    if not idle:
+                        break
+                    ftp, last_used = idle.pop()
+
+                idle_for = time.monotonic() - last_used
+                if idle_for > self.idle_timeout:
+                    self._close(ftp)
+                elif idle_for < self.keepalive_interval or self._is_alive(ftp):
+                    log.debug('reusing pooled FTP connection to {0}'.format(key[0]))
+                    return ftp
+
+            return login(resource, user, password)
+        except BaseException:
+            self._get_slots(key).release()
+            raise
+
+    def release(self, resource: namedtuple, user: str, ftp: FTP, discard: bool = False) -> None:
+        key = self.get_key(resource, user)
+        with self._lock:
+            unpooled = ftp in self._unpooled
+            self._unpooled.discard(ftp)
+        if unpooled:
+            self._close(ftp)
+            return
+        if discard:
+            self._close(ftp)
+        else:
+            with self._lock:
+                self._idle.setdefault(key, []).append((ftp, time.monotonic()))
+            self._start_keepalive()
+        self._get_slots(key).release()
+
+    @contextlib.contextmanager
+    def connection(self, resource: namedtuple, user: str = '', password: str = ''):
+        ftp = self.acquire(resource, user, password)
+        discard = False
+        try:
+            yield ftp
+        except reconnect_errors:
+            discard = True
+            raise
+        finally:
+            self.release(resource, user, ftp, discard=discard)
+
+    def keepalive(self) -> None:
+        '''Close idle connections past idle_timeout and NOOP the rest.
+        Each connection is checked out through its key's slots while it is checked, so the
+        others stay available to acquire and the per-host count never goes over.
+        '''
+        with self._lock:
+            counts = {key: len(idle) for key, idle in self._idle.items() if idle}
+
+        for key, count in counts.items():
+            slots = self._get_slots(key)
+            for _ in range(count):
+                # Every slot busy means the idle connections are about to be reused anyway
+                if not slots.acquire(blocking=False):
+                    break
+                try:
+                    with self._lock:
+                        idle = self._idle.get(key)
+                        if not idle:
+                            break
+                        ftp, last_used = idle.pop(0)
+
+                    if time.monotonic() - last_used > self.idle_timeout:
+                        log.debug('closing idle FTP connection to {0}'.format(key[0]))
+                        self._close(ftp)
+                    elif self._is_alive(ftp):
+                        with self._lock:
+                            self._idle.setdefault(key, []).append((ftp, last_used))
+                finally:
+                    slots.release()
+
+    def _keepalive_loop(self) -> None:
+        while True:
+            time.sleep(self.keepalive_interval)
+            self.keepalive()
+            with self._lock:
+                if not any(self._idle.values()):
+                    self._keepalive_thread = None
+                    return
+
+    def _start_keepalive(self) -> None:
+        with self._lock:
+            if self._keepalive_thread is None:
+                self._keepalive_thread = threading.Thread(
+                    target=self._keepalive_loop, name='ftp-keepalive', daemon=True,
+                )
+                self._keepalive_thread.start()
+
+    def close_all(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for key, conns in idle.items():
+            for ftp, _ in conns:
+                log.debug('closing FTP connection to {0}'.format(key[0]))
+                self._close(ftp)
+
+
+default_pool = FTPConnectionPool()
+atexit.register(default_pool.close_all)
+
+
+# Set MACRO_SCRAPE_CACHE_DIR to make every FTPResource use a persistent cache by default
+default_cache_dir = os.environ.get('MACRO_SCRAPE_CACHE_DIR')
+default_cache_max_bytes = int(os.environ.get('MACRO_SCRAPE_CACHE_MAX_BYTES', 2 * 1024**3))
+
+
+@dataclasses.dataclass
+class DownloadResult:
+    suffix  : Optional[str]
+    fname   : Optional[str]             = None
+    n_bytes : int                       = 0
+    seconds : float                     = 0.0
+    cached  : bool                      = False
+    error   : Optional[BaseException]   = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def throughput(self) -> float:
+        '''Bytes per second
+        '''
+        return self.n_bytes / self.seconds if self.seconds > 0 else float('nan')
+
 
 
 class FTPResource:
@@ -63,11 +419,19 @@ class FTPResource:
         uri     : str,
         user    : str       = '',
         password: str       = '',
-        tzinfo  : typing.Optional[pytz.tzinfo.BaseTzInfo]   = None
+        tzinfo  : typing.Optional[pytz.tzinfo.BaseTzInfo]   = None,
+        cache   : typing.Optional[typing.Union[FTPCache, str]] = None,
+        pool    : typing.Optional[FTPConnectionPool] = None,
     ) -> None:
-        self._tmp_dir_obj   = tempfile.TemporaryDirectory()
+        if cache is None and default_cache_dir is not None:
+            cache = default_cache_dir
+        if isinstance(cache, str):
+            cache = FTPCache(cache, max_bytes=default_cache_max_bytes)
+        self.cache          = cache
+        self._tmp_dir_obj   = tempfile.TemporaryDirectory() if cache is None else None
 
         self.ftp        = None
+        self.pool       = default_pool if pool is None else pool
         self.uri        = uri
         self.user       = user
         self.tmp_dir    = None
@@ -79,26 +443,75 @@ class FTPResource:
             self.tzinfo = tzinfo
 
     def __enter__(self,):
-        self.tmp_dir = self._tmp_dir_obj.__enter__()
-        log.debug('Using temp directory {0}'.format(self.tmp_dir))
+        if self.cache is not None:
+            self.tmp_dir = self.cache.root
+            log.debug('Using cache directory {0}'.format(self.tmp_dir))
+        else:
+            self.tmp_dir = self._tmp_dir_obj.__enter__()
+            log.debug('Using temp directory {0}'.format(self.tmp_dir))
         return self
 
     def __exit__(self,*args, **kwargs):
+        self.logout()
+        if self.cache is not None:
+            return None
         log.debug('Cleaning up temp directory {0}'.format(self.tmp_dir))
         return self._tmp_dir_obj.__exit__(*args,**kwargs)
-        
+
 
     def login(self) -> None:
+        '''Pin a pooled connection to this resource until logout(), for callers that use
+        self.ftp directly. Nothing else needs it: every command checks a connection out of
+        the pool for just that command, so a resource left unclosed holds no pool slot.
+        '''
         if self.ftp is None:
-            self.ftp = login(self.resource, self.user, self.password)
+            self.ftp = self.pool.acquire(self.resource, self.user, self.password)
+
+    def logout(self, discard: bool = False) -> None:
+        '''Hand a pinned connection back to the pool, or close it if it's broken
+        '''
+        if self.ftp is not None:
+            ftp, self.ftp = self.ftp, None
+            self.pool.release(self.resource, self.user, ftp, discard=discard)
+
+    def _pooled(self, fn: typing.Callable[[FTP], typing.Any]) -> typing.Any:
+        '''Run fn on a connection checked out of the pool for this call only, retrying once
+        on a fresh one if the server dropped it
+        '''
+        for attempt in range(2):
+            try:
+                with self.pool.connection(self.resource, self.user, self.password) as ftp:
+                    return fn(ftp)
+            except reconnect_errors as e:
+                if attempt:
+                    raise
+                log.warning('FTP command failed with {0!r}, reconnecting'.format(e))
+
+    def _retrying(self, fn: typing.Callable[[FTP], typing.Any]) -> typing.Any:
+        '''Run fn on the pinned connection if there is one, otherwise on a pooled one
+        '''
+        if self.ftp is None:
+            return self._pooled(fn)
+        try:
+            return fn(self.ftp)
+        except reconnect_errors as e:
+            log.warning('FTP command failed with {0!r}, reconnecting'.format(e))
+            self.logout(discard=True)
+            self.login()
+            return fn(self.ftp)
 
 
-    def last_modified(self, suffix: Optional[str]= None) -> datetime.datetime:
-        self.login()
-        fname = self.resource.path
+    def get_remote_path(self, suffix: Optional[str] = None) -> str:
+        remote_path = self.resource.path
         if suffix is not None:
-            fname = os.path.join(fname, suffix)
-        return last_modified(self.ftp, file_path=fname, tzinfo = self.tzinfo)
+            remote_path = os.path.join( remote_path, suffix )
+        return remote_path
+
+    def last_modified(self, suffix: Optional[str]= None) -> datetime.datetime:
+        return self._retrying(lambda ftp: last_modified(ftp, file_path=self.get_remote_path(suffix), tzinfo = self.tzinfo))
+
+    def remote_size(self, suffix: Optional[str] = None) -> Optional[int]:
+        return self._retrying(lambda ftp: remote_size(ftp, self.get_remote_path(suffix)))
     
     def get_fname(self, suffix: Optional[str] = None):
         fname = os.path.join(
@@ -109,42 +522,151 @@ class FTPResource:
             fname = os.path.join(fname, suffix)
         return fname
     
-    def download_file(self, suffix: Optional[str] = None ) -> None:
-        self.login()
+    def _fetch(self, ftp: FTP, suffix: Optional[str] = None, skip_fresh: bool = False) -> DownloadResult:
+        '''Download one file over the given connection into our local directory
+        '''
         fname = self.get_fname(suffix)
+        remote_path = self.get_remote_path(suffix)
+
+        # Stat before fetching, so a file modified mid-download is refetched next time
+        modified = size = None
+        if self.cache is not None:
+            modified = last_modified(ftp, file_path=remote_path, tzinfo=self.tzinfo)
+            size = remote_size(ftp, remote_path)
+            if skip_fresh and self.cache.is_fresh(fname, modified, size):
+                log.info('Cached copy of remote file {0} is current'.format(remote_path))
+                return DownloadResult(suffix=suffix, fname=fname, n_bytes=os.path.getsize(fname), cached=True)
 
-        self.login()
         # Ensure path exists
         pathlib.Path(os.path.dirname(fname)).mkdir(parents=True, exist_ok=True)
 
-        remote_path = self.resource.path
-        if suffix is not None:
-            remote_path = os.path.join( remote_path, suffix )
-
         remote_cmd = 'RETR {0}'.format( remote_path )
-        with open(fname, 'wb') as local_file:
-            log.info('Downloading remote file {0}'.format(remote_path))
-            t0 = datetime.datetime.now()
-            self.ftp.retrbinary(remote_cmd, local_file.write)
-            t1 = datetime.datetime.now()
-            log.info('Finished Downloading remote file {0} in {1:,.3f}s'.format(remote_path, (t1-t0).total_seconds()))
-            
-        
-        if not self.local_copy_exists(suffix):
+        # Unique per download, so processes sharing a cache never write into each other's file
+        fd, part_fname = tempfile.mkstemp(dir=os.path.dirname(fname), prefix='.{0}.'.format(os.path.basename(fname)), suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as local_file:
+                log.info('Downloading remote file {0}'.format(remote_path))
+                t0 = time.monotonic()
+                ftp.retrbinary(remote_cmd, local_file.write)
+                t1 = time.monotonic()
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(part_fname)
+            raise
+        os.replace(part_fname, fname)
+
+        result = DownloadResult(suffix=suffix, fname=fname, n_bytes=os.path.getsize(fname), seconds=t1-t0)
+        log.info('Finished Downloading remote file {0} in {1:,.3f}s ({2:,.0f} KB/s)'.format(
+            remote_path, result.seconds, result.throughput / 1024
+        ))
+
+        if self.cache is not None:
+            self.cache.record(fname, modified, size)
+
+        return result
+
+    def download_file(self, suffix: Optional[str] = None ) -> None:
+        result = self._retrying(lambda ftp: self._fetch(ftp, suffix))
+
+        if not pathlib.Path(result.fname).exists():
             raise ConnectionError('No file downloaded: no local copy exists')
         else:
-            log.exception('local file found')
-        
-        return fname
+            log.debug('local file found')
+
+        return result.fname
+
+    def open_remote(self, suffix: Optional[str] = None, max_memory: int = 64 * 1024**2) -> typing.BinaryIO:
+        '''Binary file object holding the remote file, without writing it into our directory.
+        The download is spooled in memory, spilling to a temp file past max_memory bytes.
+        With a cache, the cached copy is refreshed if needed and opened instead.
+        '''
+        if self.cache is not None:
+            if not self.local_copy_exists(suffix):
+                self.download_file(suffix)
+            fname = self.get_fname(suffix)
+            self.cache.touch(fname)
+            return open(fname, 'rb')
+
+        remote_path = self.get_remote_path(suffix)
+        buf = tempfile.SpooledTemporaryFile(max_size=max_memory)
+
+        def retrieve(ftp: FTP) -> None:
+            buf.seek(0)
+            buf.truncate()
+            log.info('Streaming remote file {0}'.format(remote_path))
+            ftp.retrbinary('RETR {0}'.format(remote_path), buf.write)
+
+        self._retrying(retrieve)
+        buf.seek(0)
+        return buf
+
+    def to_suffix(self, item: str) -> str:
+        '''Accept either a suffix under our path, or a full URI on the same host
+        '''
+        if '://' not in item:
+            return item
+        resource = urllib.parse.urlparse(item)
+        if resource.netloc != self.resource.netloc:
+            raise ValueError('{0} is not on host {1}'.format(item, self.resource.netloc))
+        suffix = os.path.relpath(resource.path, self.resource.path)
+        if suffix.startswith('..'):
+            raise ValueError('{0} is not under {1}'.format(item, self.uri))
+        return suffix
+
+    def download_many(self,
+        items       : typing.Iterable[str],
+        max_workers : Optional[int] = None,
+        skip_fresh  : bool          = True,
+    ) -> typing.List[DownloadResult]:
+        '''Download many files under this resource concurrently.
+        Items are suffixes or full URIs on the same host. At most max_workers transfers
+        (default: the pool's per-host connection cap) run at once. A failed file is reported
+        in its DownloadResult rather than aborting the batch.
+        '''
+        if self.tmp_dir is None:
+            raise RuntimeError('download_many must be called inside the resource context')
+
+        suffixes = list(dict.fromkeys(self.to_suffix(item) for item in items))
+        if max_workers is None:
+            max_workers = self.pool.max_connections
+
+        # Don't hold a pinned connection while the workers wait on the pool
+        self.logout()
+
+        def fetch(suffix: str) -> DownloadResult:
+            try:
+                return self._pooled(lambda ftp: self._fetch(ftp, suffix, skip_fresh=skip_fresh))
+            except Exception as e:
+                log.error('Failed to download {0}: {1!r}'.format(self.get_remote_path(suffix), e))
+                return DownloadResult(suffix=suffix, error=e)
+
+        t0 = time.monotonic()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(fetch, suffixes))
+        t1 = time.monotonic()
+
+        n_bytes = sum(r.n_bytes for r in results if not r.cached)
+        log.info('Downloaded {0} of {1} files ({2} cached, {3} failed), {4:,} bytes in {5:,.3f}s'.format(
+            sum(r.ok and not r.cached for r in results), len(results),
+            sum(r.cached for r in results), sum(not r.ok for r in results),
+            n_bytes, t1-t0,
+        ))
+        return results
 
     def local_copy_exists(self, suffix: Optional[str] = None) -> bool:
+        '''With a cache, a local copy only counts if it matches the remote timestamp and size
+        '''
         fname = self.get_fname(suffix)
         exists = pathlib.Path(fname).exists()
+        if exists and self.cache is not None:
+            return self.cache.is_fresh(fname, self.last_modified(suffix), self.remote_size(suffix))
         return exists
 
     def load_from_local(self, suffix: Optional[str] = None) -> pd.DataFrame:
-        if self.local_copy_exists(suffix):
-            fname = self.get_fname(suffix)
+        fname = self.get_fname(suffix)
+        if pathlib.Path(fname).exists():
+            if self.cache is not None:
+                self.cache.touch(fname)
             return self._process(fname)
         else:
             raise FileNotFoundError('No local copy exists')
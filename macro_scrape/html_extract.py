@@ -0,0 +1,133 @@
+'''Targeted extraction from scraped HTML pages.
+
+The scrapers only ever need one table or one hidden form field out of a page, so
+building a full BeautifulSoup tree is wasted work. Tables are pulled with
+selectolax or lxml when installed, falling back to BeautifulSoup restricted by a
+SoupStrainer; hidden inputs are found with a regex scan that stops at the first
+matching tag.
+'''
+import re
+import html
+import typing
+import functools
+import pandas as pd
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    try:
+        # selectolax before 1.0
+        from selectolax.parser import HTMLParser
+    except ImportError:
+        HTMLParser = None
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+
+Table = typing.Tuple[typing.Optional[typing.List[str]], typing.List[typing.List[str]]]
+
+parsers = [
+    name for name, available in (
+        ('selectolax', HTMLParser is not None),
+        ('lxml', lxml is not None),
+        ('bs4', True),
+    )
+    if available
+]
+default_parser = parsers[0]
+
+
+@functools.lru_cache(maxsize=None)
+def _hidden_input_pattern(name: str) -> typing.Pattern:
+    return re.compile(
+        r'<input\b[^>]*\bname\s*=\s*["\']?{0}["\'\s/>][^>]*>'.format(re.escape(name)),
+        re.IGNORECASE,
+    )
+
+_value_pattern = re.compile(r'''\bvalue\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))''', re.IGNORECASE)
+_hidden_pattern = re.compile(r'''\btype\s*=\s*["']?hidden\b''', re.IGNORECASE)
+
+
+def hidden_input_value(text: str, name: str) -> typing.Optional[str]:
+    '''Value of the first <input type="hidden" name=name>, or None if the page has none
+    '''
+    for match in _hidden_input_pattern(name).finditer(text):
+        tag = match.group(0)
+        if not _hidden_pattern.search(tag):
+            continue
+        value = _value_pattern.search(tag)
+        if value is None:
+            return ''
+        return html.unescape(next(group for group in value.groups() if group is not None))
+    return None
+
+
+def _has_classes(classes: typing.Sequence[str]) -> str:
+    return ' and '.join(
+        'contains(concat(" ", normalize-space(@class), " "), " {0} ")'.format(cls)
+        for cls in classes
+    )
+
+
+def _table_selectolax(text: str, container: str, classes: typing.Sequence[str]) -> typing.Optional[Table]:
+    table = HTMLParser(text).css_first('{0}{1} table'.format(container, ''.join('.' + cls for cls in classes)))
+    if table is None:
+        return None
+    thead = table.css_first('thead')
+    columns = None if thead is None else [cell.text() for cell in thead.css('th')]
+    rows = [[cell.text().strip() for cell in row.css('td')] for row in table.css('tr')]
+    return columns, rows
+
+
+def _table_lxml(text: str, container: str, classes: typing.Sequence[str]) -> typing.Optional[Table]:
+    tables = lxml.html.fromstring(text).xpath('//{0}[{1}]//table'.format(container, _has_classes(classes)))
+    if not tables:
+        return None
+    table = tables[0]
+    thead = table.find('.//thead')
+    columns = None if thead is None else [cell.text_content() for cell in thead.iter('th')]
+    rows = [[cell.text_content().strip() for cell in row.iter('td')] for row in table.iter('tr')]
+    return columns, rows
+
+
+def _table_bs4(text: str, container: str, classes: typing.Sequence[str]) -> typing.Optional[Table]:
+    wanted = set(classes)
+    strainer = SoupStrainer(container, class_=lambda cls: cls is not None and wanted.issubset(cls.split()))
+    soup = BeautifulSoup(text, 'html.parser', parse_only=strainer)
+    table = soup.find('table')
+    if table is None:
+        return None
+    thead = table.find('thead')
+    columns = None if thead is None else [cell.text for cell in thead.find_all('th')]
+    rows = [[cell.text.strip() for cell in row.find_all('td')] for row in table.find_all('tr')]
+    return columns, rows
+
+
+table_extractors = {
+    'selectolax'    : _table_selectolax,
+    'lxml'          : _table_lxml,
+    'bs4'           : _table_bs4,
+}
+
+
+def extract_table(
+    text        : str,
+    container   : str                   = 'div',
+    classes     : typing.Sequence[str]  = (),
+    parser      : typing.Optional[str]  = None,
+) -> typing.Optional[pd.DataFrame]:
+    '''First <table> inside a container element carrying all of classes, as a frame of cell text.
+    Header cells come from <thead>; every <tr> becomes a row of its <td> cells.
+    Returns None if no such table exists. parser picks a backend from parsers,
+    defaulting to the fastest one installed.
+    '''
+    table = table_extractors[parser or default_parser](text, container, classes)
+    if table is None:
+        return None
+    columns, rows = table
+    return pd.DataFrame(rows, columns=columns or None)
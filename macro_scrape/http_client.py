@@ -0,0 +1,124 @@
+'''One place to build the httpx clients the async scrapers share.
+
+make_client() returns an AsyncClient with the browser headers from headers.py, pooled
+keepalive connections, retries of failed connection attempts, HTTP/2 when the h2 package
+is installed, and an optional cap on concurrent requests per host. Every loader accepts a
+client, so one client, and its open TLS connections, can serve CME, NY Fed, Barchart and
+ANNA requests in the same refresh:
+
+    async with make_client() as client:
+        await asyncio.gather(sofr_req.load(client=client), ois_req.load(client=client))
+
+httpx has no DNS cache of its own; hosts are resolved when a pooled connection is opened,
+so keeping connections alive is what avoids repeated lookups.
+'''
+import logging
+import asyncio
+import typing
+import importlib.util
+import httpx
+
+from .headers import headers as browser_headers
+
+log = logging.getLogger(__name__)
+
+
+http2_available = importlib.util.find_spec('h2') is not None
+brotli_available = any(importlib.util.find_spec(name) is not None for name in ('brotli', 'brotlicffi'))
+
+default_limits = httpx.Limits(
+    max_connections             = 100,
+    max_keepalive_connections   = 20,
+    keepalive_expiry            = 60.0,
+)
+
+
+def default_headers() -> typing.Dict[str, str]:
+    '''headers.headers, without advertising brotli when httpx can't decode it
+    '''
+    headers = dict(browser_headers)
+    if not brotli_available:
+        encodings = [enc.strip() for enc in headers.get('Accept-Encoding', '').split(',')]
+        headers['Accept-Encoding'] = ', '.join(enc for enc in encodings if enc and enc != 'br')
+    return headers
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    '''Response body that frees its host slot once the body is closed
+    '''
+
+    def __init__(self, stream: httpx.AsyncByteStream, release: typing.Callable[[], None]) -> None:
+        self._stream    = stream
+        self._release   = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._release is not None:
+                self._release()
+                self._release = None
+
+
+class HostLimitedTransport(httpx.AsyncBaseTransport):
+    '''Wraps a transport so at most max_per_host requests to one host are open at a time.
+    A slot is held until the response body has been read or closed.
+    '''
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, max_per_host: int) -> None:
+        self._transport     = transport
+        self.max_per_host   = max_per_host
+        self._semaphores    = {}
+
+    def _semaphore(self, host: str) -> asyncio.Semaphore:
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.max_per_host)
+        return self._semaphores[host]
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        semaphore = self._semaphore(request.url.host)
+        await semaphore.acquire()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            semaphore.release()
+            raise
+        if isinstance(response.stream, httpx.ByteStream):
+            # Body is already in memory and httpx won't close it
+            semaphore.release()
+        else:
+            response.stream = _ReleasingStream(response.stream, semaphore.release)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def make_client(
+    timeout         : float                         = 10.0,
+    headers         : typing.Optional[typing.Dict]  = None,
+    http2           : typing.Optional[bool]         = None,
+    retries         : int                           = 2,
+    limits          : httpx.Limits                  = default_limits,
+    max_per_host    : typing.Optional[int]          = None,
+    **kwargs,
+) -> httpx.AsyncClient:
+    '''AsyncClient for the scrapers. http2 defaults to whether h2 is installed; retries
+    counts reattempts of failed connects. Other keyword arguments go to httpx.AsyncClient.
+    '''
+    if http2 is None:
+        http2 = http2_available
+    transport = httpx.AsyncHTTPTransport(http2=http2, retries=retries, limits=limits)
+    if max_per_host is not None:
+        transport = HostLimitedTransport(transport, max_per_host)
+    log.debug('new client, http2={0}, brotli={1}'.format(http2, brotli_available))
+    return httpx.AsyncClient(
+        headers     = default_headers() if headers is None else headers,
+        timeout     = timeout,
+        transport   = transport,
+        **kwargs,
+    )
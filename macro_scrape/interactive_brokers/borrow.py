@@ -31,6 +31,7 @@ class IBBorrowFTPResource(FTPResource):
 
 def get_ib_borrow_ftp_client (
     country: str ='usa',
+    cache = None,
     ) -> IBBorrowFTPResource:
 
     country = country.lower()
@@ -40,6 +41,7 @@ def get_ib_borrow_ftp_client (
         uri = 'ftp://ftp3.interactivebrokers.com/{}.txt'.format(country),
         user = 'shortstock',
         password = '',
+        cache = cache,
     )
 
     return client
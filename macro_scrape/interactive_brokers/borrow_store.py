@@ -0,0 +1,221 @@
+import logging
+log = logging.getLogger(__name__)
+
+import os
+import typing
+import datetime
+import threading
+import concurrent.futures
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+from .borrow import IBBorrowFTPResource, get_ib_borrow_ftp_client
+from ..store import JSONManifest, write_parquet, open_dataset, typed_columns
+
+
+value_cols = ['borrow', 'lend', 'available']
+
+
+def changed_symbols(old: pd.DataFrame, new: pd.DataFrame, columns: typing.Sequence[str] = value_cols) -> pd.Index:
+    '''Symbols in new that are missing from old, or whose values in columns differ
+    '''
+    common = new.index.intersection(old.index)
+    before = old.loc[common, columns].to_numpy(dtype=float)
+    after = new.loc[common, columns].to_numpy(dtype=float)
+    differs = ~((before == after) | (np.isnan(before) & np.isnan(after)))
+    return new.index.difference(old.index).append(common[differs.any(axis=1)])
+
+
+class IBBorrowStore:
+    '''Delta-encoded parquet history of IB borrow snapshots, one file per country and day.
+
+    The first snapshot of each US/Eastern day is stored in full as a keyframe. Every later
+    snapshot that day only adds rows for symbols whose borrow, lend or available changed,
+    and a 'removed' row for symbols that dropped out of the file. Snapshots are keyed by
+    the remote file's last_modified(), stored in UTC. The latest row per symbol at or before a time is the
+    state at that time, so an as-of query reads a single day file.
+    '''
+
+    def __init__(self, root: str) -> None:
+        self.root       = os.path.abspath(os.path.expanduser(root))
+        self.manifest   = JSONManifest(os.path.join(self.root, '_manifest.json'))
+        self._latest    = {}
+        self._lock      = threading.Lock()
+
+    def day_path(self, country: str, day: datetime.date) -> str:
+        return os.path.join(self.root, 'country={0}'.format(country.lower()), 'date={0}'.format(day.isoformat()), 'snapshots.parquet')
+
+    @staticmethod
+    def _timestamp(when) -> pd.Timestamp:
+        when = pd.Timestamp(when)
+        if when.tzinfo is None:
+            when = when.tz_localize(IBBorrowFTPResource.tzinfo)
+        return when.tz_convert('UTC')
+
+    @staticmethod
+    def _day(when: pd.Timestamp) -> datetime.date:
+        return when.tz_convert(IBBorrowFTPResource.tzinfo).date()
+
+    def days_stored(self, country: str) -> typing.Dict[datetime.date, pd.Timestamp]:
+        '''Stored days, with the time of each day's keyframe
+        '''
+        days = self.manifest.load().get(country.lower(), {}).get('days', {})
+        return {datetime.date.fromisoformat(day): pd.Timestamp(first) for day, first in sorted(days.items())}
+
+    def last_modified(self, country: str) -> typing.Optional[pd.Timestamp]:
+        '''Remote timestamp of the newest stored snapshot
+        '''
+        entry = self.manifest.load().get(country.lower())
+        return None if entry is None else pd.Timestamp(entry['last'])
+
+    def _read_day(self, country: str, day: datetime.date, filter=None) -> pd.DataFrame:
+        path = self.day_path(country, day)
+        if not os.path.exists(path):
+            return pd.DataFrame()
+        return ds.dataset(path, format='parquet').to_table(filter=filter).to_pandas()
+
+    @staticmethod
+    def _state(rows: pd.DataFrame) -> pd.DataFrame:
+        '''Latest row per symbol, without removed symbols, indexed by symbol
+        '''
+        if len(rows) == 0:
+            return rows
+        rows = rows.sort_values('timestamp', kind='stable').drop_duplicates('symbol', keep='last')
+        rows = rows.loc[~rows['removed']]
+        return rows.drop(columns=['removed', 'keyframe']).set_index('symbol').sort_index()
+
+    def append(self, country: str, modified: datetime.datetime, df: pd.DataFrame) -> int:
+        '''Store one snapshot (IBBorrowFTPResource output) taken at the remote modified time.
+        Returns the number of rows written, 0 if the snapshot is not newer than what's stored.
+        '''
+        country = country.lower()
+        when = self._timestamp(modified)
+        last = self.last_modified(country)
+        if last is not None and when <= last:
+            log.debug('{0} snapshot at {1} is already stored'.format(country, when))
+            return 0
+
+        day = self._day(when)
+        df = df.loc[~df.index.duplicated(keep='last')]
+        stored = self._read_day(country, day)
+        keyframe = len(stored) == 0
+
+        if keyframe:
+            rows = df.assign(removed=False)
+        else:
+            latest = self._latest.get(country)
+            previous = latest[1] if latest is not None and latest[0] == last else self._state(stored).drop(columns='timestamp')
+            removed = previous.index.difference(df.index)
+            rows = pd.concat([
+                df.loc[changed_symbols(previous, df)].assign(removed=False),
+                previous.loc[removed].assign(removed=True),
+            ])
+            rows.loc[rows['removed'], value_cols] = np.nan
+
+        rows = rows.rename_axis('symbol').reset_index()
+        rows.insert(0, 'timestamp', when)
+        rows['keyframe'] = keyframe
+        rows = pd.concat([stored, rows], ignore_index=True) if len(stored) else rows
+        # Sorted by symbol, so row-group statistics let single-symbol reads skip the rest.
+        # A column empty all day, like desc, is stored as text so every day file has the same schema
+        write_parquet(typed_columns(rows.sort_values(['symbol', 'timestamp'], kind='stable')), self.day_path(country, day))
+
+        n_rows = len(rows) - len(stored)
+        self._latest[country] = (when, df)
+        with self._lock:
+            manifest = self.manifest.load()
+            entry = manifest.setdefault(country, {'days': {}})
+            entry['days'].setdefault(day.isoformat(), when.isoformat())
+            entry['last'] = when.isoformat()
+            self.manifest.save(manifest)
+        log.info('stored {0} snapshot at {1}: {2:,} {3} rows'.format(country, when, n_rows, 'keyframe' if keyframe else 'changed'))
+        return n_rows
+
+    def asof(self,
+        country : str,
+        when    : typing.Optional[datetime.datetime] = None,
+        symbols : typing.Optional[typing.Iterable[str]] = None,
+    ) -> pd.DataFrame:
+        '''Borrow, lend and availability per symbol as of when (default: latest), indexed by
+        symbol. Naive times are US/Eastern. A 'timestamp' column says which snapshot each
+        value came from.
+        '''
+        country = country.lower()
+        when = self._timestamp(pd.Timestamp.now(tz='UTC') if when is None else when)
+        # Latest day whose keyframe is at or before when
+        days = [day for day, first in self.days_stored(country).items() if first <= when]
+        if not days:
+            return pd.DataFrame()
+
+        expr = ds.field('timestamp') <= when
+        if symbols is not None:
+            expr = expr & ds.field('symbol').isin(list(symbols))
+        return self._state(self._read_day(country, days[-1], expr))
+
+    def history(self,
+        country : str,
+        symbol  : str,
+        start   : typing.Optional[datetime.datetime] = None,
+        end     : typing.Optional[datetime.datetime] = None,
+    ) -> pd.DataFrame:
+        '''Every stored change to one symbol between start and end, indexed by snapshot time.
+        Values are NaN while the symbol was missing from the file.
+        '''
+        root = os.path.join(self.root, 'country={0}'.format(country.lower()))
+        if not os.path.exists(root):
+            return pd.DataFrame()
+
+        expr = ds.field('symbol') == symbol
+        if start is not None:
+            expr = expr & (ds.field('timestamp') >= self._timestamp(start))
+        if end is not None:
+            expr = expr & (ds.field('timestamp') <= self._timestamp(end))
+        df = open_dataset(root).to_table(filter=expr).to_pandas()
+        if len(df) == 0:
+            return df
+
+        df = df.sort_values('timestamp', kind='stable').set_index('timestamp')
+        # Each day's keyframe repeats the last value; keep only actual changes
+        values = df[value_cols].to_numpy(dtype=float)
+        same = (values[1:] == values[:-1]) | (np.isnan(values[1:]) & np.isnan(values[:-1]))
+        keep = np.concatenate([[True], ~same.all(axis=1)])
+        return df.loc[keep, ['removed'] + value_cols]
+
+    def update(self, client: IBBorrowFTPResource, country: str) -> int:
+        '''Download the country file if it's newer than the last stored snapshot and append it.
+        client must be an open IBBorrowFTPResource for the country.
+        '''
+        modified = client.last_modified()
+        last = self.last_modified(country)
+        if last is not None and self._timestamp(modified) <= last:
+            log.info('{0} borrow file unchanged since {1}'.format(country, last))
+            return 0
+        if not client.local_copy_exists():
+            client.download_file()
+        return self.append(country, modified, client.load_from_local())
+
+    def update_many(self,
+        countries   : typing.Iterable[str],
+        cache       = None,
+        max_workers : int = 4,
+    ) -> typing.Dict[str, typing.Union[int, BaseException]]:
+        '''update() for many countries over the shared FTP pool. Returns rows written, or the
+        error, per country.
+        '''
+        def update_one(country):
+            with get_ib_borrow_ftp_client(country=country, cache=cache) as client:
+                return self.update(client, country)
+
+        countries = [country.lower() for country in countries]
+        results = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(update_one, country): country for country in countries}
+            for future in concurrent.futures.as_completed(futures):
+                country = futures[future]
+                try:
+                    results[country] = future.result()
+                except Exception as e:
+                    log.warning('Failed to update {0}: {1!r}'.format(country, e))
+                    results[country] = e
+        return {country: results[country] for country in countries}
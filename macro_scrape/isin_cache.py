@@ -0,0 +1,102 @@
+import logging
+import os
+import json
+import time
+import typing
+import pathlib
+import sqlite3
+
+from .isin_lookup import SecuritySearchObj, search_key
+
+log = logging.getLogger(__name__)
+
+
+class ISINCache:
+    '''SQLite cache of ANNA search results, keyed by search_key of the search.
+
+    Searches that found nothing are cached too, for the shorter negative_ttl, so
+    repeated lookups of unknown ISINs don't go back to the service. The database
+    runs in WAL mode, so several worker processes can share one file.
+    '''
+
+    def __init__(self,
+        path            : str,
+        ttl             : float = 7 * 86400.0,
+        negative_ttl    : float = 86400.0,
+    ) -> None:
+        self.path           = os.path.abspath(os.path.expanduser(path))
+        self.ttl            = ttl
+        self.negative_ttl   = negative_ttl
+        self._conn          = None
+        self._pid           = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # Connections can't be shared across a fork
+        if self._conn is None or self._pid != os.getpid():
+            pathlib.Path(os.path.dirname(self.path)).mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS searches ('
+                'key TEXT PRIMARY KEY, fetched REAL NOT NULL, found INTEGER NOT NULL, records TEXT NOT NULL)'
+            )
+            self._pid = os.getpid()
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def is_fresh(self, fetched: float, found: bool, now: typing.Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        return now - fetched < (self.ttl if found else self.negative_ttl)
+
+    def get_many(self, search_objs: typing.Iterable[SecuritySearchObj]) -> typing.Dict[str, typing.List[typing.Dict]]:
+        '''Fresh cached records for each search that has them, keyed by search_key.
+        A cached miss maps to an empty list; searches missing from the result need a lookup.
+        '''
+        keys = list(dict.fromkeys(search_key(search_obj) for search_obj in search_objs))
+        now = time.time()
+        cached = {}
+        # Stay under SQLite's bound parameter limit
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i+500]
+            rows = self.conn.execute(
+                'SELECT key, fetched, found, records FROM searches WHERE key IN ({0})'.format(','.join('?' * len(batch))),
+                batch,
+            )
+            for key, fetched, found, records in rows:
+                if self.is_fresh(fetched, bool(found), now):
+                    cached[key] = json.loads(records)
+        log.debug('{0} of {1} searches cached'.format(len(cached), len(keys)))
+        return cached
+
+    def get(self, search_obj: SecuritySearchObj) -> typing.Optional[typing.List[typing.Dict]]:
+        return self.get_many([search_obj]).get(search_key(search_obj))
+
+    def put_many(self, results: typing.Mapping[str, typing.List[typing.Dict]]) -> None:
+        '''Store records keyed by search_key, all in one transaction
+        '''
+        now = time.time()
+        rows = [(key, now, int(len(records) > 0), json.dumps(records)) for key, records in results.items()]
+        with self.conn:
+            self.conn.execute('BEGIN IMMEDIATE')
+            self.conn.executemany('INSERT OR REPLACE INTO searches VALUES (?, ?, ?, ?)', rows)
+
+    def put(self, search_obj: SecuritySearchObj, records: typing.List[typing.Dict]) -> None:
+        self.put_many({search_key(search_obj): records})
+
+    def purge_expired(self) -> int:
+        '''Drop stale entries, returning how many were removed
+        '''
+        now = time.time()
+        with self.conn:
+            self.conn.execute('BEGIN IMMEDIATE')
+            cursor = self.conn.execute(
+                'DELETE FROM searches WHERE (found AND fetched < ?) OR (NOT found AND fetched < ?)',
+                (now - self.ttl, now - self.negative_ttl),
+            )
+        return cursor.rowcount
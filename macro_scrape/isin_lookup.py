@@ -1,15 +1,19 @@
+import logging
 import asyncio
+import contextlib
 import json
 import httpx
 import urllib
 import pandas as pd
 import dataclasses
-from bs4 import BeautifulSoup
 
 from .headers import headers
+from .html_extract import hidden_input_value
+from .http_client import make_client
 
-from typing import Optional, List, Literal, Union
+from typing import Optional, List, Literal, Union, Dict, Iterable, Tuple
 
+log = logging.getLogger(__name__)
 
 @dataclasses.dataclass
 class SecuritySearchObj:
@@ -32,8 +36,36 @@ class SecuritySearchObj:
 
 
 
+# Identifier fields ANNA matches without regard to case
+upper_case_fields = ('isinValue',)
+
+
+def normalize_search(search_obj: SecuritySearchObj) -> SecuritySearchObj:
+    '''Copy of a search with string fields stripped, blanks as None, and identifiers upper case
+    '''
+    changes = {}
+    for field in dataclasses.fields(search_obj):
+        value = getattr(search_obj, field.name)
+        if not isinstance(value, str):
+            continue
+        value = value.strip() or None
+        if value is not None and field.name in upper_case_fields:
+            value = value.upper()
+        changes[field.name] = value
+    return dataclasses.replace(search_obj, **changes)
+
+
+def search_key(search_obj: SecuritySearchObj) -> str:
+    '''Canonical string for a search, equal for searches that differ only in whitespace
+    or the case of an ISIN
+    '''
+    return json.dumps(dataclasses.asdict(normalize_search(search_obj)), sort_keys=True, separators=(',', ':'))
+
+
 base_url = 'https://www.annaservice.com'
 
+results_marker = 'eval("results = " +'
+
 
 @dataclasses.dataclass
 class ISINSearchObj:
@@ -45,23 +77,31 @@ class ISINSearchObj:
     timeout     : float                         = 10.0
     client      : Optional[httpx.AsyncClient]   = None
     _csrf       : Optional[str]                 = None
+    # Optional isin_cache.ISINCache consulted before searching
+    cache       : Optional['ISINCache']         = None
+    # Whether __aenter__ opened the client, and so __aexit__ should close it
+    _owns_client: bool                          = dataclasses.field(default=False, repr=False)
 
 
     async def __aenter__(self,):
-        self.client = await httpx.AsyncClient(headers=headers, timeout=self.timeout).__aenter__()
+        if self.client is None:
+            self.client = await make_client(timeout=self.timeout).__aenter__()
+            self._owns_client = True
         await self.login()
         return self
 
     async def __aexit__(self, *args, **kwargs):
-        await self.client.__aexit__(*args, **kwargs)
+        if self._owns_client:
+            await self.client.__aexit__(*args, **kwargs)
+            self.client = None
+            self._owns_client = False
 
 
     @staticmethod
     def get_page_secret(text:str) -> str:
-        soup = BeautifulSoup(text)
-        id_tags = soup.findAll("input", {"type" : "hidden", 'name':'_csrf'})
-        id_tag = id_tags[0]
-        secret = id_tag['value']
+        secret = hidden_input_value(text, '_csrf')
+        if secret is None:
+            raise ValueError('no _csrf field on page')
         return secret
 
 
@@ -82,10 +122,39 @@ class ISINSearchObj:
         self._csrf = ISINSearchObj.get_page_secret(page.text)
     
 
-    async def search_securities(self, search_obj : SecuritySearchObj):
+    @staticmethod
+    def parse_results(text: str) -> Dict:
+        '''The JSON object the search page hands to eval("results = " + ...).
+        The object comes wrapped in quotes or parentheses, as in '{...}') or ({...})).
+        '''
+        start = text.find(results_marker)
+        if start < 0:
+            raise ValueError('no search results on page')
+        start += len(results_marker)
+        while text[start].isspace():
+            start += 1
+
+        decoder = json.JSONDecoder()
+        if text[start] == '"':
+            # Either an escaped JSON string literal, or the raw object between bare quotes
+            try:
+                literal, _ = decoder.raw_decode(text, start)
+                return json.loads(literal)
+            except ValueError:
+                start += 1
+        elif text[start] in "'(":
+            start += 1
+        while text[start].isspace():
+            start += 1
+
+        results, _ = decoder.raw_decode(text, start)
+        return results
+
+
+    async def search_records(self, search_obj : SecuritySearchObj) -> List[Dict]:
         search_url = urllib.parse.urljoin(base_url,'/isinlookup/search')
 
-        data = dataclasses.asdict(search_obj)
+        data = dataclasses.asdict(normalize_search(search_obj))
 
         if self._csrf is None:
             page = await self.client.get(search_url, follow_redirects=True)
@@ -95,8 +164,90 @@ class ISINSearchObj:
         data['_csrf'] = self._csrf
 
         page = await self.client.post(search_url, data = data, follow_redirects=True)
-        self._csrf = None
+        # The results page carries the token for the next search; without one we GET a fresh page
+        self._csrf = hidden_input_value(page.text, '_csrf') if page.is_success else None
         page.raise_for_status()
-        response = page.text.split('eval("results = " +')[1].split(';')[0][1:-2]
-        response_js = json.loads(response)
-        return pd.DataFrame(response_js['response']['isinRecords'])
+        response_js = ISINSearchObj.parse_results(page.text)
+        return response_js['response']['isinRecords']
+
+
+    async def search_securities(self, search_obj : SecuritySearchObj):
+        if self.cache is not None:
+            records = self.cache.get(search_obj)
+            if records is not None:
+                return pd.DataFrame(records)
+
+        records = await self.search_records(search_obj)
+        if self.cache is not None:
+            self.cache.put(search_obj, records)
+        return pd.DataFrame(records)
+
+
+    async def search_many(self,
+            search_objs : Iterable[SecuritySearchObj],
+            n_sessions  : int = 4,
+        ) -> Tuple[pd.DataFrame, Dict[str, BaseException]]:
+        '''Runs many searches over a pool of n_sessions logged-in sessions, this one included.
+        Each session runs its searches one after another, chaining the CSRF token from one
+        results page to the next. Repeated searches run once, and records found by more than
+        one search appear once. Searches that fail, after one fresh login, are returned in the
+        second element keyed by search_key rather than raised.
+        With a cache, every search is looked up in one query first and only the rest are
+        sent, so this doubles as a bulk prefetch.
+        '''
+        searches = {}
+        for search_obj in search_objs:
+            searches.setdefault(search_key(search_obj), search_obj)
+
+        cached = {} if self.cache is None else self.cache.get_many(searches.values())
+        results = {key: pd.DataFrame(records) for key, records in cached.items()}
+        fetched = {}
+
+        queue = asyncio.Queue()
+        for key, search_obj in searches.items():
+            if key not in cached:
+                queue.put_nowait((key, search_obj))
+
+        failures = {}
+
+        async def worker(session: 'ISINSearchObj'):
+            while not queue.empty():
+                key, search_obj = queue.get_nowait()
+                try:
+                    try:
+                        fetched[key] = await session.search_records(search_obj)
+                    except (httpx.HTTPStatusError, ValueError) as e:
+                        # A page we can't parse won't parse any better after logging in
+                        if isinstance(e, json.JSONDecodeError):
+                            raise
+                        # Usually an expired session or a rejected token
+                        log.info('ISIN search failed with {0!r}, logging in again'.format(e))
+                        session._csrf = None
+                        await session.login()
+                        fetched[key] = await session.search_records(search_obj)
+                except Exception as e:
+                    log.warning('ISIN search {0} failed: {1!r}'.format(key, e))
+                    failures[key] = e
+
+        n_sessions = max(1, min(n_sessions, queue.qsize()))
+        if queue.qsize():
+            async with contextlib.AsyncExitStack() as stack:
+                sessions = [self]
+                for _ in range(n_sessions - 1):
+                    session = dataclasses.replace(self, client=None, _csrf=None)
+                    sessions.append(await stack.enter_async_context(session))
+                await asyncio.gather(*[worker(session) for session in sessions])
+
+        if self.cache is not None and fetched:
+            self.cache.put_many(fetched)
+        results.update({key: pd.DataFrame(records) for key, records in fetched.items()})
+
+        frames = [results[key] for key in searches if key in results]
+        if not frames:
+            return pd.DataFrame(), failures
+        df = pd.concat(frames, ignore_index=True)
+        if 'isin' in df.columns:
+            df = df.drop_duplicates('isin', ignore_index=True)
+        else:
+            df = df.loc[~df.astype(str).duplicated()].reset_index(drop=True)
+        return df, failures
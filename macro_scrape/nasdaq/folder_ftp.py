@@ -1,9 +1,12 @@
 import logging
 import os
+import ftplib
+import typing
 import datetime
 import pytz
 
 from .ftp import NasdaqFTPResource
+from ..ftp import parse_ftp_time
 
 log = logging.getLogger(__name__)
 
@@ -20,11 +23,12 @@ class NasdaqFolderFTPResource(NasdaqFTPResource):
         user: str ='',
         password: str ='',
         fname_format: str = '',
-        tzinfo=None
+        tzinfo=None,
+        cache=None,
     ) -> None:
         super().__init__(
             uri=uri, user=user, password=password,
-            tzinfo=tzinfo
+            tzinfo=tzinfo, cache=cache,
         )
         self.fname_format = fname_format
 
@@ -40,15 +44,90 @@ class NasdaqFolderFTPResource(NasdaqFTPResource):
     
 
     def list_files(self):
-        self.login()
-        print(self.resource.path)
-        return self.ftp.nlst(self.resource.path)
+        log.debug('listing {0}'.format(self.resource.path))
+        return self._retrying(lambda ftp: ftp.nlst(self.resource.path))
     
 
     def list_dates_available(self):
         for path in self.list_files():
             yield self.fname_to_date(path)
 
+    def list_files_stat(self) -> typing.Dict[str, typing.Tuple[datetime.datetime, typing.Optional[int]]]:
+        '''Maps each file name in the folder to its (modified, size), in one MLSD listing
+        where the server supports it, and one MDTM per file where it doesn't
+        '''
+        def mlsd(ftp):
+            return list(ftp.mlsd(self.resource.path, facts=['type', 'size', 'modify']))
+
+        try:
+            entries = self._retrying(mlsd)
+        except ftplib.error_perm:
+            log.info('MLSD unsupported, falling back to NLST + MDTM')
+            return {
+                os.path.basename(path): (self.last_modified(os.path.basename(path)), None)
+                for path in self.list_files()
+            }
+
+        stats = {}
+        for name, facts in entries:
+            if facts.get('type', 'file') != 'file':
+                continue
+            # Same UTC parse as the MDTM fallback, so the manifest compares equal either way
+            modified = parse_ftp_time(facts['modify'], self.tzinfo)
+            size = int(facts['size']) if 'size' in facts else None
+            stats[name] = (modified, size)
+        return stats
+
+    def sync(self, local_store, max_workers: typing.Optional[int] = None) -> typing.Dict[str, BaseException]:
+        '''Fetch, parse and append to local_store only the dated files that are new or
+        changed since the last sync. local_store is a NasdaqFolderStore or a directory path.
+        Returns failures keyed by file name.
+        '''
+        if isinstance(local_store, str):
+            from .folder_store import NasdaqFolderStore
+            local_store = NasdaqFolderStore(local_store)
+
+        remote = {}
+        for name, (modified, size) in self.list_files_stat().items():
+            try:
+                remote[name] = (self.fname_to_date(name), modified, size)
+            except ValueError:
+                log.debug('skipping {0}, not a dated file'.format(name))
+
+        changed = local_store.changed(
+            {name: (modified, size) for name, (_, modified, size) in remote.items()}
+        )
+        log.info('{0} of {1} remote files are new or changed'.format(len(changed), len(remote)))
+        if not changed:
+            return {}
+
+        failures = {}
+        for result in self.download_many(changed, max_workers=max_workers):
+            if not result.ok:
+                failures[result.suffix] = result.error
+                continue
+            date, modified, size = remote[result.suffix]
+            try:
+                df = self._process(result.fname)
+            except Exception as e:
+                log.error('Failed to parse {0}: {1!r}'.format(result.fname, e))
+                failures[result.suffix] = e
+                continue
+            local_store.append(result.suffix, date, df, modified, size)
+
+        return failures
+
+
+    def download_many(self, items, max_workers=None, skip_fresh=True):
+        '''Like FTPResource.download_many, but items may also be dates in the folder
+        '''
+        suffixes = [
+            os.path.basename(self.date_to_fname(item))
+            if isinstance(item, (datetime.date, datetime.datetime)) else item
+            for item in items
+        ]
+        return super().download_many(suffixes, max_workers=max_workers, skip_fresh=skip_fresh)
+
 
 
 
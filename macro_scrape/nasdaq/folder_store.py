@@ -0,0 +1,91 @@
+import logging
+log = logging.getLogger(__name__)
+
+import os
+import typing
+import datetime
+import pandas as pd
+import pyarrow.dataset as ds
+
+from ..store import JSONManifest, write_parquet, open_dataset, typed_columns
+
+
+class NasdaqFolderStore:
+    '''Consolidated parquet history of a dated Nasdaq FTP folder, like shorthalts/.
+
+    Each remote file becomes one parquet file tagged with a 'Folder Date' column.
+    A manifest records the remote modified time and size each file was ingested at,
+    so NasdaqFolderFTPResource.sync only fetches files that are new or have changed.
+    '''
+    date_col = 'Folder Date'
+
+    def __init__(self, root: str) -> None:
+        self.root       = os.path.abspath(os.path.expanduser(root))
+        self.manifest   = JSONManifest(os.path.join(self.root, '_manifest.json'))
+
+    def changed(self, remote: typing.Dict[str, typing.Tuple[datetime.datetime, typing.Optional[int]]]) -> typing.List[str]:
+        '''Names from a {name: (modified, size)} listing that differ from what was ingested.
+        A size of None (the MDTM fallback) only compares the modified time.
+        '''
+        ingested = self.manifest.load()
+        changed = []
+        for name, (modified, size) in sorted(remote.items()):
+            entry = ingested.get(name)
+            if entry is None or entry['modified'] != modified.isoformat() or (size is not None and entry['size'] != size):
+                changed.append(name)
+        return changed
+
+    def dates_stored(self) -> typing.List[datetime.date]:
+        return sorted(
+            datetime.date.fromisoformat(entry['date'])
+            for entry in self.manifest.load().values()
+        )
+
+    def append(self,
+        name        : str,
+        date        : datetime.datetime,
+        df          : pd.DataFrame,
+        modified    : datetime.datetime,
+        size        : typing.Optional[int],
+    ) -> None:
+        df = df.copy()
+        df[self.date_col] = pd.Timestamp(date)
+        # All-empty columns parse as float; store them as text like the files that fill them in
+        df = typed_columns(df)
+
+        # Empty files only need a manifest entry
+        if len(df):
+            write_parquet(df, os.path.join(self.root, '{0}.parquet'.format(os.path.splitext(name)[0])))
+
+        manifest = self.manifest.load()
+        manifest[name] = {
+            'date'      : date.date().isoformat() if isinstance(date, datetime.datetime) else date.isoformat(),
+            'modified'  : modified.isoformat(),
+            'size'      : size,
+            'rows'      : len(df),
+        }
+        self.manifest.save(manifest)
+        log.info('stored {0:,} rows from {1}'.format(len(df), name))
+
+    def read(self,
+        start   : typing.Optional[datetime.date] = None,
+        end     : typing.Optional[datetime.date] = None,
+        columns : typing.Optional[typing.List[str]] = None,
+    ) -> pd.DataFrame:
+        '''Every stored row with a folder date between start and end, inclusive
+        '''
+        if not os.path.exists(self.root):
+            return pd.DataFrame(columns=columns)
+
+        dataset = open_dataset(self.root, partitioning=None)
+        expr = None
+        if start is not None:
+            expr = ds.field(self.date_col) >= pd.Timestamp(start)
+        if end is not None:
+            upper = ds.field(self.date_col) <= pd.Timestamp(end)
+            expr = upper if expr is None else expr & upper
+
+        df = dataset.to_table(columns=columns, filter=expr).to_pandas()
+        if self.date_col in df.columns:
+            df = df.sort_values(self.date_col, kind='stable').reset_index(drop=True)
+        return df
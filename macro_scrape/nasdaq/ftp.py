@@ -1,11 +1,14 @@
 import logging
 log = logging.getLogger(__name__)
 
+import os
 import datetime
+import typing
+import numpy as np
 import pandas as pd
 import pytz
 
-from ..ftp import FTPResource, robust_read_csv
+from ..ftp import FTPResource, robust_read_csv, detect_csv_dialect
 
 
 
@@ -13,6 +16,39 @@ from ..ftp import FTPResource, robust_read_csv
 
 
 
+y_n_codes = {'Y': True, 'N': False}
+
+mpid_type_codes = {
+    'A':'agency quote',
+    'C': 'ecn',
+    'E': 'exchange',
+    'M': 'market maker',
+    'N': 'misc',
+    'O': 'order entry firm',
+    'P': 'nasdaq participant',
+    'Q': 'query only firm',
+    'S': 'specialist'
+}
+
+exchange_codes = {
+    'A': 'NYSE MKT',
+    'N': 'NYSE',
+    'P': 'ARCA',
+    'Z': 'BATS',
+    'V': 'IEXG',
+}
+
+market_category_codes = {
+    'Q': 'global select market-sm',
+    'G': 'global market-sm',
+    'S': 'capital market',
+}
+
+option_closing_type_codes = { 'N': 'normal', 'L': 'late' }
+
+option_type_codes = { 'P': 'put', 'C': 'call' }
+
+
 class NasdaqFTPResource(FTPResource):
     '''
     For more info, visit
@@ -40,53 +76,68 @@ class NasdaqFTPResource(FTPResource):
     }
 
 
+    @staticmethod
+    def map_categories(dx: pd.Series, fn: typing.Callable[[pd.Index], typing.Iterable]) -> pd.Series:
+        '''Decode a column by applying fn to its distinct values only, then
+        broadcasting the result back to every row through the category codes
+        '''
+        if not isinstance(dx.dtype, pd.CategoricalDtype):
+            dx = dx.astype('category')
+        codes = dx.cat.codes.to_numpy()
+
+        # Decoded labels can collide, so re-factorize them into a fresh set of categories
+        code_table, new_categories = pd.factorize(pd.Index(list(fn(dx.cat.categories)), dtype=object))
+        new_codes = np.where(codes >= 0, code_table[codes], -1)
+        decoded = pd.Categorical.from_codes(new_codes, categories=new_categories)
+        return pd.Series(decoded, index=dx.index, name=dx.name).cat.remove_unused_categories()
+
+    @staticmethod
+    def replace_categories(dx: pd.Series, lookup: typing.Dict[str, str]) -> pd.Series:
+        return NasdaqFTPResource.map_categories(dx, lambda cats: [lookup.get(c, c) for c in cats])
+
+    @staticmethod
+    def flag_categories(dx: pd.Series, is_set: typing.Callable[[str], typing.Optional[bool]]) -> pd.Series:
+        '''Nullable boolean column from a per-category lookup table
+        '''
+        if not isinstance(dx.dtype, pd.CategoricalDtype):
+            dx = dx.astype('category')
+        codes = dx.cat.codes.to_numpy()
+
+        flags = [is_set(c) for c in dx.cat.categories]
+        value_table = np.array([bool(f) for f in flags] + [False], dtype=bool)
+        mask_table = np.array([f is None for f in flags] + [True], dtype=bool)
+
+        # Code -1 (missing) indexes the trailing masked entry
+        values = pd.arrays.BooleanArray(value_table[codes], mask_table[codes])
+        return pd.Series(values, index=dx.index, name=dx.name)
+
     @staticmethod
     def expand_y_n(dx: pd.Series):
-        return dx.replace({'Y':True,'N':False})
+        return NasdaqFTPResource.flag_categories(dx, y_n_codes.get)
 
     @staticmethod
     def expand_mpid_type(dx: pd.Series):
-        return dx.replace({
-            'A':'agency quote',
-            'C': 'ecn',
-            'E': 'exchange',
-            'M': 'market maker',
-            'N': 'misc',
-            'O': 'order entry firm',
-            'P': 'nasdaq participant',
-            'Q': 'query only firm',
-            'S': 'specialist'
-        })
-    
+        return NasdaqFTPResource.replace_categories(dx, mpid_type_codes)
+
     @staticmethod
     def expand_exchange(dx: pd.Series):
-        return dx.replace({
-            'A': 'NYSE MKT',
-            'N': 'NYSE',
-            'P': 'ARCA',
-            'Z': 'BATS',
-            'V': 'IEXG',
-        })
+        return NasdaqFTPResource.replace_categories(dx, exchange_codes)
 
     @staticmethod
     def expand_market_category(dx: pd.Series):
-        return dx.replace({
-            'Q': 'global select market-sm',
-            'G': 'global market-sm',
-            'S': 'capital market',
-        })
-    
+        return NasdaqFTPResource.replace_categories(dx, market_category_codes)
+
     @staticmethod
     def expand_option_closing_type(dx: pd.Series):
-        return dx.replace({ 'N': 'normal', 'L': 'late' })
+        return NasdaqFTPResource.replace_categories(dx, option_closing_type_codes)
 
     @staticmethod
     def expand_option_type(dx: pd.Series):
-        return dx.replace({ 'P': 'put', 'C': 'call' })
+        return NasdaqFTPResource.replace_categories(dx, option_type_codes)
 
     @staticmethod
     def format_date(dx: pd.Series):
-        return pd.to_datetime(dx).dt.strftime('%Y-%m-%d')
+        return NasdaqFTPResource.map_categories(dx, lambda cats: pd.to_datetime(cats).strftime('%Y-%m-%d'))
 
     @staticmethod
     def expand_financial_status(dx: pd.Series):
@@ -95,20 +146,24 @@ class NasdaqFTPResource(FTPResource):
         bankrupt_vals = 'QGJK'
 
         return pd.DataFrame({
-            'deficient': dx.apply(lambda x: (x in deficient_vals) if isinstance(x,str) else None),
-            'delinquent': dx.apply(lambda x: (x in delinquent_vals) if isinstance(x,str) else None),
-            'bankrupt': dx.apply(lambda x: (x in bankrupt_vals) if isinstance(x,str) else None),
-        })
+            'deficient': NasdaqFTPResource.flag_categories(dx, lambda x: x in deficient_vals),
+            'delinquent': NasdaqFTPResource.flag_categories(dx, lambda x: x in delinquent_vals),
+            'bankrupt': NasdaqFTPResource.flag_categories(dx, lambda x: x in bankrupt_vals),
+        }, index=dx.index)
 
 
     @staticmethod
     def parse_file_create_time(row: pd.Series):
+        return NasdaqFTPResource.parse_file_create_str(row.values[0])
+
+    @staticmethod
+    def parse_file_create_str(value: str):
         try:
-            desc_str = row.values[0].split(' ')[-1]
+            desc_str = value.split(' ')[-1]
             dt = datetime.datetime.strptime(desc_str, '%m%d%Y%H:%M')
         except:
             try:
-                desc_str = row.values[0]
+                desc_str = value
                 dt = datetime.datetime.strptime(desc_str, '%Y%m%d%H%M%S')
             except:
                 raise RuntimeError('Failed to parse file timestamp')
@@ -119,33 +174,132 @@ class NasdaqFTPResource(FTPResource):
         return dt
 
 
+    @classmethod
+    def decode_frame(cls, df: pd.DataFrame) -> pd.DataFrame:
+        '''Expand the coded columns of a parsed file, which should have been read
+        with category dtypes (see category_dtypes) so decoding only touches distinct values
+        '''
+        for col in df.columns:
+            fn_name = cls.col_process_config.get(col, None)
+            if fn_name is not None:
+                df[col] = getattr(cls, fn_name)(df[col])
+
+        if 'Financial Status' in df.columns:
+            df = pd.concat(
+                [
+                    df.drop(columns=['Financial Status']),
+                    cls.expand_financial_status(df['Financial Status'])
+                ],
+                axis=1
+            )
+        return df
+
+    @classmethod
+    def category_dtypes(cls) -> typing.Dict[str, str]:
+        dtypes = dict.fromkeys(cls.col_process_config, 'category')
+        dtypes['Financial Status'] = 'category'
+        return dtypes
+
     def _process(self, path: str):
         df = robust_read_csv(
-            path
+            path,
+            dtype = self.category_dtypes(),
         )
         log.debug('example FTP df row: {0}'.format(str(dict(df.iloc[0]))))
 
-        df, last_row = df.iloc[:-1], df.iloc[-1]
+        df, last_row = df.iloc[:-1].copy(), df.iloc[-1]
         file_create_datetime = NasdaqFTPResource.parse_file_create_time(last_row)
 
         df['File Create Date'] = file_create_datetime
 
-        for col in df:
-            fn_name = NasdaqFTPResource.col_process_config.get(col, None)
-            if fn_name is not None:
-                fn = getattr(NasdaqFTPResource, fn_name)
-                df[col] = fn(df[col])
+        return self.decode_frame(df)
 
-        if 'Financial Status' in df.columns:
-            df = pd.concat(
-                [
-                    df.drop(columns=['Financial Status']),
-                    NasdaqFTPResource.expand_financial_status(df['Financial Status'])
-                ],
-                axis=1
-            )
 
-        return df
+
+    @staticmethod
+    def read_trailer(path: str, delimiter: str, tail_bytes: int = 4096) -> str:
+        '''First field of the file's last line, read by seeking to the end of the file
+        '''
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            start = max(0, f.tell() - tail_bytes)
+            f.seek(start)
+            tail = f.read()
+        # Drop the partial line we seeked into, which may begin mid-character
+        if start > 0 and b'\n' in tail.rstrip(b'\r\n'):
+            tail = tail[tail.index(b'\n') + 1:]
+        lines = tail.decode(errors='replace').splitlines()
+        last_line = next(line for line in reversed(lines) if line.strip())
+        return last_line.split(delimiter)[0]
+
+    def iter_batches(self,
+        suffix      : typing.Optional[str]                                              = None,
+        chunksize   : int                                                               = 100_000,
+        columns     : typing.Optional[typing.List[str]]                                 = None,
+        filters     : typing.Optional[typing.Dict[str, typing.Iterable]]                = None,
+        predicate   : typing.Optional[typing.Callable[[pd.DataFrame], pd.Series]]       = None,
+    ) -> typing.Iterator[pd.DataFrame]:
+        '''Yields decoded chunks of the local copy, holding at most two raw chunks in memory.
+        filters maps a column to the raw values to keep (e.g. {'Underlying Symbol': ['SPY']})
+        and is applied before decoding; predicate is a function of the decoded chunk
+        returning a boolean mask. The trailer row is dropped and its timestamp is
+        added as 'File Create Date'.
+        '''
+        path = self.get_fname(suffix)
+        if not os.path.exists(path):
+            raise FileNotFoundError('No local copy exists')
+
+        delimiter = detect_csv_dialect(path).delimiter
+        file_create_datetime = self.parse_file_create_str(self.read_trailer(path, delimiter))
+
+        read_cols = None
+        if columns is not None:
+            read_cols = set(columns)
+            if filters is not None:
+                read_cols.update(filters)
+
+        reader = pd.read_csv(
+            path,
+            sep         = delimiter,
+            engine      = 'c',
+            chunksize   = chunksize,
+            usecols     = None if read_cols is None else (lambda col: col in read_cols),
+            dtype       = self.category_dtypes(),
+        )
+
+        def finish(chunk: pd.DataFrame) -> pd.DataFrame:
+            if filters is not None:
+                for col, values in filters.items():
+                    chunk = chunk.loc[chunk[col].isin(list(values))]
+            chunk = chunk.copy()
+            chunk['File Create Date'] = file_create_datetime
+            chunk = self.decode_frame(chunk)
+            if predicate is not None:
+                chunk = chunk.loc[predicate(chunk)]
+            if columns is not None and filters is not None:
+                # Columns read only to filter on
+                chunk = chunk.drop(columns=[col for col in filters if col not in columns], errors='ignore')
+            return chunk
+
+        # Only the last row of the last chunk is the trailer, so hold one chunk back
+        pending = None
+        for chunk in reader:
+            if pending is not None:
+                pending = finish(pending)
+                if len(pending):
+                    yield pending
+            pending = chunk
+
+        if pending is not None:
+            pending = finish(pending.iloc[:-1])
+            if len(pending):
+                yield pending
+
+    def iter_records(self, suffix: typing.Optional[str] = None, **kwargs) -> typing.Iterator[typing.Dict]:
+        '''Like iter_batches, one dict per row
+        '''
+        for batch in self.iter_batches(suffix, **kwargs):
+            yield from batch.to_dict('records')
 
 
 
@@ -168,7 +322,7 @@ ftp_clients = {}
 
 def get_nasdaq_ftp_client (
     name: str,
-    # tmp_dir: str ='/tmp/data_cache'
+    cache = None,
     ) -> NasdaqFTPResource:
 
     name = name.lower()
@@ -178,6 +332,7 @@ def get_nasdaq_ftp_client (
         uri = 'ftp://ftp.nasdaqtrader.com/symboldirectory/{}'.format(file_name),
         user = '',
         password = '',
+        cache = cache,
     )
 
     return client
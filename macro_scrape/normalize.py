@@ -0,0 +1,95 @@
+import typing
+import collections
+import pandas as pd
+
+
+Dtype = typing.Optional[typing.Union[str, typing.Callable[[pd.Series], pd.Series]]]
+Schema = typing.Mapping[str, Dtype]
+
+
+def _walk(node, path: typing.Tuple[str, ...]):
+    for key in path:
+        if not isinstance(node, dict):
+            return None
+        node = node.get(key)
+    return node
+
+
+def _typed(values: typing.Union[list, pd.Series], dtype: Dtype, index) -> pd.Series:
+    if dtype is None:
+        return pd.Series(values, index=index)
+    if callable(dtype):
+        return dtype(pd.Series(values, index=index, dtype=object))
+    if dtype.startswith('datetime64'):
+        return pd.Series(pd.to_datetime(values, errors='coerce'), index=index)
+    if dtype in ('float32', 'float64', 'Int32', 'Int64'):
+        return pd.to_numeric(pd.Series(values, index=index, dtype=object), errors='coerce').astype(dtype)
+    return pd.Series(values, index=index).astype(dtype)
+
+
+def normalize_records(
+    records : typing.Sequence[typing.Dict],
+    schema  : Schema,
+    index   : typing.Optional[pd.Index] = None,
+) -> pd.DataFrame:
+    '''Flatten a list of nested JSON records into typed columns.
+
+    schema maps dotted field paths to dtypes (None leaves pandas' inferred type), or to a
+    function converting the raw object Series.
+    Each path becomes a column named by its last component. A path ending in '*',
+    like 'raw.*' or just '*', adds a column for every key of the dict found there,
+    in first-seen order; explicitly listed paths take precedence over those keys.
+    Missing fields are None before typing.
+
+        normalize_records(js['refRates'], {'effectiveDate': 'datetime64[ns]', '*': None})
+    '''
+    if not isinstance(records, list):
+        records = list(records)
+    if index is None:
+        index = pd.RangeIndex(len(records))
+
+    fields = [(tuple(path.split('.')) if path else (), dtype) for path, dtype in schema.items()]
+    explicit_names = {parts[-1] for parts, _ in fields if parts and parts[-1] != '*'}
+
+    # Fields under a wildcard, or under a parent several fields share, are read from one
+    # object frame of that parent's sub-dicts rather than a pass over the records per field
+    parents = collections.Counter(parts[:-1] for parts, _ in fields if parts)
+    shared = {parent for parent, count in parents.items() if count > 1}
+    shared |= {parts[:-1] for parts, _ in fields if not parts or parts[-1] == '*'}
+    frames = {}
+
+    def frame(parent: typing.Tuple[str, ...]) -> pd.DataFrame:
+        if parent not in frames:
+            if len(parent) == 1:
+                key = parent[0]
+                nodes = [record.get(key) if isinstance(record, dict) else None for record in records]
+            else:
+                nodes = [_walk(record, parent) for record in records]
+            frames[parent] = pd.DataFrame(
+                [node if isinstance(node, dict) else {} for node in nodes],
+                index = index,
+                dtype = object,
+            )
+        return frames[parent]
+
+    out = {}
+    for parts, dtype in fields:
+        if parts and parts[-1] != '*':
+            if parts[:-1] not in shared:
+                out[parts[-1]] = _typed([_walk(record, parts) for record in records], dtype, index)
+                continue
+            expanded = frame(parts[:-1])
+            if parts[-1] not in expanded.columns:
+                out[parts[-1]] = _typed([None] * len(records), dtype, index)
+            elif dtype is None:
+                out[parts[-1]] = expanded[parts[-1]].infer_objects()
+            else:
+                out[parts[-1]] = _typed(expanded[parts[-1]], dtype, index)
+            continue
+
+        expanded = frame(parts[:-1] if parts else ())
+        for key in expanded.columns:
+            if key not in explicit_names and key not in out:
+                out[key] = expanded[key].infer_objects()
+
+    return pd.DataFrame(out, index=index, copy=False)
@@ -0,0 +1,137 @@
+'''Compounding and accrual analytics over an overnight fixing history.
+
+OISAccrualIndex does one O(n) pass over the fixings, building cumulative log growth and
+cumulative rate-days at each fixing date. Any period [start, end) is then answered in
+O(1), from the two cumulative values bracketing it plus a partial step at each end for
+periods that begin or end between fixings. Everything takes arrays of dates, so
+thousands of periods are one vectorized call:
+
+    index = OISAccrualIndex(FedOISResetHistoryRequest(OISIndex.sofr, 2_000).load())
+    index.compounded_rate(periods['start'], periods['end'])
+
+Rates are in percent, like the NY Fed data, and accrue ACT/360. A fixing applies from its
+effectiveDate until the next one, so Friday's rate carries over the weekend. The last
+fixing is taken to apply for one day.
+'''
+import typing
+import numpy as np
+import pandas as pd
+
+
+Dates = typing.Union[typing.Sequence, pd.Series, pd.DatetimeIndex, np.ndarray]
+
+
+def _days(dates: Dates) -> np.ndarray:
+    return np.atleast_1d(np.asarray(pd.to_datetime(dates)).astype('datetime64[D]'))
+
+
+class OISAccrualIndex:
+    '''Cumulative growth index over a fixing history, for O(1) queries of any period
+    '''
+
+    def __init__(self, fixings: typing.Union[pd.DataFrame, pd.Series]) -> None:
+        if isinstance(fixings, pd.DataFrame):
+            fixings = fixings['percentRate']
+        fixings = fixings.dropna()
+        fixings = fixings.loc[~fixings.index.duplicated(keep='last')].sort_index()
+        if len(fixings) == 0:
+            raise ValueError('no fixings')
+
+        self.dates  = _days(fixings.index)
+        self.rates  = fixings.to_numpy(dtype=float) / 100.0
+        # Each fixing runs to the next; the last for one day
+        self.edges  = np.append(self.dates, self.dates[-1] + 1)
+        step_days   = np.diff(self.edges).astype(np.int64)
+
+        rate_days = self.rates * step_days / 360.0
+        self.log_growth = np.concatenate([[0.0], np.cumsum(np.log1p(rate_days))])
+        self.rate_days = np.concatenate([[0.0], np.cumsum(rate_days)])
+
+    @property
+    def first_date(self) -> np.datetime64:
+        return self.edges[0]
+
+    @property
+    def last_date(self) -> np.datetime64:
+        '''Latest period end that can be answered
+        '''
+        return self.edges[-1]
+
+    def _bracket(self, starts: Dates, ends: Dates):
+        s = _days(starts)
+        e = _days(ends)
+        s, e = np.broadcast_arrays(s, e)
+        valid = (s >= self.first_date) & (e <= self.last_date) & (e > s)
+        s = np.where(valid, s, self.first_date)
+        e = np.where(valid, e, self.first_date + 1)
+
+        # Fixing in force on the first and on the last day of each period
+        i = np.searchsorted(self.dates, s, side='right') - 1
+        j = np.searchsorted(self.dates, e - 1, side='right') - 1
+        days = (e - s).astype(np.int64).astype(float)
+        head_days = np.where(i == j, days, (self.edges[i + 1] - s).astype(np.int64))
+        tail_days = np.where(i == j, 0, (e - self.dates[j]).astype(np.int64))
+        return valid, i, j, days, head_days, tail_days
+
+    def _growth(self, starts: Dates, ends: Dates) -> typing.Tuple[np.ndarray, np.ndarray]:
+        valid, i, j, days, head_days, tail_days = self._bracket(starts, ends)
+        inner = np.where(i == j, 0.0, self.log_growth[j] - self.log_growth[np.minimum(i + 1, j)])
+        log_growth = (
+            np.log1p(self.rates[i] * head_days / 360.0)
+            + inner
+            + np.log1p(self.rates[j] * tail_days / 360.0)
+        )
+        return np.where(valid, np.exp(log_growth), np.nan), days
+
+    def growth(self, starts: Dates, ends: Dates) -> np.ndarray:
+        '''Compounded growth factor of 1 invested over each [start, end); NaN outside the history
+        '''
+        return self._growth(starts, ends)[0]
+
+    def compounded_rate(self, starts: Dates, ends: Dates) -> np.ndarray:
+        '''Compounded-in-arrears rate over each [start, end), in percent ACT/360
+        '''
+        growth, days = self._growth(starts, ends)
+        return (growth - 1.0) * 360.0 / days * 100.0
+
+    def average_rate(self, starts: Dates, ends: Dates) -> np.ndarray:
+        '''Simple calendar-day average rate over each [start, end), in percent
+        '''
+        valid, i, j, days, head_days, tail_days = self._bracket(starts, ends)
+        inner = np.where(i == j, 0.0, self.rate_days[j] - self.rate_days[np.minimum(i + 1, j)])
+        rate_days = self.rates[i] * head_days / 360.0 + inner + self.rates[j] * tail_days / 360.0
+        return np.where(valid, rate_days * 360.0 / days * 100.0, np.nan)
+
+    def accrued_interest(self, starts: Dates, ends: Dates, notional: typing.Union[float, np.ndarray] = 1.0) -> np.ndarray:
+        '''Compounded interest on notional over each [start, end)
+        '''
+        return np.asarray(notional) * (self.growth(starts, ends) - 1.0)
+
+    def rolling_averages(self,
+        windows : typing.Sequence[int] = (30, 90, 180),
+        dates   : typing.Optional[Dates] = None,
+    ) -> pd.DataFrame:
+        '''Compounded averages over the windows calendar days before each date, like the
+        NY Fed's 30, 90 and 180-day SOFR Averages. Dates default to every fixing date.
+        '''
+        ends = self.dates if dates is None else _days(dates)
+        return pd.DataFrame(
+            {'{0}d'.format(window): self.compounded_rate(ends - window, ends) for window in windows},
+            index = pd.DatetimeIndex(ends, name='effectiveDate'),
+        )
+
+    def index(self) -> pd.Series:
+        '''Growth of 1 invested on the first fixing date, as of each fixing date
+        '''
+        return pd.Series(np.exp(self.log_growth[:-1]), index=pd.DatetimeIndex(self.dates, name='effectiveDate'))
+
+    def accruals(self, starts: Dates, ends: Dates, notional: typing.Union[float, np.ndarray] = 1.0) -> pd.DataFrame:
+        '''Every measure for a batch of periods, one row per period
+        '''
+        return pd.DataFrame({
+            'start'             : _days(starts),
+            'end'               : _days(ends),
+            'compounded_rate'   : self.compounded_rate(starts, ends),
+            'average_rate'      : self.average_rate(starts, ends),
+            'accrued_interest'  : self.accrued_interest(starts, ends, notional),
+        })
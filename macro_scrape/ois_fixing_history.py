@@ -1,9 +1,18 @@
+import logging
 import typing
+import datetime
+import asyncio
+import contextlib
 import enum
 import dataclasses
 import httpx
 import pandas as pd
 
+from .normalize import normalize_records
+from .http_client import make_client
+
+log = logging.getLogger(__name__)
+
 
 class OISIndex(enum.Enum):
     sofr    = 'SOFR'
@@ -18,6 +27,93 @@ _product_code_lookup = {
 }
 
 
+ref_rate_schema = {
+    'effectiveDate'         : 'datetime64[ns]',
+    'percentRate'           : 'float64',
+    'percentPercentile1'    : 'float64',
+    'percentPercentile25'   : 'float64',
+    'percentPercentile75'   : 'float64',
+    'percentPercentile99'   : 'float64',
+    'volumeInBillions'      : 'float64',
+    '*'                     : None,
+}
+
+
+read_url = 'https://markets.newyorkfed.org/read'
+
+
+async def fetch_ref_rates(
+    client          : httpx.AsyncClient,
+    index           : OISIndex,
+    start_position  : int,
+    limit           : int,
+    start_date      : typing.Optional[datetime.date] = None,
+) -> pd.DataFrame:
+    '''One page of fixings, newest first, starting start_position rows back from the latest.
+    With start_date, only fixings on or after it are asked for.
+    '''
+    params = {
+        'productCode': '50',
+        'eventCodes': _product_code_lookup[index],
+        'limit': limit,
+        'startPosition': str(start_position),
+        'format': 'json',
+        'sort': 'postDt:-1',
+    }
+    if start_date is not None:
+        params['startDt'] = '{0:%Y-%m-%d}'.format(start_date)
+    page = await client.get(read_url, params=params)
+    page.raise_for_status()
+    return normalize_records(page.json()['refRates'], ref_rate_schema).set_index('effectiveDate')
+
+
+async def load_history(
+    client          : httpx.AsyncClient,
+    index           : OISIndex,
+    after           : typing.Optional[pd.Timestamp] = None,
+    page_size       : int = 1_000,
+    max_concurrency : int = 4,
+) -> pd.DataFrame:
+    '''Fixings with effectiveDate after the given date, or the whole history, in date order.
+    The newest page is fetched first. With after, the request is filtered to dates after
+    it and sized from the business days elapsed since, so a refresh only downloads the
+    new fixings. If the first page doesn't reach back far enough, older pages are requested
+    max_concurrency at a time until one comes back short or reaches after.
+    '''
+    if after is None:
+        first_limit, start_date = page_size, None
+    else:
+        # A few extra rows cover publication lag and fixings revised in the meantime
+        elapsed = len(pd.bdate_range(after, pd.Timestamp.today().normalize()))
+        first_limit = max(1, min(page_size, elapsed + 5))
+        start_date = (after + pd.Timedelta(days=1)).date()
+
+    def reached_end(df: pd.DataFrame, limit: int) -> bool:
+        return len(df) < limit or (after is not None and df.index.min() <= after)
+
+    frames = [await fetch_ref_rates(client, index, 0, first_limit, start_date)]
+    limit = position = first_limit
+    while not reached_end(frames[-1], limit):
+        limit = page_size
+        wave = await asyncio.gather(*[
+            fetch_ref_rates(client, index, position + i * page_size, page_size, start_date)
+            for i in range(max_concurrency)
+        ])
+        position += max_concurrency * page_size
+        for df in wave:
+            frames.append(df)
+            if reached_end(df, page_size):
+                break
+    log.debug('fetched {0} pages of {1} fixings'.format(len(frames), index.value))
+
+    df = pd.concat(frames)
+    # Rows can shift between pages if a fixing is published mid-way
+    df = df.loc[~df.index.duplicated()].sort_index()
+    if after is not None:
+        df = df.loc[df.index > after]
+    return df
+
+
 @dataclasses.dataclass
 class FedOISResetHistoryRequest:
     index   : OISIndex
@@ -25,26 +121,28 @@ class FedOISResetHistoryRequest:
     timeout : float = 5.0
     data_df : typing.Optional[pd.DataFrame] = None
 
-    async def load(self, ) -> typing.Optional[pd.DataFrame]:
+    async def load(self, client: typing.Optional[httpx.AsyncClient] = None) -> typing.Optional[pd.DataFrame]:
         '''Returns dataframe of historical OIS rates.
         Data can be viewed online at https://www.newyorkfed.org/markets/reference-rates/sofr, or .../effr for fed funds, etc
+        Pass client to reuse its connections; otherwise one is opened for this call.
         '''
-        product_code = _product_code_lookup[self.index]
-
         if self.data_df is None:
-            url = 'https://markets.newyorkfed.org/read'
-            params = {
-                'productCode': '50',
-                'eventCodes': product_code,
-                'limit': self.limit,
-                'startPosition': '0',
-                'format': 'json',
-                'sort': 'postDt:-1',
-            }
-            async with httpx.AsyncClient(timeout = self.timeout) as client:
-                page = await client.get(url, params=params)
-            page.raise_for_status()
-
-            page_data = page.json()
-            self.data_df = pd.DataFrame(page_data)['refRates'].apply(pd.Series).set_index('effectiveDate')
+            if client is None:
+                async with make_client(timeout = self.timeout) as client:
+                    self.data_df = await fetch_ref_rates(client, self.index, 0, self.limit)
+            else:
+                self.data_df = await fetch_ref_rates(client, self.index, 0, self.limit)
+        return self.data_df
+
 
+async def load_many(
+    requests    : typing.Iterable[FedOISResetHistoryRequest],
+    client      : typing.Optional[httpx.AsyncClient] = None,
+    timeout     : float = 5.0,
+) -> typing.List[pd.DataFrame]:
+    '''Loads several requests concurrently, sharing one client's connections
+    '''
+    async with contextlib.AsyncExitStack() as stack:
+        if client is None:
+            client = await stack.enter_async_context(make_client(timeout = timeout))
+        return await asyncio.gather(*[request.load(client=client) for request in requests])
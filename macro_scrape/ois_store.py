@@ -0,0 +1,102 @@
+import logging
+import os
+import asyncio
+import contextlib
+import datetime
+import typing
+import httpx
+import pandas as pd
+
+from .ois_fixing_history import OISIndex, load_history
+from .store import write_parquet
+from .http_client import make_client
+
+log = logging.getLogger(__name__)
+
+
+class OISFixingStore:
+    '''Local parquet history of NY Fed reference rate fixings, one file per OISIndex.
+
+    update() only asks for fixings after the last stored effectiveDate, less a few days of
+    overlap so revised fixings replace the stored ones. An empty store is backfilled with
+    concurrent paged requests.
+    '''
+
+    def __init__(self, root: str, overlap_days: int = 5) -> None:
+        self.root           = os.path.abspath(os.path.expanduser(root))
+        self.overlap_days   = overlap_days
+
+    def path(self, index: OISIndex) -> str:
+        return os.path.join(self.root, '{0}.parquet'.format(index.name))
+
+    def read(self,
+        index   : OISIndex,
+        start   : typing.Optional[datetime.date] = None,
+        end     : typing.Optional[datetime.date] = None,
+    ) -> pd.DataFrame:
+        '''Stored fixings between start and end, inclusive, indexed by effectiveDate
+        '''
+        if not os.path.exists(self.path(index)):
+            return pd.DataFrame(index=pd.DatetimeIndex([], name='effectiveDate'))
+        df = pd.read_parquet(self.path(index)).set_index('effectiveDate')
+        return df.loc[
+            None if start is None else pd.Timestamp(start) :
+            None if end is None else pd.Timestamp(end)
+        ]
+
+    def last_date(self, index: OISIndex) -> typing.Optional[pd.Timestamp]:
+        df = self.read(index)
+        return df.index.max() if len(df) else None
+
+    async def update(self,
+        index           : OISIndex,
+        client          : typing.Optional[httpx.AsyncClient] = None,
+        page_size       : int = 1_000,
+        max_concurrency : int = 4,
+        timeout         : float = 5.0,
+    ) -> int:
+        '''Fetch and store fixings newer than the stored ones. Returns the number of new dates.
+        '''
+        stored = self.read(index)
+        after = None if len(stored) == 0 else stored.index.max() - pd.Timedelta(days=self.overlap_days)
+
+        async with contextlib.AsyncExitStack() as stack:
+            if client is None:
+                client = await stack.enter_async_context(make_client(timeout = timeout))
+            fetched = await load_history(
+                client, index,
+                after           = after,
+                page_size       = page_size,
+                max_concurrency = max_concurrency,
+            )
+
+        if len(fetched) == 0:
+            return 0
+        n_new = int((~fetched.index.isin(stored.index)).sum())
+
+        # Fetched fixings win over stored ones, in case they were revised
+        df = pd.concat([stored.loc[~stored.index.isin(fetched.index)], fetched]).sort_index()
+        write_parquet(df.reset_index(), self.path(index))
+        log.info('stored {0} fixings, {1} new, through {2:%Y-%m-%d}'.format(index.value, n_new, df.index.max()))
+        return n_new
+
+    async def update_many(self,
+        indexes : typing.Iterable[OISIndex] = tuple(OISIndex),
+        client  : typing.Optional[httpx.AsyncClient] = None,
+        timeout : float = 5.0,
+        **kwargs,
+    ) -> typing.Dict[OISIndex, typing.Union[int, BaseException]]:
+        '''update() for several indexes concurrently on one client. Returns new date counts, or the error, per index
+        '''
+        indexes = list(indexes)
+        async with contextlib.AsyncExitStack() as stack:
+            if client is None:
+                client = await stack.enter_async_context(make_client(timeout = timeout))
+            results = await asyncio.gather(
+                *[self.update(index, client=client, **kwargs) for index in indexes],
+                return_exceptions = True,
+            )
+        for index, result in zip(indexes, results):
+            if isinstance(result, BaseException):
+                log.warning('Failed to update {0} fixings: {1!r}'.format(index.value, result))
+        return dict(zip(indexes, results))
@@ -0,0 +1,39 @@
+import asyncio
+import time
+import typing
+
+
+class AsyncTokenBucket:
+    '''Token bucket rate limiter for coroutines: on average rate acquisitions per
+    second, with bursts of up to capacity
+    '''
+
+    def __init__(self, rate: float, capacity: typing.Optional[float] = None) -> None:
+        self.rate       = rate
+        self.capacity   = rate if capacity is None else capacity
+        self._tokens    = self.capacity
+        self._updated   = time.monotonic()
+        self._lock      = None
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # Waiters queue on the lock, so tokens are handed out first come first served
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *args):
+        return None
@@ -0,0 +1,221 @@
+'''Daily SOFR forward curve bootstrapped from SR1/SR3 futures and realized fixings.
+
+Unknowns are daily log-growth forwards g (g = log(1 + r/360) per calendar day),
+piecewise constant between the reference period boundaries of the contracts. Each
+contract gives one linear equation in g:
+
+    SR3:  log(1 + R * D/360)  =  sum of g over the period           (compounded, exact)
+    SR1:  R * D/360           =  sum of g over the period           (averaged, with r/360 ~ g)
+
+where R = (100 - mark)/100 and D is the period length in days. Days of the period that
+have already fixed are moved to the right hand side using the fixings, so only the
+days from the valuation date onwards remain unknown. The system is solved once as
+regularized least squares,
+
+    g = K b,    K = (A' W A + smoothing * L' L)^-1 A' W
+
+with L the first difference operator, so a re-solve is one matrix-vector product and
+a single contract's mark moving only needs g += K[:, i] * db_i.
+'''
+import logging
+import datetime
+import typing
+import numpy as np
+import pandas as pd
+
+from .cme_scrape import imm_dates
+
+log = logging.getLogger(__name__)
+
+
+def _days(dates) -> np.ndarray:
+    return np.asarray(pd.to_datetime(pd.Series(dates)).to_numpy('datetime64[D]'))
+
+
+def _add_months(dates: np.ndarray, months: int) -> np.ndarray:
+    return (dates.astype('datetime64[M]') + months).astype('datetime64[D]')
+
+
+def contract_periods(df: pd.DataFrame) -> typing.Tuple[np.ndarray, np.ndarray]:
+    '''Reference period [start, end) of each SR1/SR3 row of process_df output.
+    SR3 runs from its IMM date to the IMM date three months later, SR1 over its calendar month.
+    '''
+    start = _days(df['firstFixingDate'])
+    is_sr3 = (df['productCode'] == 'SR3').to_numpy()
+
+    next_imm_month = _add_months(start, 3).astype('datetime64[M]')
+    years = next_imm_month.astype('datetime64[Y]').astype(np.int64) + 1970
+    months = next_imm_month.astype(np.int64) % 12 + 1
+    sr3_end = imm_dates(years, months) if len(start) else start
+    sr1_end = _add_months(start, 1)
+    return start, np.where(is_sr3, sr3_end, sr1_end)
+
+
+def realized_growth(
+    fixing_dates    : np.ndarray,
+    fixing_rates    : np.ndarray,
+    start           : datetime.date,
+    end             : datetime.date,
+    compounded      : bool,
+) -> float:
+    '''Fixed part of a period's equation over [start, end): the log of compounded growth,
+    or for an averaged contract the plain sum of daily rates / 360.
+    Each fixing applies until the next one, so weekends carry Friday's rate.
+    '''
+    days = np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D'))
+    if len(days) == 0:
+        return 0.0
+    which = np.searchsorted(fixing_dates, days, side='right') - 1
+    if which[0] < 0:
+        raise ValueError('no fixing on or before {0}'.format(days[0]))
+    if not compounded:
+        return float(fixing_rates[which].sum() / 360.0)
+    # One compounding step per fixing, spanning the days it applies to
+    used, n_days = np.unique(which, return_counts=True)
+    return float(np.log1p(fixing_rates[used] * n_days / 360.0).sum())
+
+
+class SOFRCurve:
+    '''Forward curve from a strip of SR1/SR3 futures (process_df output) as of valuation_date.
+
+    fixings are SOFR fixings in percent, either FedOISResetHistoryRequest.data_df or a
+    Series indexed by effectiveDate; they are only needed when a contract's period has
+    started. Contracts are keyed by (productCode, expirationDate).
+    '''
+
+    def __init__(self,
+        contracts       : pd.DataFrame,
+        valuation_date  : datetime.date,
+        fixings         : typing.Optional[typing.Union[pd.DataFrame, pd.Series]] = None,
+        smoothing       : float = 1e-4,
+    ) -> None:
+        self.valuation_date = np.datetime64(valuation_date, 'D')
+        self.smoothing      = smoothing
+
+        contracts = contracts.loc[contracts['productCode'].isin(['SR1', 'SR3'])]
+        start, end = contract_periods(contracts)
+        live = end > self.valuation_date
+        contracts = contracts.loc[live]
+        start, end = start[live], end[live]
+
+        order = np.lexsort((end, start))
+        contracts = contracts.iloc[order]
+        self.keys           = pd.MultiIndex.from_arrays(
+            [contracts['productCode'].to_numpy(), contracts['expirationDate'].to_numpy()],
+            names = ['productCode', 'expirationDate'],
+        )
+        self._positions     = {key: i for i, key in enumerate(self.keys)}
+        self.start          = start[order]
+        self.end            = end[order]
+        self.compounded     = (contracts['productCode'] == 'SR3').to_numpy()
+        self.period_days    = (self.end - self.start).astype(np.int64).astype(float)
+        self.marks          = np.array(contracts['mark'], dtype=float)
+
+        # Segment edges: the valuation date, then every period boundary after it
+        boundaries = np.concatenate([self.start, self.end])
+        self.edges = np.unique(np.concatenate([[self.valuation_date], boundaries[boundaries > self.valuation_date]]))
+        if len(self.edges) < 2:
+            raise ValueError('no contracts with unfixed days after {0}'.format(self.valuation_date))
+
+        self.realized = self._realized(fixings)
+        self.A = self._design()
+        self.K = self._gain()
+        self.b = self.rhs(self.marks)
+        self.g = self.K @ self.b
+
+    def _realized(self, fixings) -> np.ndarray:
+        realized = np.zeros(len(self.keys))
+        started = self.start < self.valuation_date
+        if not started.any():
+            return realized
+        if fixings is None:
+            raise ValueError('fixings are needed for contracts that started before {0}'.format(self.valuation_date))
+
+        if isinstance(fixings, pd.DataFrame):
+            fixings = fixings['percentRate']
+        fixings = fixings.dropna().sort_index()
+        fixing_dates = fixings.index.to_numpy().astype('datetime64[D]')
+        fixing_rates = fixings.to_numpy(dtype=float) / 100.0
+
+        for i in np.flatnonzero(started):
+            realized[i] = realized_growth(
+                fixing_dates, fixing_rates,
+                self.start[i], min(self.end[i], self.valuation_date),
+                self.compounded[i],
+            )
+        return realized
+
+    def _design(self) -> np.ndarray:
+        '''Days of each contract's unfixed period falling in each segment
+        '''
+        lo = np.maximum(self.start[:, None], self.edges[None, :-1])
+        hi = np.minimum(self.end[:, None], self.edges[None, 1:])
+        return np.clip((hi - lo).astype(np.int64), 0, None).astype(float)
+
+    def _gain(self) -> np.ndarray:
+        # Rows scaled to per-day units, so long and short contracts weigh alike
+        weights = 1.0 / self.period_days ** 2
+        n_segments = self.A.shape[1]
+        L = np.diff(np.eye(n_segments), axis=0)
+        normal = self.A.T @ (weights[:, None] * self.A) + self.smoothing * L.T @ L
+        return np.linalg.solve(normal, self.A.T * weights[None, :])
+
+    def rhs(self, marks: np.ndarray, idx: typing.Optional[np.ndarray] = None) -> np.ndarray:
+        '''Right hand side for marks, with the fixed days taken out.
+        With idx, marks are for just those contracts.
+        '''
+        idx = slice(None) if idx is None else idx
+        accrual = (100.0 - np.asarray(marks, dtype=float)) / 100.0 * self.period_days[idx] / 360.0
+        return np.where(self.compounded[idx], np.log1p(accrual), accrual) - self.realized[idx]
+
+    def solve(self, marks: typing.Optional[np.ndarray] = None) -> np.ndarray:
+        '''Full re-solve, optionally with new marks for every contract in key order
+        '''
+        if marks is not None:
+            self.marks = np.array(marks, dtype=float)
+        self.b = self.rhs(self.marks)
+        self.g = self.K @ self.b
+        return self.g
+
+    def update_marks(self, marks: typing.Mapping[typing.Tuple[str, str], float]) -> np.ndarray:
+        '''Re-solve after some contracts' marks moved, touching only their columns of K
+        '''
+        idx = np.fromiter((self._positions[key] for key in marks), dtype=np.int64, count=len(marks))
+        new_marks = np.fromiter(marks.values(), dtype=float, count=len(idx))
+        new_b = self.rhs(new_marks, idx)
+        self.g += self.K[:, idx] @ (new_b - self.b[idx])
+        self.b[idx] = new_b
+        self.marks[idx] = new_marks
+        return self.g
+
+    def forward_rates(self) -> pd.DataFrame:
+        '''Annualized ACT/360 overnight forward on each segment
+        '''
+        return pd.DataFrame({
+            'start' : self.edges[:-1],
+            'end'   : self.edges[1:],
+            'rate'  : np.expm1(self.g) * 360.0,
+        })
+
+    def discount_factors(self, dates) -> np.ndarray:
+        '''Discount factors from the valuation date. Log discount is linear within a segment
+        and extrapolated flat-forward past the last one.
+        '''
+        days = (_days(dates) - self.valuation_date).astype(np.int64).astype(float)
+        edge_days = (self.edges - self.valuation_date).astype(np.int64).astype(float)
+        log_growth = np.concatenate([[0.0], np.cumsum(self.g * np.diff(edge_days))])
+        inside = np.interp(days, edge_days, log_growth)
+        beyond = log_growth[-1] + self.g[-1] * (days - edge_days[-1])
+        return np.exp(-np.where(days > edge_days[-1], beyond, inside))
+
+    def discount_curve(self) -> pd.Series:
+        '''Discount factors at the segment edges
+        '''
+        return pd.Series(self.discount_factors(self.edges), index=pd.DatetimeIndex(self.edges, name='date'))
+
+    def model_marks(self) -> pd.Series:
+        '''Futures prices implied by the solved curve, to check the fit
+        '''
+        lhs = self.A @ self.g + self.realized
+        accrual = np.where(self.compounded, np.expm1(lhs), lhs)
+        return pd.Series(100.0 - accrual * 360.0 / self.period_days * 100.0, index=self.keys)
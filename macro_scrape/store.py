@@ -0,0 +1,76 @@
+import logging
+import os
+import json
+import pathlib
+import typing
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.dataset as ds
+import pyarrow.fs
+
+log = logging.getLogger(__name__)
+
+
+class JSONManifest:
+    '''Small JSON document kept next to a local store, rewritten atomically on save
+    '''
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def load(self) -> typing.Dict:
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def save(self, data: typing.Dict) -> None:
+        pathlib.Path(os.path.dirname(self.path)).mkdir(parents=True, exist_ok=True)
+        tmp_path = '{0}.{1}.tmp'.format(self.path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=1, sort_keys=True, default=str)
+        os.replace(tmp_path, self.path)
+
+
+def typed_columns(
+    df          : pd.DataFrame,
+    dtypes      : typing.Optional[typing.Dict[str, str]] = None,
+    empty_dtype : str = 'str',
+) -> pd.DataFrame:
+    '''Cast columns to their dtype in dtypes, and other all-empty columns, which parse as
+    float64 whatever they hold on other days, to empty_dtype. Every file a store writes then
+    has the same schema, so its dataset reads without unifying file schemas.
+    '''
+    dtypes = {col: dtype for col, dtype in (dtypes or {}).items() if col in df.columns}
+    for col in df.columns[df.isna().all().values]:
+        dtypes.setdefault(col, empty_dtype)
+    dtypes = {col: dtype for col, dtype in dtypes.items() if df[col].dtype != dtype}
+    return df.astype(dtypes) if dtypes else df
+
+
+def write_parquet(df: pd.DataFrame, path: str, row_group_size: typing.Optional[int] = None) -> None:
+    '''Write a frame to parquet via a temp file, so readers never see a partial file
+    '''
+    dirname, basename = os.path.split(path)
+    pathlib.Path(dirname).mkdir(parents=True, exist_ok=True)
+    # Dot prefix keeps open_dataset from picking up the half-written file
+    tmp_path = os.path.join(dirname, '.{0}.{1}.tmp'.format(basename, os.getpid()))
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(table, tmp_path, row_group_size=row_group_size)
+    os.replace(tmp_path, path)
+    log.debug('wrote {0:,} rows to {1}'.format(len(df), path))
+
+
+def open_dataset(root: str, partitioning: typing.Optional[str] = 'hive') -> ds.Dataset:
+    '''Memory-mapped parquet dataset over every file under root
+    '''
+    return ds.dataset(
+        root,
+        format          = 'parquet',
+        partitioning    = partitioning,
+        filesystem      = pyarrow.fs.LocalFileSystem(use_mmap=True),
+        ignore_prefixes = ['.', '_'],
+    )
@@ -27,6 +27,9 @@ with open('requirements.txt', 'r') as f:
 # What packages are optional?
 EXTRAS = {
     # 'fancy feature': ['django'],
+    'parquet': ['pyarrow'],
+    'html': ['selectolax'],
+    'http': ['h2', 'brotli'],
 }
 
 # The rest you shouldn't have to touch too much :)
@@ -0,0 +1,81 @@
+import ftplib
+import os
+import threading
+
+import pytest
+
+from macro_scrape import ftp as ftp_module
+
+
+class FakeFTP:
+    '''Stands in for a logged-in ftplib.FTP, serving files from a dict of path -> (bytes, MDTM)
+    '''
+
+    def __init__(self, server: 'FakeServer') -> None:
+        self.server = server
+        self.closed = False
+
+    def voidcmd(self, cmd: str) -> str:
+        if self.closed:
+            raise ConnectionResetError('connection closed')
+        if cmd.startswith('MDTM '):
+            return '213 {0}'.format(self.server.files[cmd[5:]][1])
+        return '200 OK'
+
+    def size(self, path: str) -> int:
+        return len(self.server.files[path][0])
+
+    def retrbinary(self, cmd: str, callback) -> None:
+        path = cmd[5:]
+        self.server.retrieved.append(path)
+        fail = self.server.fail.get(path)
+        if fail is not None:
+            raise fail
+        data = self.server.files[path][0]
+        for i in range(0, len(data), 4):
+            callback(data[i:i+4])
+
+    def nlst(self, path: str):
+        return [name for name in self.server.files if os.path.dirname(name) == path.rstrip('/')]
+
+    def mlsd(self, path: str, facts=()):
+        if not self.server.mlsd:
+            raise ftplib.error_perm('500 MLSD not understood')
+        for name in self.nlst(path):
+            data, modified = self.server.files[name]
+            yield os.path.basename(name), {'type': 'file', 'size': str(len(data)), 'modify': modified}
+
+    def quit(self) -> None:
+        self.closed = True
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class FakeServer:
+
+    def __init__(self, files) -> None:
+        self.files      = files
+        self.fail       = {}
+        self.retrieved  = []
+        self.logins     = 0
+        self.mlsd       = True
+        self._lock      = threading.Lock()
+
+    def login(self, resource, user='', password=''):
+        with self._lock:
+            self.logins += 1
+        return FakeFTP(self)
+
+
+@pytest.fixture
+def fake_ftp_server(monkeypatch):
+    '''Factory for a FakeServer that every FTP login in the test connects to
+    '''
+    def serve(files) -> FakeServer:
+        server = FakeServer(files)
+        monkeypatch.setattr(ftp_module, 'login', server.login)
+        # Keep pooled connections from leaking between tests
+        monkeypatch.setattr(ftp_module, 'default_pool', ftp_module.FTPConnectionPool())
+        return server
+    return serve
@@ -0,0 +1,36 @@
+import asyncio
+
+from macro_scrape.barchart import BarchartSearchObj
+
+
+def chain_pages(total, served, monkeypatch):
+    '''Serves a chain of total contracts, served per page at most, and records the pages asked for
+    '''
+    requested = []
+
+    async def get_page(self, product_ticker, page=1, limit=1_000):
+        requested.append(page)
+        size = min(served, limit)
+        start = (page - 1) * size
+        data = [
+            {'raw': {'symbol': 'ZN{0:04d}'.format(i), 'contractName': 'Contract {0}'.format(i)}}
+            for i in range(start, min(start + size, total))
+        ]
+        return {'total': total, 'data': data}
+
+    monkeypatch.setattr(BarchartSearchObj, 'get_historic_product_chain_page', get_page)
+    return requested
+
+
+def test_chain_uses_the_served_page_size(monkeypatch):
+    requested = chain_pages(total=25, served=10, monkeypatch=monkeypatch)
+    df = asyncio.run(BarchartSearchObj().get_all_historic_product_chain('ZN', limit=20))
+    assert len(df) == 25
+    assert sorted(requested) == [1, 2, 3]
+
+
+def test_chain_starting_on_the_short_final_page(monkeypatch):
+    requested = chain_pages(total=25, served=10, monkeypatch=monkeypatch)
+    df = asyncio.run(BarchartSearchObj().get_all_historic_product_chain('ZN', page=3, limit=10))
+    assert list(df.index) == ['ZN0020', 'ZN0021', 'ZN0022', 'ZN0023', 'ZN0024']
+    assert requested == [3]
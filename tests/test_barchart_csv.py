@@ -0,0 +1,37 @@
+import io
+
+import pandas as pd
+
+from macro_scrape.barchart import parse_ohlc_csv, us_eastern
+
+
+def test_daily_bars_keep_the_requested_symbol():
+    raw = io.BytesIO(
+        b'ZNZ26,2026-10-14,112.5,112.75,112.25,112.5,1000,50000\n'
+        b'ZNZ26,2026-10-15,112.5,113.0,112.5,112.875,1200,51000\n'
+        b'ZN*0,2026-10-15,112.5,113.0,112.5,112.875,1200,51000\n'
+    )
+    df = parse_ohlc_csv(raw, None)
+    assert list(df.columns) == ['open', 'high', 'low', 'close', 'volume', 'open_interest']
+    assert list(df.index) == [pd.Timestamp('2026-10-14'), pd.Timestamp('2026-10-15')]
+    assert df.index.tz is None
+    assert df['close'].dtype == 'float64'
+    assert df['volume'].dtype == 'int64' and df['open_interest'].dtype == 'int64'
+
+
+def test_minute_bars_are_eastern_and_keep_missing_volume():
+    raw = io.BytesIO(
+        b'2026-10-15 09:30,2026-10-15,112.5,112.75,112.25,112.5,10\n'
+        b'2026-10-15 09:31,2026-10-15,112.5,112.5,112.5,112.5,\n'
+    )
+    df = parse_ohlc_csv(raw, 1)
+    assert list(df.columns) == ['open', 'high', 'low', 'close', 'volume']
+    assert df.index[0] == pd.Timestamp('2026-10-15 09:30', tz=us_eastern)
+    assert df['volume'].dtype == 'float64' and df['volume'].isna().sum() == 1
+
+
+def test_empty_response_is_an_empty_typed_frame():
+    df = parse_ohlc_csv(io.BytesIO(b''), 5)
+    assert len(df) == 0
+    assert list(df.columns) == ['open', 'high', 'low', 'close', 'volume']
+    assert str(df.index.tz) == 'US/Eastern'
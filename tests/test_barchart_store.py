@@ -0,0 +1,80 @@
+import asyncio
+import datetime
+
+import pandas as pd
+
+from macro_scrape.barchart import us_eastern
+from macro_scrape.barchart_store import BarchartBarStore
+
+
+def bars(start, periods, freq='1min', tz=us_eastern) -> pd.DataFrame:
+    index = pd.date_range(start, periods=periods, freq=freq, tz=tz)
+    return pd.DataFrame({'close': [float(i) for i in range(periods)]}, index=index)
+
+
+class FakeClient:
+    '''Stands in for BarchartSearchObj, answering with queued frames and recording requests
+    '''
+    def __init__(self, *frames):
+        self.frames = list(frames)
+        self.requests = []
+
+    async def get_ohlc_quotes(self, ticker, interval, max_records=10_000, dividends=False, back_adjust=False, **kwargs):
+        self.requests.append((ticker, interval, max_records))
+        return self.frames.pop(0)
+
+
+def test_update_appends_only_new_bars(tmp_path):
+    store = BarchartBarStore(str(tmp_path))
+    first = bars('2026-10-16 09:30', 10)
+    second = bars('2026-10-16 09:35', 10)
+    second['close'] += 100
+    client = FakeClient(first, second)
+
+    assert asyncio.run(store.update(client, 'ESZ26', 1)) == 10
+    assert asyncio.run(store.update(client, 'ESZ26', 1)) == 5
+    assert client.requests[0] == ('ESZ26', 1, 10_000)
+    assert client.requests[1][2] < 10_000
+
+    df = store.read('ESZ26', 1)
+    assert len(df) == 15
+    assert df.index.is_monotonic_increasing
+    # The later fetch wins on the overlapping bars
+    assert df.loc[pd.Timestamp('2026-10-16 09:35', tz=us_eastern), 'close'] == 100.0
+
+
+def test_short_response_does_not_move_last_backwards(tmp_path):
+    store = BarchartBarStore(str(tmp_path))
+    client = FakeClient(bars('2026-10-16 09:30', 10), bars('2026-10-16 09:30', 3))
+    asyncio.run(store.update(client, 'ESZ26', 1))
+    asyncio.run(store.update(client, 'ESZ26', 1))
+
+    key = store.key('ESZ26', 1)
+    assert store.last_timestamp(key) == pd.Timestamp('2026-10-16 09:39', tz=us_eastern)
+
+
+def test_compaction_keeps_bars(tmp_path):
+    store = BarchartBarStore(str(tmp_path), max_parts=2)
+    client = FakeClient(*[bars('2026-10-16 09:{0}'.format(30 + 5 * i), 10) for i in range(3)])
+    for _ in range(3):
+        asyncio.run(store.update(client, 'ESZ26', 1))
+    assert len(store._parts(store.key('ESZ26', 1))) == 1
+    assert len(store.read('ESZ26', 1)) == 20
+
+
+def test_read_accepts_naive_bounds(tmp_path):
+    store = BarchartBarStore(str(tmp_path))
+    client = FakeClient(
+        bars('2026-10-15 23:55', 10),
+        bars('2026-10-13', 4, freq='D', tz=None),
+    )
+    asyncio.run(store.update(client, 'ESZ26', 1))
+    asyncio.run(store.update(client, 'ESZ26', None))
+
+    df = store.read('ESZ26', 1, start=datetime.datetime(2026, 10, 15, 23, 58), end=pd.Timestamp('2026-10-16 00:01'))
+    assert list(df['close']) == [3.0, 4.0, 5.0, 6.0]
+    assert len(store.read('ESZ26', 1, end=datetime.date(2026, 10, 15))) == 5
+    assert len(store.read('ESZ26', 1, start='2026-10-16')) == 5
+
+    daily = store.read('ESZ26', None, start=pd.Timestamp('2026-10-14', tz=us_eastern), end=datetime.date(2026, 10, 15))
+    assert list(daily['close']) == [1.0, 2.0]
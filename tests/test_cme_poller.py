@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+import httpx
+
+from macro_scrape.cme_poller import CMEQuotePoller
+from macro_scrape.cme_scrape import CME3MSOFRFutureScrapeRequest
+
+
+def quote(expiration, last, close='-', updated=None):
+    return {
+        'productCode'       : 'SR3',
+        'expirationDate'    : expiration,
+        'expirationCode'    : 'Z6',
+        'last'              : last,
+        'close'             : close,
+        'volume'            : '1,234',
+        'updated'           : updated,
+    }
+
+
+class FakeCME:
+    '''Serves the product page and whatever quotes are current, counting quote requests
+    '''
+    def __init__(self, quotes):
+        self.quotes = quotes
+        self.requests = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith('.html'):
+            return httpx.Response(200, text='<html></html>')
+        self.requests += 1
+        return httpx.Response(200, content=json.dumps({'quotes': self.quotes}).encode())
+
+
+def poller(cme: FakeCME) -> CMEQuotePoller:
+    client = httpx.AsyncClient(transport=httpx.MockTransport(cme))
+    return CMEQuotePoller([CME3MSOFRFutureScrapeRequest()], client=client)
+
+
+def test_poll_publishes_only_changed_rows_with_null_fields():
+    cme = FakeCME([quote('20261216', '96.100'), quote('20270317', '96.200')])
+
+    async def run():
+        async with poller(cme) as p:
+            first = await p.poll_once()
+            # Same values, nulls included, in a different body: nothing changed
+            cme.quotes = [dict(quote, volume='1234') for quote in cme.quotes]
+            unchanged = await p.poll_once()
+            cme.quotes = [quote('20261216', '96.100'), quote('20270317', '96.250')]
+            changed = await p.poll_once()
+            cme.quotes = [quote('20261216', '96.100', close='96.105')]
+            settled = await p.poll_once()
+        return first, unchanged, changed, settled
+
+    first, unchanged, changed, settled = asyncio.run(run())
+    assert first[0].snapshot and len(first[0].changed) == 2
+    assert unchanged == []
+    assert list(changed[0].changed['expirationDate']) == ['20270317']
+    assert changed[0].changed['last'].iloc[0] == 96.25
+    assert list(settled[0].changed['expirationDate']) == ['20261216']
+    assert settled[0].removed == [('SR3', '20270317')]
+
+
+def test_slow_subscriber_gets_updates_merged_per_product():
+    cme = FakeCME([quote('20261216', '96.100'), quote('20270317', '96.200')])
+
+    async def run():
+        p = poller(cme)
+        await p.poll_once()
+        updates = p.subscribe()
+        snapshot = await updates.__anext__()
+        # Three polls go by before the subscriber reads again
+        for last in ('96.110', '96.120', '96.130'):
+            cme.quotes = [quote('20261216', last), quote('20270317', '96.200')]
+            await p.poll_once()
+        subscription, = p._subscribers
+        n_pending = len(subscription.pending)
+        merged = await updates.__anext__()
+        await p.aclose()
+        rest = [update async for update in updates]
+        return snapshot, n_pending, merged, rest
+
+    snapshot, n_pending, merged, rest = asyncio.run(run())
+    assert snapshot.snapshot and len(snapshot.changed) == 2
+    assert n_pending == 1
+    assert not merged.snapshot
+    assert list(merged.changed['last']) == [96.13]
+    assert rest == []
+
+
+def test_subscribe_after_close_returns_at_once():
+    cme = FakeCME([quote('20261216', '96.100')])
+
+    async def run():
+        p = poller(cme)
+        await p.poll_once()
+        await p.aclose()
+        return [update async for update in p.subscribe()]
+
+    assert asyncio.run(asyncio.wait_for(run(), timeout=1.0)) == []
@@ -0,0 +1,82 @@
+import calendar
+import datetime
+import itertools
+
+import numpy as np
+import pytest
+
+from macro_scrape.cme_scrape import kth_weekday_of_month, kth_weekday_of_months, imm_dates, process_df, cme_quote_schema
+from macro_scrape.normalize import normalize_records
+
+
+def listed_weekdays(year, month, weekday_num):
+    '''Every weekday_num of the month, the way the original implementation listed them
+    '''
+    return [
+        day for week in calendar.Calendar().monthdatescalendar(year, month) for day in week
+        if day.weekday() == weekday_num and day.month == month
+    ]
+
+
+def test_matches_list_indexing():
+    for year, month, k, weekday_num in itertools.product(range(2022, 2027), range(1, 13), range(-5, 5), range(7)):
+        days = listed_weekdays(year, month, weekday_num)
+        if -len(days) <= k < len(days):
+            assert kth_weekday_of_month(year, month, k, weekday_num) == days[k]
+            assert kth_weekday_of_months([year], [month], k, weekday_num)[0] == np.datetime64(days[k])
+        else:
+            with pytest.raises(IndexError):
+                kth_weekday_of_month(year, month, k, weekday_num)
+            with pytest.raises(IndexError):
+                kth_weekday_of_months([year], [month], k, weekday_num)
+
+
+def test_negative_k_counts_from_month_end():
+    assert kth_weekday_of_month(2026, 10, -1, calendar.FRIDAY) == datetime.date(2026, 10, 30)
+    assert kth_weekday_of_month(2026, 10, -2, calendar.FRIDAY) == datetime.date(2026, 10, 23)
+    assert kth_weekday_of_month(2026, 2, -1, calendar.SATURDAY) == datetime.date(2026, 2, 28)
+
+
+def test_rejects_dates_past_the_month():
+    # October 2026 has five Fridays but only four Mondays
+    assert kth_weekday_of_month(2026, 10, 4, calendar.FRIDAY) == datetime.date(2026, 10, 30)
+    with pytest.raises(IndexError):
+        kth_weekday_of_month(2026, 10, 4, calendar.MONDAY)
+    with pytest.raises(IndexError):
+        kth_weekday_of_month(2026, 10, -5, calendar.MONDAY)
+    with pytest.raises(IndexError):
+        kth_weekday_of_months([2026, 2026], [9, 10], 4, calendar.MONDAY)
+
+
+def test_imm_dates():
+    assert list(imm_dates([2026, 2026, 2027], [3, 12, 6])) == [
+        np.datetime64('2026-03-18'), np.datetime64('2026-12-16'), np.datetime64('2027-06-16'),
+    ]
+
+
+def quote(product_code, expiration_date, close='-', last='96.5', prior_settle='96.4'):
+    return {
+        'productCode'       : product_code,
+        'expirationDate'    : expiration_date,
+        'close'             : close,
+        'last'              : last,
+        'priorSettle'       : prior_settle,
+        'lastTradeDate'     : {'timestamp': 1797000000000, 'dateOnlyLongFormat': '12/15/2026', 'default24': '12/15/2026'},
+        'priceChart'        : {'code': product_code, 'venue': 0, 'monthYear': 'DEC 2026', 'year': 2026},
+    }
+
+
+def test_process_df_only_parses_sr1_expiration_dates():
+    df = normalize_records([
+        quote('SR3', '20261216', close='96.52'),
+        # Other products may carry just the contract month
+        quote('ED', '202612', last='-'),
+        quote('SR1', '20261130'),
+        quote('SR3', '20270317', last='-', prior_settle='-'),
+    ], cme_quote_schema)
+    df = process_df(df)
+
+    assert df['productCode'].tolist() == ['SR3', 'ED', 'SR1']
+    assert df['firstFixingDate'].tolist() == [datetime.date(2026, 12, 16), datetime.date(2026, 12, 16), datetime.date(2026, 11, 30)]
+    assert df['mark'].tolist() == [96.52, 96.4, 96.5]
+    assert df['lastTradeDate'].tolist() == [datetime.date(2026, 12, 15)] * 3
@@ -0,0 +1,138 @@
+import os
+
+import pytest
+
+from macro_scrape import ftp as ftp_module
+from macro_scrape.ftp import FTPCache, FTPConnectionPool, FTPResource
+
+
+@pytest.fixture
+def server(fake_ftp_server):
+    return fake_ftp_server({
+        '/pub/a.txt': (b'alpha\n', '20261016200000'),
+        '/pub/b.txt': (b'bravo\n', '20261016200000'),
+    })
+
+
+def resource(tmp_path, pool=None) -> FTPResource:
+    return FTPResource('ftp://example.com/pub', cache=FTPCache(str(tmp_path)), pool=pool or FTPConnectionPool())
+
+
+def test_cache_skips_unchanged_remote_file(server, tmp_path):
+    with resource(tmp_path) as client:
+        fname = client.download_file('a.txt')
+        assert client.local_copy_exists('a.txt')
+        assert client.open_remote('a.txt').read() == b'alpha\n'
+    assert open(fname, 'rb').read() == b'alpha\n'
+    assert server.retrieved == ['/pub/a.txt']
+
+    server.files['/pub/a.txt'] = (b'alpha 2\n', '20261017200000')
+    with resource(tmp_path) as client:
+        assert not client.local_copy_exists('a.txt')
+        assert client.open_remote('a.txt').read() == b'alpha 2\n'
+    assert server.retrieved == ['/pub/a.txt', '/pub/a.txt']
+
+
+def test_part_files_are_unique_and_cleaned_up(server, tmp_path, monkeypatch):
+    with resource(tmp_path) as client:
+        fname = client.download_file('a.txt')
+    assert [name for name in os.listdir(os.path.dirname(fname)) if name.endswith('.part')] == []
+
+    seen = []
+    mkstemp = ftp_module.tempfile.mkstemp
+
+    def recording_mkstemp(*args, **kwargs):
+        fd, path = mkstemp(*args, **kwargs)
+        seen.append(path)
+        return fd, path
+
+    monkeypatch.setattr(ftp_module.tempfile, 'mkstemp', recording_mkstemp)
+    with resource(tmp_path) as client:
+        client.download_file('a.txt')
+        client.download_file('a.txt')
+    assert len(set(seen)) == 2
+    assert all(not os.path.exists(path) for path in seen)
+
+
+def test_local_write_errors_do_not_reconnect(server, tmp_path):
+    server.fail['/pub/a.txt'] = OSError(28, 'No space left on device')
+    pool = FTPConnectionPool()
+    with resource(tmp_path, pool) as client:
+        with pytest.raises(OSError, match='No space'):
+            client.download_file('a.txt')
+    assert server.retrieved == ['/pub/a.txt']
+    assert server.logins == 1
+
+
+def test_dropped_connection_is_retried_once(server, tmp_path):
+    server.fail['/pub/a.txt'] = EOFError()
+    pool = FTPConnectionPool()
+    with resource(tmp_path, pool) as client:
+        with pytest.raises(EOFError):
+            client.download_file('a.txt')
+    assert server.retrieved == ['/pub/a.txt', '/pub/a.txt']
+    assert server.logins == 2
+
+
+def test_resources_without_with_hold_no_pool_slot(server, tmp_path):
+    pool = FTPConnectionPool(max_connections=1, acquire_timeout=0.1)
+    clients = [resource(tmp_path, pool).__enter__() for _ in range(3)]
+    for client in clients:
+        client.download_file('a.txt')
+        client.last_modified('b.txt')
+    # Every command reused the one pooled connection, none timed out into an unpooled one
+    assert server.logins == 1
+    assert pool._unpooled == set()
+
+
+def test_pool_reuses_and_caps_connections(server):
+    pool = FTPConnectionPool(max_connections=2, acquire_timeout=0.1)
+    res = FTPResource('ftp://example.com/pub').resource
+    first = pool.acquire(res)
+    second = pool.acquire(res)
+    # Both slots are taken, so the third connection is outside the pool and closed on release
+    third = pool.acquire(res)
+    assert pool._unpooled == {third}
+    pool.release(res, '', third)
+    assert third.closed
+
+    pool.release(res, '', first)
+    assert pool.acquire(res) is first
+    pool.release(res, '', first)
+    pool.release(res, '', second, discard=True)
+    assert second.closed
+    assert server.logins == 3
+
+
+def test_pool_drops_stale_idle_connections(server):
+    pool = FTPConnectionPool(keepalive_interval=0.0)
+    pool._start_keepalive = lambda: None
+    res = FTPResource('ftp://example.com/pub').resource
+    ftp = pool.acquire(res)
+    pool.release(res, '', ftp)
+    ftp.closed = True
+    assert pool.acquire(res) is not ftp
+    assert server.logins == 2
+
+
+def test_download_many_reports_failures(server, tmp_path):
+    server.fail['/pub/b.txt'] = ftp_module.ftplib.error_perm('550 No such file')
+    with resource(tmp_path) as client:
+        results = client.download_many(['a.txt', 'ftp://example.com/pub/b.txt', 'a.txt'])
+        assert [r.suffix for r in results] == ['a.txt', 'b.txt']
+        assert results[0].ok and not results[0].cached and results[0].n_bytes == 6
+        assert not results[1].ok and isinstance(results[1].error, ftp_module.ftplib.error_perm)
+        assert results[1].fname is None
+
+        # Fresh copies are skipped the second time, the failure is tried again
+        again = client.download_many(['a.txt', 'b.txt'])
+    assert again[0].cached
+    assert not again[1].ok
+    assert server.retrieved.count('/pub/a.txt') == 1
+    assert server.retrieved.count('/pub/b.txt') == 2
+
+
+def test_download_many_rejects_other_hosts(server, tmp_path):
+    with resource(tmp_path) as client:
+        with pytest.raises(ValueError):
+            client.download_many(['ftp://other.com/pub/a.txt'])
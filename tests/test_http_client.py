@@ -0,0 +1,62 @@
+import asyncio
+
+import httpx
+
+from macro_scrape import http_client
+from macro_scrape.http_client import HostLimitedTransport, make_client
+
+
+def test_make_client_sends_browser_headers(monkeypatch):
+    monkeypatch.setattr(http_client, 'brotli_available', False)
+    seen = []
+    built = {}
+
+    def mock_transport(**kwargs):
+        built.update(kwargs)
+        return httpx.MockTransport(lambda request: seen.append(request) or httpx.Response(200))
+
+    monkeypatch.setattr(http_client.httpx, 'AsyncHTTPTransport', mock_transport)
+
+    async def run():
+        async with make_client(http2=False, retries=3, max_per_host=4) as client:
+            assert isinstance(client._transport, HostLimitedTransport)
+            await client.get('https://example.com/')
+
+    asyncio.run(run())
+    assert built['http2'] is False and built['retries'] == 3
+    headers = seen[0].headers
+    assert headers['User-Agent'] == http_client.browser_headers['User-Agent']
+    assert 'br' not in [enc.strip() for enc in headers['Accept-Encoding'].split(',')]
+
+
+def test_host_limited_transport_holds_a_slot_until_the_body_is_read():
+    in_flight = {'now': 0, 'max': 0}
+
+    async def body():
+        await asyncio.sleep(0.01)
+        yield b'ok'
+        in_flight['now'] -= 1
+
+    async def handler(request):
+        in_flight['now'] += 1
+        in_flight['max'] = max(in_flight['max'], in_flight['now'])
+        return httpx.Response(200, stream=StreamingBody(body()))
+
+    class StreamingBody(httpx.AsyncByteStream):
+        def __init__(self, chunks):
+            self.chunks = chunks
+
+        async def __aiter__(self):
+            async for chunk in self.chunks:
+                yield chunk
+
+    async def run():
+        transport = HostLimitedTransport(httpx.MockTransport(handler), max_per_host=2)
+        async with httpx.AsyncClient(transport=transport) as client:
+            responses = await asyncio.gather(*[client.get('https://example.com/{0}'.format(i)) for i in range(6)])
+            other = await client.get('https://other.example.com/')
+        return responses, other
+
+    responses, other = asyncio.run(run())
+    assert all(response.text == 'ok' for response in responses + [other])
+    assert in_flight['max'] == 2
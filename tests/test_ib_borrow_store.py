@@ -0,0 +1,68 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from macro_scrape.ftp import last_modified
+from macro_scrape.interactive_brokers.borrow import IBBorrowFTPResource
+from macro_scrape.interactive_brokers.borrow_store import IBBorrowStore
+
+
+class MDTMOnly:
+    '''Stands in for an ftplib.FTP connection that only answers MDTM
+    '''
+
+    def __init__(self, timestamp: str) -> None:
+        self.timestamp = timestamp
+
+    def voidcmd(self, cmd: str) -> str:
+        assert cmd.startswith('MDTM ')
+        return '213 {0}'.format(self.timestamp)
+
+
+def snapshot(borrow: float) -> pd.DataFrame:
+    return pd.DataFrame(
+        {'cur': 'USD', 'desc': ['APPLE INC', 'GAMESTOP'], 'borrow': [0.0025, borrow], 'lend': [0.03, -0.10], 'available': [np.inf, 1e5]},
+        index = pd.Index(['AAPL', 'GME'], name='symbol'),
+    )
+
+
+def test_mdtm_is_utc():
+    modified = last_modified(MDTMOnly('20261016200000'), '/usa.txt', tzinfo=IBBorrowFTPResource.tzinfo)
+    assert modified == datetime.datetime(2026, 10, 16, 20, 0, tzinfo=datetime.timezone.utc)
+    assert modified.utcoffset() == datetime.timedelta(hours=-4)
+
+
+def test_snapshots_keyed_on_mdtm_time(tmp_path):
+    store = IBBorrowStore(str(tmp_path))
+    tz = IBBorrowFTPResource.tzinfo
+    for stamp, borrow in [('20261016133000', 0.20), ('20261016200000', 0.35), ('20261017003000', 0.50)]:
+        store.append('usa', last_modified(MDTMOnly(stamp), '/usa.txt', tzinfo=tz), snapshot(borrow))
+
+    # 20:00 UTC is 16:00 in New York, the same day; 00:30 UTC on the 17th is 20:30 on the 16th
+    assert list(store.days_stored('usa')) == [datetime.date(2026, 10, 16)]
+    assert store.last_modified('usa') == pd.Timestamp('2026-10-17 00:30', tz='UTC')
+
+    def borrow_at(when):
+        return store.asof('usa', when, symbols=['GME'])['borrow'].iloc[0]
+
+    # Naive times are US/Eastern
+    assert borrow_at(datetime.datetime(2026, 10, 16, 15, 59)) == 0.20
+    assert borrow_at(datetime.datetime(2026, 10, 16, 16, 0)) == 0.35
+    assert borrow_at(datetime.datetime(2026, 10, 16, 20, 30)) == 0.50
+    assert borrow_at(pd.Timestamp('2026-10-16 20:00', tz='UTC')) == 0.35
+    assert len(store.asof('usa', datetime.datetime(2026, 10, 16, 9, 29))) == 0
+
+    history = store.history('usa', 'GME')
+    assert history['borrow'].tolist() == [0.20, 0.35, 0.50]
+    assert len(store.history('usa', 'AAPL')) == 1
+
+
+def test_history_spans_days_with_empty_columns(tmp_path):
+    store = IBBorrowStore(str(tmp_path))
+    blank = snapshot(0.20).assign(desc=np.nan)
+    store.append('usa', datetime.datetime(2026, 10, 15, 12), blank)
+    store.append('usa', datetime.datetime(2026, 10, 16, 12), snapshot(0.35))
+
+    history = store.history('usa', 'GME')
+    assert history['borrow'].tolist() == [0.20, 0.35]
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from macro_scrape.isin_lookup import ISINSearchObj
+
+
+records = {'response': {'isinRecords': [
+    {'isin': 'US0378331005', 'issuerName': 'APPLE INC', 'description': 'ORD; COMMON'},
+]}}
+
+
+def results_page(payload: str) -> str:
+    '''Search results page the way ANNA returns it, with the records in an inline script
+    '''
+    return (
+        '<html><body><form><input type="hidden" name="_csrf" value="abc"/></form>\n'
+        '<script type="text/javascript">\n'
+        '    var results;\n'
+        '    eval("results = " +' + payload + ';\n'
+        '    renderResults(results);\n'
+        '</script></body></html>'
+    )
+
+
+@pytest.mark.parametrize('payload', [
+    "'" + json.dumps(records) + "')",
+    '(' + json.dumps(records) + '))',
+    '"' + json.dumps(records) + '")',
+    ' ( ' + json.dumps(records) + ' ))',
+    json.dumps(json.dumps(records)) + ')',
+])
+def test_parse_results_wrapped_payloads(payload):
+    assert ISINSearchObj.parse_results(results_page(payload)) == records
+
+
+@pytest.mark.parametrize('wrapper', ["'{0}')", '({0}))'])
+def test_parse_results_matches_original_split(wrapper):
+    plain = {'response': {'isinRecords': [{'isin': 'US0378331005', 'issuerName': 'APPLE INC'}]}}
+    text = results_page(wrapper.format(json.dumps(plain)))
+    original = json.loads(text.split('eval("results = " +')[1].split(';')[0][1:-2])
+    assert ISINSearchObj.parse_results(text) == original == plain
+
+
+def test_parse_results_without_results():
+    with pytest.raises(ValueError):
+        ISINSearchObj.parse_results('<html><body>Please log in</body></html>')
+
+
+def test_search_key_ignores_whitespace_and_isin_case(tmp_path):
+    from macro_scrape.isin_cache import ISINCache
+    from macro_scrape.isin_lookup import SecuritySearchObj, search_key
+
+    plain = SecuritySearchObj(isinValue='US0378331005')
+    messy = SecuritySearchObj(isinValue=' us0378331005 ', entityName='  ')
+    assert search_key(plain) == search_key(messy)
+    assert search_key(plain) != search_key(SecuritySearchObj(isinValue='US0378331006'))
+
+    cache = ISINCache(str(tmp_path / 'isin.sqlite'))
+    cache.put(messy, records['response']['isinRecords'])
+    assert cache.get(plain) == records['response']['isinRecords']
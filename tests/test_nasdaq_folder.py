@@ -0,0 +1,65 @@
+import datetime
+
+import pytest
+import pytz
+
+from macro_scrape.nasdaq.folder_ftp import NasdaqFolderFTPResource
+from macro_scrape.nasdaq.folder_store import NasdaqFolderStore
+
+
+def halts_file(day: int, reason: str = 'LUDP') -> bytes:
+    return (
+        'Symbol|Halt Date|Reason\n'
+        'AAA|10/{0}/2026|{1}\n'
+        'BBB|10/{0}/2026|\n'
+        'File Creation Time: 10{0}202616:00||\n'
+    ).format(day, reason).encode()
+
+
+@pytest.fixture
+def server(fake_ftp_server):
+    return fake_ftp_server({
+        '/shorthalts/shorthalts20261015.txt': (halts_file(15), '20261015203000'),
+        '/shorthalts/shorthalts20261016.txt': (halts_file(16), '20261016203000'),
+    })
+
+
+class EasternFolderFTPResource(NasdaqFolderFTPResource):
+    tzinfo = pytz.timezone('US/Eastern')
+
+
+def client(cls=NasdaqFolderFTPResource) -> NasdaqFolderFTPResource:
+    return cls(
+        uri             = 'ftp://ftp.example.com/shorthalts/',
+        fname_format    = 'shorthalts%Y%m%d.txt',
+    )
+
+
+@pytest.mark.parametrize('cls', [NasdaqFolderFTPResource, EasternFolderFTPResource])
+def test_mlsd_and_mdtm_stats_agree(server, cls):
+    with client(cls) as c:
+        mlsd = c.list_files_stat()
+        server.mlsd = False
+        mdtm = c.list_files_stat()
+    assert {name: modified for name, (modified, _) in mlsd.items()} == {name: modified for name, (modified, _) in mdtm.items()}
+    assert mlsd['shorthalts20261016.txt'][0] == pytz.utc.localize(datetime.datetime(2026, 10, 16, 20, 30))
+
+
+def test_sync_only_fetches_new_or_changed_files(server, tmp_path):
+    store = NasdaqFolderStore(str(tmp_path))
+    with client(EasternFolderFTPResource) as c:
+        assert c.sync(store) == {}
+    assert len(server.retrieved) == 2
+    assert len(store.read()) == 4
+
+    # The empty Reason column of a new day still reads back alongside the others
+    server.files['/shorthalts/shorthalts20261017.txt'] = (halts_file(17, reason=''), '20261017203000')
+    server.retrieved.clear()
+    with client(EasternFolderFTPResource) as c:
+        server.mlsd = False
+        assert c.sync(store) == {}
+    assert server.retrieved == ['/shorthalts/shorthalts20261017.txt']
+
+    df = store.read(start=datetime.date(2026, 10, 16))
+    assert len(df) == 4
+    assert df['Reason'].isna().sum() == 3
@@ -0,0 +1,43 @@
+import pandas as pd
+
+from macro_scrape.barchart import BarchartSearchObj, quote_schema
+from macro_scrape.normalize import normalize_records
+
+
+def test_wildcard_and_explicit_fields_share_a_parent():
+    records = [
+        {'symbol': 'A', 'raw': {'symbol': 'A', 'lastPrice': '95.1', 'volume': 10, 'extra': 'x'}},
+        {'symbol': 'B', 'raw': None},
+        {'symbol': 'C', 'raw': {'symbol': 'C', 'volume': None}},
+    ]
+    df = normalize_records(records, {'raw.symbol': 'string', 'raw.lastPrice': 'float64', 'raw.volume': 'Int64', 'raw.missing': 'string', 'raw.*': None})
+    assert list(df.columns) == ['symbol', 'lastPrice', 'volume', 'missing', 'extra']
+    assert df['symbol'].dtype == 'string' and df['lastPrice'].dtype == 'float64' and df['volume'].dtype == 'Int64'
+    assert df['lastPrice'].tolist()[0] == 95.1
+    assert df['volume'].isna().tolist() == [False, True, True]
+    assert df['missing'].isna().all()
+    assert df['extra'].tolist()[0] == 'x'
+
+
+def test_nested_paths_without_a_wildcard():
+    records = [{'a': {'b': {'c': 1}}, 'd': '2026-10-16'}, {'a': {}, 'd': None}]
+    df = normalize_records(records, {'a.b.c': 'Int64', 'd': 'datetime64[ns]'})
+    assert df['c'].tolist()[0] == 1 and pd.isna(df['c'].iloc[1])
+    assert df['d'].iloc[0] == pd.Timestamp('2026-10-16') and pd.isna(df['d'].iloc[1])
+
+
+def test_barchart_frames():
+    chain = BarchartSearchObj.raw_records_to_frame([
+        {'raw': {'symbol': 'SQZ26', 'symbolType': 2, 'hasOptions': True}},
+        {'raw': {'symbol': 'SQZ26', 'symbolType': 2, 'hasOptions': True}},
+        {'raw': {'symbol': 'SQH27', 'symbolType': 2, 'hasOptions': False}},
+    ])
+    assert chain.index.tolist() == ['SQZ26', 'SQH27']
+    assert chain['hasOptions'].tolist() == [True, False]
+
+    quotes = BarchartSearchObj.raw_records_to_frame(
+        [{'raw': {'symbol': 'SQZ26', 'lastPrice': 96.5, 'tradeTime': 1797000000}}],
+        quote_schema('symbol,lastPrice,tradeTime'),
+    )
+    assert quotes.loc['SQZ26', 'lastPrice'] == 96.5
+    assert quotes.loc['SQZ26', 'tradeTime'] == pd.Timestamp('2026-12-11 09:40', tz='US/Eastern')
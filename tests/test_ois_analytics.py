@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+from macro_scrape.ois_analytics import OISAccrualIndex
+
+
+def fixings() -> pd.DataFrame:
+    dates = pd.bdate_range('2026-10-01', '2026-10-30', name='effectiveDate')
+    return pd.DataFrame({'percentRate': np.linspace(4.0, 4.5, len(dates))}, index=dates)
+
+
+def daily_rates(df, start, end):
+    '''Rate in force on each calendar day of [start, end), the slow way
+    '''
+    days = pd.date_range(start, pd.Timestamp(end) - pd.Timedelta(days=1))
+    return df['percentRate'].reindex(days, method='ffill').to_numpy() / 100.0
+
+
+def test_matches_day_by_day_compounding():
+    df = fixings()
+    index = OISAccrualIndex(df)
+    # Weekend to weekend, mid-week, one day, and within one fixing's weekend
+    starts = ['2026-10-03', '2026-10-07', '2026-10-14', '2026-10-10']
+    ends = ['2026-10-25', '2026-10-21', '2026-10-15', '2026-10-11']
+
+    for start, end, compounded, average in zip(starts, ends, index.compounded_rate(starts, ends), index.average_rate(starts, ends)):
+        rates = daily_rates(df, start, end)
+        # Consecutive days at the same rate compound as one step
+        steps = np.split(rates, np.flatnonzero(np.diff(rates)) + 1)
+        growth = np.prod([1 + step[0] * len(step) / 360 for step in steps])
+        assert np.isclose(compounded, (growth - 1) * 360 / len(rates) * 100, rtol=1e-12)
+        assert np.isclose(average, rates.mean() * 100, rtol=1e-12)
+
+
+def test_periods_outside_the_history_are_nan():
+    index = OISAccrualIndex(fixings())
+    rates = index.compounded_rate(['2026-09-01', '2026-10-05', '2026-10-20'], ['2026-10-05', '2026-11-30', '2026-10-20'])
+    assert np.isnan(rates).all()
+    assert index.last_date == np.datetime64('2026-10-31')
+
+
+def test_rolling_averages_and_accruals():
+    index = OISAccrualIndex(fixings())
+    rolling = index.rolling_averages(windows=(7,), dates=['2026-10-08', '2026-10-30'])
+    assert list(rolling.columns) == ['7d']
+    np.testing.assert_allclose(rolling['7d'], index.compounded_rate(['2026-10-01', '2026-10-23'], ['2026-10-08', '2026-10-30']))
+
+    accruals = index.accruals(['2026-10-01'], ['2026-10-31'], notional=1_000_000)
+    assert np.isclose(accruals['accrued_interest'].iloc[0], 1_000_000 * (index.index().iloc[-1] * (1 + index.rates[-1] / 360) - 1))
@@ -0,0 +1,57 @@
+import asyncio
+
+import pandas as pd
+
+from macro_scrape import ois_store
+from macro_scrape.ois_fixing_history import OISIndex
+from macro_scrape.ois_store import OISFixingStore
+
+
+class FakeNYFed:
+    '''Stands in for load_history over a published history, recording each after requested
+    '''
+    def __init__(self, history: pd.DataFrame):
+        self.history = history
+        self.requests = []
+
+    async def __call__(self, client, index, after=None, page_size=1_000, max_concurrency=4):
+        self.requests.append(after)
+        return self.history if after is None else self.history.loc[self.history.index > after]
+
+
+def history(end, rate=4.0) -> pd.DataFrame:
+    dates = pd.bdate_range('2026-10-01', end, name='effectiveDate')
+    return pd.DataFrame({'percentRate': rate, 'volumeInBillions': 2500.0}, index=dates)
+
+
+def test_update_fetches_only_after_the_overlap(tmp_path, monkeypatch):
+    nyfed = FakeNYFed(history('2026-10-09'))
+    monkeypatch.setattr(ois_store, 'load_history', nyfed)
+    store = OISFixingStore(str(tmp_path), overlap_days=2)
+
+    assert asyncio.run(store.update(OISIndex.sofr, client=object())) == 7
+    nyfed.history = history('2026-10-16')
+    # The last stored fixing is revised on the way
+    nyfed.history.loc['2026-10-09', 'percentRate'] = 4.05
+    assert asyncio.run(store.update(OISIndex.sofr, client=object())) == 5
+    assert nyfed.requests == [None, pd.Timestamp('2026-10-07')]
+
+    df = store.read(OISIndex.sofr)
+    assert len(df) == 12 and df.index.is_monotonic_increasing
+    assert df.loc['2026-10-09', 'percentRate'] == 4.05
+    assert store.last_date(OISIndex.sofr) == pd.Timestamp('2026-10-16')
+    assert len(store.read(OISIndex.sofr, start=pd.Timestamp('2026-10-12').date(), end=pd.Timestamp('2026-10-13').date())) == 2
+
+
+def test_update_many_reports_failures(tmp_path, monkeypatch):
+    nyfed = FakeNYFed(history('2026-10-09'))
+
+    async def load_history(client, index, **kwargs):
+        if index is OISIndex.obfr:
+            raise ConnectionError('refused')
+        return await nyfed(client, index, **kwargs)
+
+    monkeypatch.setattr(ois_store, 'load_history', load_history)
+    results = asyncio.run(OISFixingStore(str(tmp_path)).update_many([OISIndex.sofr, OISIndex.obfr], client=object()))
+    assert results[OISIndex.sofr] == 7
+    assert isinstance(results[OISIndex.obfr], ConnectionError)
@@ -0,0 +1,59 @@
+import datetime
+import io
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from macro_scrape.cme.settlement_store import CMESettlementStore
+
+
+header = 'BizDt,Sym,ID,StrkPx,SecTyp,MMY,MatDt,PutCall,Exch,Desc,LastTrdDt,SettlePrice,PrevDayVol,PrevDayOI'
+
+
+def zipped(rows) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w') as archive:
+        archive.writestr('settle.csv', '\n'.join([header] + rows) + '\n')
+    return buf.getvalue()
+
+
+def settle_file(dt: datetime.date, with_options: bool) -> bytes:
+    rows = [
+        '{0:%Y-%m-%d},SR3,SR3Z6,,FUT,202612,2027-03-17,,CME,,2027-03-16,96.{0:%d},1200,5000'.format(dt),
+        '{0:%Y-%m-%d},ED,EDZ6,,FUT,202612,2026-12-14,,CME,,2026-12-14,95.{0:%d},10,20'.format(dt),
+    ]
+    if with_options:
+        rows.append('{0:%Y-%m-%d},S3,S3Z6 C96,96.5,OOF,202612,2026-12-11,1,CME,SOFR call,2026-12-11,0.{0:%d},3,4'.format(dt))
+    return zipped(rows)
+
+
+def test_update_is_incremental_and_reads_across_empty_columns(fake_ftp_server, tmp_path):
+    days = [datetime.date(2026, 10, 14), datetime.date(2026, 10, 15), datetime.date(2026, 10, 16)]
+    server = fake_ftp_server({
+        '/settle/cme.settle.{0:%Y%m%d}.s.csv.zip'.format(dt): (settle_file(dt, with_options=(dt == days[1])), '20261016200000')
+        for dt in days[:2]
+    })
+    store = CMESettlementStore(str(tmp_path), exchs=('CME',))
+
+    # The first day is futures only, so StrkPx, PutCall and Desc are empty all file
+    failures = store.update(days[0], days[2])
+    assert list(failures) == [('CME', days[2])]
+    assert store.dates_stored('CME') == set(days[:2])
+
+    server.files['/settle/cme.settle.{0:%Y%m%d}.s.csv.zip'.format(days[2])] = (settle_file(days[2], with_options=False), '20261016200000')
+    server.retrieved.clear()
+    assert store.update(days[0], days[2]) == {}
+    assert server.retrieved == ['/settle/cme.settle.20261016.s.csv.zip']
+    assert store.missing_dates('CME', days[0], days[2]) == []
+
+    df = store.read(products=['SR3', 'S3'])
+    assert len(df) == 4
+    assert df['SettlePrice'].dtype == np.float32
+    assert df['StrkPx'].dtype == np.float32
+    assert df['BizDt'].dtype == 'datetime64[ns]'
+    assert df.loc[df['Sym'] == 'S3', 'Desc'].tolist() == ['SOFR call']
+
+    df = store.read(products=['SR3'], start=days[1], end=days[1])
+    assert df['SettlePrice'].tolist() == [np.float32(96.15)]
+    assert df['BizDt'].tolist() == [pd.Timestamp(days[1])]
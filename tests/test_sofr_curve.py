@@ -0,0 +1,68 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from macro_scrape.sofr_curve import SOFRCurve
+
+rate = 0.04
+
+
+def flat_mark(start, end, compounded):
+    days = (pd.Timestamp(end) - pd.Timestamp(start)).days
+    if compounded:
+        accrual = (1 + rate / 360) ** days - 1
+    else:
+        accrual = days * np.log1p(rate / 360)
+    return 100 - accrual * 360 / days * 100
+
+
+def strip() -> pd.DataFrame:
+    rows = [
+        # code, expiration, first fixing, end of period
+        ('SR3', '20261215', '2026-09-16', '2026-12-16'),
+        ('SR1', '20261130', '2026-11-01', '2026-12-01'),
+        ('SR1', '20261231', '2026-12-01', '2027-01-01'),
+        ('SR3', '20270316', '2026-12-16', '2027-03-17'),
+        ('SR3', '20270615', '2027-03-17', '2027-06-16'),
+        ('SR3', '20270914', '2027-06-16', '2027-09-15'),
+        # Expired before the valuation date, so left out
+        ('SR1', '20260930', '2026-09-01', '2026-10-01'),
+    ]
+    return pd.DataFrame({
+        'productCode'       : [row[0] for row in rows],
+        'expirationDate'    : [row[1] for row in rows],
+        'firstFixingDate'   : pd.to_datetime([row[2] for row in rows]),
+        'mark'              : [flat_mark(row[2], row[3], row[0] == 'SR3') for row in rows],
+    })
+
+
+def fixings() -> pd.Series:
+    dates = pd.bdate_range('2026-09-01', '2026-10-16', name='effectiveDate')
+    return pd.Series(rate * 100, index=dates)
+
+
+def test_flat_strip_gives_a_flat_curve():
+    curve = SOFRCurve(strip(), datetime.date(2026, 10, 19), fixings())
+    assert len(curve.keys) == 6
+    # Realized weekends compound as one step, the marks above daily, hence the small slack
+    np.testing.assert_allclose(curve.forward_rates()['rate'], rate, atol=1e-5)
+    np.testing.assert_allclose(curve.model_marks(), curve.marks, atol=1e-5)
+
+    df = curve.discount_factors([datetime.date(2027, 10, 19)])
+    np.testing.assert_allclose(df, (1 + rate / 360) ** -365, rtol=1e-6)
+
+
+def test_update_marks_matches_a_full_solve():
+    curve = SOFRCurve(strip(), datetime.date(2026, 10, 19), fixings())
+    key = ('SR3', '20270615')
+    moved = {key: curve.marks[curve._positions[key]] - 0.10}
+    g = curve.update_marks(moved).copy()
+    np.testing.assert_allclose(g, curve.solve(curve.marks), atol=1e-12)
+    assert curve.model_marks()[key] == pytest.approx(moved[key], abs=0.02)
+
+
+def test_started_contracts_need_fixings():
+    with pytest.raises(ValueError, match='fixings'):
+        SOFRCurve(strip(), datetime.date(2026, 10, 19))